@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from ung_dbverktoey.datafortelling import last_opp_datafortelling
+from ung_dbverktoey.db import kjoer_spoerring, kjoer_spoerring_i_biter, kjoer_spoerringer, skriv_tabell
+from ung_dbverktoey.fakes import FakeBigQueryClient, FakeGraphServer, FakeOracleConnection
+from ung_dbverktoey.maaling import kjoeringsinfo, maal, sammenlign_kjoeringer
+from ung_dbverktoey.sharepoint import SharepointConnector, send_med_forsoek
+
+
+def benchmark_spoerringer(antall_spoerringer: int = 10,
+                          rader: int = 10_000,
+                          forsinkelse: float = 0.05,
+                          tilkoblingstid: float = 0.2,
+                          maks_samtidighet: int = 4) -> Dict[str, Dict[str, float]]:
+    """
+    Sammenligner ny tilkobling per spørring, gjenbrukt tilkobling og samtidige spørringer
+    med kjoer_spoerring mot en FakeBigQueryClient.
+
+    tilkoblingstid etterligner hentingen av hemmeligheter og oppsettet av klienten som
+    kjoer_spoerring gjør når ingen tilkobling sendes med.
+    """
+    sqler = [f'SELECT * FROM tabell_{nr}' for nr in range(antall_spoerringer)]
+
+    def ny_tilkobling():
+        for sql in sqler:
+            kjoer_spoerring(sql, 'bq', connection=FakeBigQueryClient(rader, forsinkelse=forsinkelse, tilkoblingstid=tilkoblingstid))
+
+    def gjenbrukt():
+        tilkobling = FakeBigQueryClient(rader, forsinkelse=forsinkelse, tilkoblingstid=tilkoblingstid)
+        for sql in sqler:
+            kjoer_spoerring(sql, 'bq', connection=tilkobling)
+
+    def samtidig():
+        tilkobling = FakeBigQueryClient(rader, forsinkelse=forsinkelse, tilkoblingstid=tilkoblingstid)
+        kjoer_spoerringer(sqler, 'bq', maks_samtidighet=maks_samtidighet, connection=tilkobling)
+
+    return {
+        'ny_tilkobling_per_spoerring': maal(ny_tilkobling),
+        'gjenbrukt_tilkobling': maal(gjenbrukt),
+        'samtidige_spoerringer': maal(samtidig),
+    }
+
+
+def benchmark_stroemming(rader: int = 200_000,
+                         biter: int = 20_000,
+                         forsinkelse_per_runde: float = 0.0,
+                         arraysize: int = 1_000) -> Dict[str, Dict[str, float]]:
+    """
+    Sammenligner å hente hele resultatet med kjoer_spoerring mot å behandle det i biter med
+    kjoer_spoerring_i_biter, for både BigQuery og DVH. Hver bit summeres og kastes, slik at
+    minnebruken viser gevinsten av strømming.
+    """
+    resultater = {}
+    for database, lag_tilkobling in (
+        ('bq', lambda: FakeBigQueryClient(rader, side_stoerrelse=biter)),
+        ('dvh', lambda: FakeOracleConnection(rader, forsinkelse_per_runde=forsinkelse_per_runde, arraysize=arraysize)),
+    ):
+        tilkobling = lag_tilkobling()
+        resultater[f'{database}_hele'] = maal(lambda: kjoer_spoerring('SELECT * FROM tabell', database, connection=tilkobling)['kol_2'].sum())
+
+        foerste_bit = {}
+
+        def i_biter():
+            start = time.perf_counter()
+            total = 0.0
+            for df in kjoer_spoerring_i_biter('SELECT * FROM tabell', database, biter=biter, connection=tilkobling):
+                foerste_bit.setdefault('sekunder', time.perf_counter() - start)
+                total += df['kol_2'].sum()
+            return total
+
+        resultater[f'{database}_i_biter'] = {**maal(i_biter), 'sekunder_til_foerste_bit': foerste_bit.get('sekunder')}
+    return resultater
+
+
+def benchmark_skriving(rader: int = 10_000,
+                       biter: int = 5_000,
+                       forsinkelse_per_runde: float = 0.0005) -> Dict[str, Dict[str, float]]:
+    """
+    Sammenligner rad-for-rad-innsetting mot DVH med skriv_tabell, som bruker executemany mot DVH
+    og en lastejobb med Parquet mot BigQuery.
+    """
+    df = FakeOracleConnection(rader).resultat
+
+    def rad_for_rad():
+        tilkobling = FakeOracleConnection(0, forsinkelse_per_runde=forsinkelse_per_runde)
+        cursor = tilkobling.cursor()
+        for rad in df.itertuples(index=False, name=None):
+            cursor.execute('INSERT INTO tabell VALUES (:1, :2, :3, :4, :5)', rad)
+        tilkobling.commit()
+
+    resultater = {'dvh_rad_for_rad': maal(rad_for_rad)}
+    resultater['dvh_rad_for_rad']['rader_per_sekund'] = rader / resultater['dvh_rad_for_rad']['sekunder']
+    for navn, database, tilkobling in (
+        ('dvh_executemany', 'dvh', FakeOracleConnection(0, forsinkelse_per_runde=forsinkelse_per_runde)),
+        ('bq_lastejobb', 'bq', FakeBigQueryClient(0)),
+    ):
+        maaling = maal(lambda: skriv_tabell(df, 'tabell', database, biter=biter, connection=tilkobling))
+        resultater[navn] = {**maaling, 'rader_per_sekund': rader / maaling['sekunder']}
+    return resultater
+
+
+def benchmark_sharepoint(antall_filer: int = 20,
+                         filstoerrelse: int = 256 * 1024,
+                         forsinkelse: float = 0.02,
+                         maks_per_sekund: Optional[int] = None,
+                         maks_samtidighet: int = 4,
+                         maks_forsoek: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Henter filer fra en FakeGraphServer på tre måter: med en ny tilkobling per kall, slik
+    httpx.get på modulnivå gjør, med én delt klient, og samtidig med hent_mange_fra_sharepoint.
+    Med maks_per_sekund strupes serveren, og alle tre prøver på nytt med send_med_forsoek og maks_forsoek.
+    Tilkoblinger, forespørsler og strupede kall telles per kjøring.
+    """
+    filstier = [f'mappe/fil_{nr}.xlsx' for nr in range(antall_filer)]
+    resultater = {}
+
+    with FakeGraphServer(forsinkelse=forsinkelse, filstoerrelse=filstoerrelse, maks_per_sekund=maks_per_sekund) as server:
+        def hent(url: str) -> httpx.Response:
+            return send_med_forsoek(lambda: httpx.get(url, follow_redirects=True), maks_forsoek).raise_for_status()
+
+        def ny_tilkobling_per_kall():
+            for filsti in filstier:
+                omraade = hent(f'{server.graph_url}/sites/navno.sharepoint.com:/sites/ung').json()['id']
+                hent(f'{server.graph_url}/sites/{omraade}/drive/root:/{filsti}:/content').content
+
+        def delt_klient():
+            sharepoint = SharepointConnector(autentiserings_token='token', graph_url=server.graph_url, maks_forsoek=maks_forsoek)
+            for filsti in filstier:
+                sharepoint.hent_data_fra_sharepoint('ung', filsti)
+            sharepoint.lukk()
+
+        def samtidig():
+            sharepoint = SharepointConnector(autentiserings_token='token', graph_url=server.graph_url, maks_forsoek=maks_forsoek)
+            sharepoint.hent_mange_fra_sharepoint('ung', filstier, maks_samtidighet=maks_samtidighet)
+            sharepoint.lukk()
+
+        def med_telling(funksjon, telling):
+            # maal kaller funksjonen flere ganger, så tellingen er fra siste kjøring
+            def kjoer():
+                foer = server.antall_tilkoblinger, server.antall_forespoersler, server.antall_strupet
+                funksjon()
+                telling.update({
+                    'tilkoblinger': server.antall_tilkoblinger - foer[0],
+                    'forespoersler': server.antall_forespoersler - foer[1],
+                    'strupet': server.antall_strupet - foer[2],
+                })
+            return kjoer
+
+        for navn, funksjon in (('ny_tilkobling_per_kall', ny_tilkobling_per_kall),
+                               ('delt_klient', delt_klient),
+                               ('samtidig', samtidig)):
+            telling = {}
+            resultater[navn] = {**maal(med_telling(funksjon, telling)), **telling}
+    return resultater
+
+
+def benchmark_opplasting(stoerrelse_mb: int = 20, forsinkelse: float = 0.0) -> Dict[str, float]:
+    """
+    Laster opp en fil med gitt størrelse til en FakeGraphServer med last_opp_datafortelling.
+    """
+    with tempfile.TemporaryDirectory() as mappe, FakeGraphServer(forsinkelse=forsinkelse) as server:
+        filnavn = os.path.join(mappe, 'index.html')
+        with open(filnavn, 'wb') as fil:
+            fil.write(os.urandom(stoerrelse_mb * 1024 ** 2))
+        # Telleren nullstilles før hver kjøring, så mottatte_byte er fra én opplasting
+        maaling = maal(lambda: last_opp_datafortelling('token', 'teamtoken', filnavn=filnavn, url=server.base_url),
+                       foer=lambda: setattr(server, 'mottatte_byte', 0))
+        return {
+            **maaling,
+            'mb_per_sekund': stoerrelse_mb / maaling['sekunder'] if maaling['sekunder'] > 0 else None,
+            'mottatte_byte': server.mottatte_byte,
+        }
+
+
+def kjoer_alle(utfil: Optional[str] = None) -> Dict:
+    """
+    Kjører alle benchmarkene med standardverdier og lagrer resultatet som JSON.
+    """
+    resultat = {
+        'metadata': kjoeringsinfo(),
+        'spoerringer': benchmark_spoerringer(),
+        'stroemming': benchmark_stroemming(),
+        'skriving': benchmark_skriving(),
+        'sharepoint': benchmark_sharepoint(),
+        'sharepoint_strupet': benchmark_sharepoint(maks_per_sekund=20, maks_forsoek=10),
+        'opplasting': benchmark_opplasting(),
+    }
+    if utfil is not None:
+        with open(utfil, 'w', encoding='utf-8') as f:
+            json.dump(resultat, f, indent=2)
+    return resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark av databaseverktøyene mot lokale erstatninger.')
+    parser.add_argument('--utfil', default=None)
+    parser.add_argument('--sammenlign', nargs=2, metavar=('GAMMEL', 'NY'), default=None,
+                        help='Sammenligner to resultatfiler i stedet for å kjøre benchmarkene')
+    parser.add_argument('--terskel', type=float, default=0.1)
+    args = parser.parse_args()
+    if args.sammenlign is not None:
+        gammel, ny = args.sammenlign
+        with open(gammel, encoding='utf-8') as g, open(ny, encoding='utf-8') as n:
+            print(sammenlign_kjoeringer(json.load(g), json.load(n), args.terskel).to_string())
+        return
+    print(json.dumps(kjoer_alle(args.utfil), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 import os
 import time
+import httpx
 import yaml
-from typing import Dict
+from typing import Dict, Optional
 from ung_dbverktoey.hemmeligheter import Tilgangskontroll
 
+DATAMARKEDSPLASSEN_URL = {
+    "prod": "https://datamarkedsplassen.intern.nav.no",
+    "dev": "https://datamarkedsplassen.intern.dev.nav.no",
+}
+
 
 def get_inputs() -> Dict[str, str]:
     """
@@ -32,6 +38,48 @@ def save_inputs(inputs: Dict[str, str]) -> None:
         yaml.dump(inputs, file)
 
 
+def last_opp_datafortelling(
+    token: str,
+    teamtoken: str,
+    env: str = "prod",
+    filnavn: str = "index.html",
+    klient: Optional[httpx.Client] = None,
+    url: Optional[str] = None,
+) -> httpx.Response:
+    """
+    Laster opp en ferdig rendret fortelling eller dashboard til datamarkedsplassen.
+
+    Filen strømmes fra disk i stedet for å leses inn i minnet. main laster fortsatt opp med curl.
+
+    Args:
+        token (str): Token for datafortellingen eller dashboardet.
+        teamtoken (str): Teamtoken for datamarkedsplassen.
+        env (str): "prod" eller "dev".
+        filnavn (str): Filen som lastes opp.
+        klient (httpx.Client, optional): Klient som gjenbrukes. Hvis None lages en ny.
+        url (str, optional): Adressen til datamarkedsplassen. Hvis None brukes adressen for env.
+
+    Returns:
+        httpx.Response: Svaret fra datamarkedsplassen.
+    """
+    url = url or DATAMARKEDSPLASSEN_URL[env]
+    egen_klient = klient is None
+    if egen_klient:
+        klient = httpx.Client(timeout=httpx.Timeout(60.0))
+    try:
+        with open(filnavn, "rb") as fil:
+            response = klient.put(
+                f"{url}/quarto/update/{token}",
+                files={"index.html": ("index.html", fil, "text/html")},
+                headers={"Authorization": f"Bearer {teamtoken}"},
+            )
+    finally:
+        if egen_klient:
+            klient.close()
+    response.raise_for_status()
+    return response
+
+
 def main() -> None:
     """
     Hovedfunksjonen som kjører programmet. Den henter inputtene fra brukeren eller fra en fil,
@@ -1,11 +1,16 @@
 from ung_dbverktoey.hemmeligheter import Tilgangskontroll
+import contextvars
+import io
 import timeit
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import bigquery
 from google.oauth2 import service_account
 import oracledb
 import warnings
 import pandas as pd
 
+from ung_dbverktoey.sporing import spenn
+
 warnings.filterwarnings(
     "ignore",
     category=UserWarning,
@@ -40,16 +45,24 @@ class DatabaseConnector:
         return connection
 
 
-def kjoer_spoerring(sql, database, time=False, args=None):
-    db_connector = DatabaseConnector()
+def kjoer_spoerring(sql, database, time=False, args=None, connection=None):
+    """
+    Kjører en spørring mot BigQuery ("bq") eller DVH ("dvh") og returnerer resultatet med små bokstaver i kolonnenavnene.
+
+    Sendes connection med, f.eks. fra DatabaseConnector().koble_til_database, gjenbrukes den i stedet for
+    å hente hemmeligheter og koble til på nytt for hver spørring.
+    """
     timer_start = timeit.default_timer()
     database = database.lower()
-    if database == "bq":
-        connection = db_connector.koble_til_database("BQ")
-        df = connection.query(sql).to_dataframe()
-    if database == "dvh":
-        connection = db_connector.koble_til_database("DVH")
-        df = pd.read_sql(sql, connection)
+    with spenn("kjoer_spoerring", database=database, sql=sql) as spoerring:
+        if connection is None:
+            with spenn("koble_til_database", database=database):
+                connection = DatabaseConnector().koble_til_database(database)
+        if database == "bq":
+            df = connection.query(sql).to_dataframe()
+        if database == "dvh":
+            df = pd.read_sql(sql, connection)
+        spoerring.sett("rader", len(df))
     timer_stop = timeit.default_timer()
     if time:
         print(f"Spørring tok {(timer_stop - timer_start):.3f} sekunder")
@@ -58,3 +71,185 @@ def kjoer_spoerring(sql, database, time=False, args=None):
     except AttributeError:
         pass
     return df
+
+
+def kjoer_spoerringer(sqler, database, maks_samtidighet=4, connection=None):
+    """
+    Kjører flere spørringer med én felles tilkobling.
+
+    Mot BigQuery kjøres spørringene samtidig, siden klienten kan deles mellom tråder. Mot DVH
+    kjøres de etter hverandre på samme tilkobling.
+
+    Parameters
+    ----------
+    sqler : Dict[str, str] | List[str]
+        Spørringene, eventuelt med navn.
+    database : str
+        "bq" eller "dvh".
+    maks_samtidighet : int, optional
+        Maks antall samtidige spørringer mot BigQuery (default er 4).
+    connection : optional
+        Tilkobling som gjenbrukes. Hvis None kobles det til én gang for alle spørringene.
+
+    Returns
+    -------
+    Dict[str, pd.DataFrame] | List[pd.DataFrame]
+        Resultatene med samme nøkler eller i samme rekkefølge som sqler.
+    """
+    database = database.lower()
+    if connection is None:
+        connection = DatabaseConnector().koble_til_database(database)
+    navn = list(sqler) if isinstance(sqler, dict) else None
+    spoerringer = list(sqler.values()) if navn is not None else list(sqler)
+
+    if database == "bq":
+        with ThreadPoolExecutor(max_workers=maks_samtidighet) as utfoerer:
+            # Hver spørring kjøres i en kopi av konteksten, så spennene havner under kallerens spenn
+            fremtider = [utfoerer.submit(contextvars.copy_context().run, kjoer_spoerring, sql, database,
+                                         connection=connection) for sql in spoerringer]
+            resultater = [fremtid.result() for fremtid in fremtider]
+    else:
+        resultater = [kjoer_spoerring(sql, database, connection=connection) for sql in spoerringer]
+
+    if navn is not None:
+        return dict(zip(navn, resultater))
+    return resultater
+
+
+def kjoer_spoerring_i_biter(sql, database, biter=50_000, connection=None):
+    """
+    Kjører en spørring og gir resultatet i biter, slik at store resultater ikke må ligge i minnet samtidig.
+
+    Parameters
+    ----------
+    sql : str
+        Spørringen.
+    database : str
+        "bq" eller "dvh".
+    biter : int, optional
+        Antall rader per bit (default er 50_000).
+    connection : optional
+        Tilkobling som gjenbrukes. Hvis None kobles det til på nytt.
+
+    Yields
+    ------
+    pd.DataFrame
+        Én bit av resultatet med små bokstaver i kolonnenavnene.
+    """
+    database = database.lower()
+    if connection is None:
+        connection = DatabaseConnector().koble_til_database(database)
+    if database == "bq":
+        deler = connection.query(sql).result(page_size=biter).to_dataframe_iterable()
+    if database == "dvh":
+        deler = pd.read_sql(sql, connection, chunksize=biter)
+    for df in deler:
+        df.columns = df.columns.str.lower()
+        yield df
+
+
+SKRIVEMODUSER = ("append", "replace")
+
+
+def _som_dataframe(data):
+    if isinstance(data, pd.DataFrame):
+        return data
+    if isinstance(data, str):
+        return pd.read_parquet(data)
+    return data.to_pandas()
+
+
+def _som_parquet(data):
+    if isinstance(data, str):
+        return open(data, "rb")
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    if isinstance(data, pd.DataFrame):
+        data.to_parquet(buffer, index=False)
+    else:
+        pq.write_table(data, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def _skriv_til_bq(data, tabell, modus, connection):
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=(
+            bigquery.WriteDisposition.WRITE_APPEND if modus == "append" else bigquery.WriteDisposition.WRITE_TRUNCATE
+        ),
+    )
+    with _som_parquet(data) as fil:
+        jobb = connection.load_table_from_file(fil, tabell, job_config=job_config)
+        jobb.result()
+    return jobb.output_rows
+
+
+def _skriv_til_dvh(data, tabell, modus, biter, connection):
+    df = _som_dataframe(data)
+    kolonner = ", ".join(df.columns)
+    plassholdere = ", ".join(f":{nr}" for nr in range(1, len(df.columns) + 1))
+    sql = f"INSERT INTO {tabell} ({kolonner}) VALUES ({plassholdere})"
+    cursor = connection.cursor()
+    try:
+        if modus == "replace":
+            # DELETE i stedet for TRUNCATE, så den gamle tabellen står urørt hvis innsettingen feiler
+            cursor.execute(f"DELETE FROM {tabell}")
+        for start in range(0, len(df), biter):
+            bit = df.iloc[start:start + biter]
+            # oracledb tar ikke numpy-typer eller NaN, så radene gjøres om til Python-verdier og None
+            cursor.executemany(sql, list(bit.astype(object).where(bit.notna(), None).itertuples(index=False, name=None)))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(df)
+
+
+def skriv_tabell(data, tabell, database, modus="append", biter=10_000, connection=None, time=False):
+    """
+    Skriver en tabell til BigQuery ("bq") eller DVH ("dvh") i store operasjoner i stedet for rad for rad.
+
+    Mot BigQuery brukes en lastejobb med Parquet, ikke strømmende innsetting. Mot DVH brukes
+    executemany, som sender biter rader per runde til databasen. Tabellen må finnes i DVH.
+
+    Parameters
+    ----------
+    data : pd.DataFrame | pyarrow.Table | str
+        Tabellen som skal skrives, eller stien til en Parquet-fil.
+    tabell : str
+        Navnet på tabellen, f.eks. "prosjekt.datasett.tabell" i BigQuery eller "skjema.tabell" i DVH.
+    database : str
+        "bq" eller "dvh".
+    modus : str, optional
+        "append" legger til radene, "replace" erstatter innholdet i tabellen (default er "append").
+    biter : int, optional
+        Antall rader per executemany mot DVH (default er 10_000).
+    connection : optional
+        Tilkobling som gjenbrukes. Hvis None kobles det til på nytt.
+    time : bool, optional
+        Skriver ut tid og rader per sekund hvis True (default er False).
+
+    Returns
+    -------
+    Dict[str, float]
+        Antall rader, sekunder og rader per sekund.
+    """
+    if modus not in SKRIVEMODUSER:
+        raise ValueError(f"Ukjent modus: {modus}. Gyldige moduser er {SKRIVEMODUSER}")
+    timer_start = timeit.default_timer()
+    database = database.lower()
+    if connection is None:
+        connection = DatabaseConnector().koble_til_database(database)
+    if database == "bq":
+        rader = _skriv_til_bq(data, tabell, modus, connection)
+    if database == "dvh":
+        rader = _skriv_til_dvh(data, tabell, modus, biter, connection)
+    sekunder = timeit.default_timer() - timer_start
+    rader_per_sekund = rader / sekunder if sekunder > 0 else None
+    if time:
+        print(f"Skrev {rader} rader til {tabell} på {sekunder:.3f} sekunder ({rader_per_sekund or 0:.0f} rader per sekund)")
+    return {"rader": rader, "sekunder": sekunder, "rader_per_sekund": rader_per_sekund}
@@ -0,0 +1,368 @@
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def lag_resultat(rader: int, kolonner: int = 5, seed: int = 0) -> pd.DataFrame:
+    """
+    Lager et spørringsresultat med store bokstaver i kolonnenavnene, slik Oracle returnerer dem.
+    Kolonnene veksler mellom heltall, desimaltall og tekst.
+    """
+    rng = np.random.default_rng(seed)
+    data = {'ID': np.arange(rader)}
+    for nr in range(1, kolonner):
+        if nr % 3 == 1:
+            data[f'KOL_{nr}'] = rng.integers(0, 100, rader)
+        elif nr % 3 == 2:
+            data[f'KOL_{nr}'] = rng.random(rader)
+        else:
+            data[f'KOL_{nr}'] = rng.choice(['a', 'b', 'c', 'd'], rader).astype(object)
+    return pd.DataFrame(data)
+
+
+class FakeGraphServer:
+    """
+    Lokal HTTP-server for benchmark og testing uten nettverk. Svarer som Graph og
+    datamarkedsplassen på kallene SharepointConnector og last_opp_datafortelling gjør.
+
+    Parameters
+    ----------
+    forsinkelse : float, optional
+        Ventetid i sekunder per forespørsel (default er 0.0).
+    filstoerrelse : int, optional
+        Antall byte i filene som hentes fra Sharepoint (default er 1 MiB).
+    maks_per_sekund : int, optional
+        Struper med 429 når det kommer flere forespørsler enn dette i løpet av ett sekund. Retry-After
+        er tiden til det blir plass igjen. Hvis None strupes det ikke.
+    """
+    def __init__(self,
+                 forsinkelse: float = 0.0,
+                 filstoerrelse: int = 1024 ** 2,
+                 maks_per_sekund: Optional[int] = None) -> None:
+        self.forsinkelse = forsinkelse
+        self.filstoerrelse = filstoerrelse
+        self.maks_per_sekund = maks_per_sekund
+        self.antall_tilkoblinger = 0
+        self.antall_forespoersler = 0
+        self.antall_strupet = 0
+        self.mottatte_byte = 0
+        self._tidspunkter: deque = deque()
+        self._laas = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._lag_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        vert, port = self._server.server_address[:2]
+        return f"http://{vert}:{port}"
+
+    @property
+    def graph_url(self) -> str:
+        return f"{self.base_url}/v1.0"
+
+    def _ventetid(self) -> Optional[float]:
+        """
+        Returnerer sekunder til neste forespørsel slipper gjennom, eller None hvis denne slipper gjennom.
+        """
+        if self.maks_per_sekund is None:
+            return None
+        naa = time.monotonic()
+        with self._laas:
+            while self._tidspunkter and naa - self._tidspunkter[0] > 1.0:
+                self._tidspunkter.popleft()
+            if len(self._tidspunkter) >= self.maks_per_sekund:
+                self.antall_strupet += 1
+                return 1.0 - (naa - self._tidspunkter[0])
+            self._tidspunkter.append(naa)
+            return None
+
+    def _lag_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 holder tilkoblingen åpen, slik at gjenbruk av tilkoblinger kan måles
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                with server._laas:
+                    server.antall_tilkoblinger += 1
+
+            def _les_kropp(self) -> int:
+                if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                    antall = 0
+                    while True:
+                        stoerrelse = int(self.rfile.readline().strip().split(b';')[0], 16)
+                        if stoerrelse == 0:
+                            self.rfile.readline()
+                            return antall
+                        antall += len(self.rfile.read(stoerrelse))
+                        self.rfile.readline()
+                gjenstaar = int(self.headers.get('Content-Length', 0))
+                antall = 0
+                while gjenstaar > 0:
+                    del_ = self.rfile.read(min(gjenstaar, 1024 ** 2))
+                    if not del_:
+                        break
+                    antall += len(del_)
+                    gjenstaar -= len(del_)
+                return antall
+
+            def _svar(self, status: int, kropp: bytes = b'', innholdstype: str = 'application/json',
+                      headere: Optional[Dict[str, str]] = None) -> None:
+                self.send_response(status)
+                self.send_header('Content-Type', innholdstype)
+                self.send_header('Content-Length', str(len(kropp)))
+                for navn, verdi in (headere or {}).items():
+                    self.send_header(navn, verdi)
+                self.end_headers()
+                self.wfile.write(kropp)
+
+            def _behandle(self, metode: str) -> None:
+                mottatt = self._les_kropp()
+                with server._laas:
+                    server.antall_forespoersler += 1
+                    server.mottatte_byte += mottatt
+                ventetid = server._ventetid()
+                if ventetid is not None:
+                    self._svar(429, b'{"error": {"code": "TooManyRequests"}}', headere={'Retry-After': f'{ventetid:.3f}'})
+                    return
+                if server.forsinkelse:
+                    time.sleep(server.forsinkelse)
+
+                sti = self.path.split('?', 1)[0]
+                if metode == 'GET' and (treff := re.fullmatch(r'/v1\.0/sites/[^/]+:/sites/(.+)', sti)):
+                    self._svar(200, f'{{"id": "omraade-{treff.group(1)}"}}'.encode('utf-8'))
+                elif metode == 'GET' and re.fullmatch(r'/v1\.0/sites/[^/]+/drive/root:/.+:/content', sti):
+                    self._svar(200, b'x' * server.filstoerrelse, 'application/octet-stream')
+                elif metode == 'POST' and re.fullmatch(r'/v1\.0/users/[^/]+/sendMail', sti):
+                    self._svar(202)
+                elif metode == 'PUT' and sti.startswith('/quarto/update/'):
+                    self._svar(200, f'{{"mottatt": {mottatt}}}'.encode('utf-8'))
+                else:
+                    self._svar(404, b'{"error": {"code": "itemNotFound"}}')
+
+            def do_GET(self) -> None:
+                self._behandle('GET')
+
+            def do_POST(self) -> None:
+                self._behandle('POST')
+
+            def do_PUT(self) -> None:
+                self._behandle('PUT')
+
+        return Handler
+
+    def start(self) -> "FakeGraphServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stopp(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeGraphServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stopp()
+
+
+class _FakeRadIterator:
+    def __init__(self, df: pd.DataFrame, page_size: Optional[int], forsinkelse_per_side: float) -> None:
+        self._df = df
+        self._page_size = page_size or len(df) or 1
+        self._forsinkelse_per_side = forsinkelse_per_side
+        self.total_rows = len(df)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.concat(list(self.to_dataframe_iterable()), ignore_index=True) if len(self._df) else self._df.copy()
+
+    def to_dataframe_iterable(self) -> Iterator[pd.DataFrame]:
+        for start in range(0, len(self._df), self._page_size):
+            if self._forsinkelse_per_side:
+                time.sleep(self._forsinkelse_per_side)
+            yield self._df.iloc[start:start + self._page_size].reset_index(drop=True)
+
+
+class _FakeSpoerringJobb:
+    def __init__(self, klient: "FakeBigQueryClient", sql: str) -> None:
+        self._klient = klient
+        self.query = sql
+
+    def result(self, page_size: Optional[int] = None, **kwargs) -> _FakeRadIterator:
+        if self._klient.forsinkelse:
+            time.sleep(self._klient.forsinkelse)
+        return _FakeRadIterator(self._klient.resultat, page_size or self._klient.side_stoerrelse,
+                                self._klient.forsinkelse_per_side)
+
+    def to_dataframe(self, **kwargs) -> pd.DataFrame:
+        return self.result().to_dataframe()
+
+
+class _FakeLastejobb:
+    def __init__(self, klient: "FakeBigQueryClient", rader: int) -> None:
+        self._klient = klient
+        self.output_rows = rader
+
+    def result(self, **kwargs) -> "_FakeLastejobb":
+        if self._klient.forsinkelse:
+            time.sleep(self._klient.forsinkelse)
+        return self
+
+
+class FakeBigQueryClient:
+    """
+    Erstatning for bigquery.Client som gir et resultat med fast størrelse for alle spørringer.
+
+    Parameters
+    ----------
+    rader : int, optional
+        Antall rader i resultatet (default er 1_000).
+    kolonner : int, optional
+        Antall kolonner i resultatet (default er 5).
+    forsinkelse : float, optional
+        Ventetid i sekunder per spørring (default er 0.0).
+    forsinkelse_per_side : float, optional
+        Ventetid i sekunder per side som hentes (default er 0.0).
+    side_stoerrelse : int, optional
+        Antall rader per side når page_size ikke er oppgitt (default er 10_000).
+    tilkoblingstid : float, optional
+        Ventetid når klienten lages, som etterligner autentisering og oppsett (default er 0.0).
+    """
+    def __init__(self,
+                 rader: int = 1_000,
+                 kolonner: int = 5,
+                 forsinkelse: float = 0.0,
+                 forsinkelse_per_side: float = 0.0,
+                 side_stoerrelse: int = 10_000,
+                 tilkoblingstid: float = 0.0) -> None:
+        if tilkoblingstid:
+            time.sleep(tilkoblingstid)
+        self.resultat = lag_resultat(rader, kolonner)
+        self.forsinkelse = forsinkelse
+        self.forsinkelse_per_side = forsinkelse_per_side
+        self.side_stoerrelse = side_stoerrelse
+        self.spoerringer: List[str] = []
+        self.lastede_tabeller: Dict[str, int] = {}
+
+    def query(self, sql: str, job_config=None, **kwargs) -> _FakeSpoerringJobb:
+        self.spoerringer.append(sql)
+        return _FakeSpoerringJobb(self, sql)
+
+    def load_table_from_file(self, fil, destination: str, job_config=None, **kwargs) -> "_FakeLastejobb":
+        # Leser Parquet-filen, så kostnaden med å lage og sende den blir med i målingene
+        df = pd.read_parquet(fil)
+        self.lastede_tabeller[destination] = len(df)
+        return _FakeLastejobb(self, len(df))
+
+
+class FakeOracleCursor:
+    def __init__(self, tilkobling: "FakeOracleConnection") -> None:
+        self._tilkobling = tilkobling
+        self._resultat: Optional[pd.DataFrame] = None
+        self._posisjon = 0
+        self.arraysize = tilkobling.arraysize
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, sql: str, parameters=None) -> None:
+        self._tilkobling.spoerringer.append(sql)
+        if sql.lstrip().upper().startswith(("INSERT", "DELETE")):
+            # Én runde mot databasen per kall, slik rad-for-rad-skriving gjør
+            if self._tilkobling.forsinkelse_per_runde:
+                time.sleep(self._tilkobling.forsinkelse_per_runde)
+            self._tilkobling.skrevne_rader += parameters is not None
+            return
+        if self._tilkobling.forsinkelse:
+            time.sleep(self._tilkobling.forsinkelse)
+        self._resultat = self._tilkobling.resultat
+        self.description = [(kolonne, None, None, None, None, None, None) for kolonne in self._resultat.columns]
+        self._posisjon = 0
+
+    def fetchmany(self, size: Optional[int] = None) -> List[tuple]:
+        size = size or self.arraysize
+        rader = []
+        # Hver runde mot databasen henter arraysize rader
+        while len(rader) < size and self._posisjon < len(self._resultat):
+            if self._tilkobling.forsinkelse_per_runde:
+                time.sleep(self._tilkobling.forsinkelse_per_runde)
+            antall = min(self.arraysize, size - len(rader))
+            del_ = self._resultat.iloc[self._posisjon:self._posisjon + antall]
+            rader.extend(del_.itertuples(index=False, name=None))
+            self._posisjon += antall
+        return rader
+
+    def executemany(self, sql: str, parametere: List[tuple], **kwargs) -> None:
+        self._tilkobling.spoerringer.append(sql)
+        # Array DML sender alle radene i samme runde
+        if self._tilkobling.forsinkelse_per_runde:
+            time.sleep(self._tilkobling.forsinkelse_per_runde)
+        self._tilkobling.skrevne_rader += len(parametere)
+
+    def fetchall(self) -> List[tuple]:
+        rader = []
+        while del_ := self.fetchmany(self.arraysize):
+            rader.extend(del_)
+        return rader
+
+    def close(self) -> None:
+        pass
+
+
+class FakeOracleConnection:
+    """
+    Erstatning for en oracledb-tilkobling som gir et resultat med fast størrelse for alle spørringer.
+
+    Parameters
+    ----------
+    rader : int, optional
+        Antall rader i resultatet (default er 1_000).
+    kolonner : int, optional
+        Antall kolonner i resultatet (default er 5).
+    forsinkelse : float, optional
+        Ventetid i sekunder per spørring (default er 0.0).
+    forsinkelse_per_runde : float, optional
+        Ventetid i sekunder per runde mot databasen, der hver runde henter arraysize rader eller
+        skriver med ett kall til execute eller executemany (default er 0.0).
+    arraysize : int, optional
+        Antall rader per runde, som i oracledb (default er 100).
+    tilkoblingstid : float, optional
+        Ventetid når tilkoblingen lages (default er 0.0).
+    """
+    def __init__(self,
+                 rader: int = 1_000,
+                 kolonner: int = 5,
+                 forsinkelse: float = 0.0,
+                 forsinkelse_per_runde: float = 0.0,
+                 arraysize: int = 100,
+                 tilkoblingstid: float = 0.0) -> None:
+        if tilkoblingstid:
+            time.sleep(tilkoblingstid)
+        self.resultat = lag_resultat(rader, kolonner)
+        self.forsinkelse = forsinkelse
+        self.forsinkelse_per_runde = forsinkelse_per_runde
+        self.arraysize = arraysize
+        self.spoerringer: List[str] = []
+        self.skrevne_rader = 0
+
+    def cursor(self) -> FakeOracleCursor:
+        return FakeOracleCursor(self)
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
@@ -4,6 +4,8 @@ from google.cloud import secretmanager
 from typing import Optional, Dict
 import subprocess
 
+from ung_dbverktoey.sporing import sporet
+
 
 class Tilgangskontroll:
     """
@@ -67,6 +69,7 @@ class Tilgangskontroll:
         return prosjektnavn
     
     
+    @sporet('Tilgangskontroll._hent_hemmeligheter')
     def _hent_hemmeligheter(self, kilde: str) -> Optional[Dict[str, str]]:
         """
         Henter hemmeligheter fra en gitt kilde.
@@ -0,0 +1,291 @@
+import datetime
+import glob
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ung_dbverktoey.db import kjoer_spoerring_i_biter
+
+TILSTANDSFIL = "_tilstand.json"
+
+
+def lagrede_deler(mappe: str) -> Optional[List[str]]:
+    """
+    Gir Parquet-filene som hører til datasettet til et InkrementeltUttrekk i mappen.
+
+    Bare delene i den lagrede tilstanden er med. Filer fra en oppdatering som ikke er fullført, eller
+    gamle deler som skal slettes etter komprimer, kan ligge i mappen en stund og blir ikke lest.
+
+    Parameters
+    ----------
+    mappe : str
+        Mappen til uttrekket.
+
+    Returns
+    -------
+    Optional[List[str]]
+        Stiene til delene, eller None hvis mappen ikke har en tilstandsfil.
+    """
+    tilstandsfil = os.path.join(mappe, TILSTANDSFIL)
+    if not os.path.exists(tilstandsfil):
+        return None
+    with open(tilstandsfil, encoding="utf-8") as f:
+        deler = [os.path.join(mappe, del_) for del_ in json.load(f)["deler"]]
+    # Rett etter at tilstanden er lagret, kan en ny del fortsatt ha midlertidig navn
+    return [del_ if os.path.exists(del_) else del_ + ".tmp" for del_ in deler]
+
+
+def _til_tilstand(verdi: Any) -> Optional[Dict[str, Any]]:
+    if verdi is None or pd.isna(verdi):
+        return None
+    if isinstance(verdi, (pd.Timestamp, datetime.datetime, np.datetime64)):
+        return {"type": "tidspunkt", "verdi": pd.Timestamp(verdi).isoformat()}
+    if isinstance(verdi, datetime.date):
+        return {"type": "dato", "verdi": verdi.isoformat()}
+    if isinstance(verdi, (int, np.integer)):
+        return {"type": "heltall", "verdi": int(verdi)}
+    if isinstance(verdi, (float, np.floating)):
+        return {"type": "desimaltall", "verdi": float(verdi)}
+    if isinstance(verdi, str):
+        return {"type": "tekst", "verdi": verdi}
+    raise TypeError(f"Vannmerket kan ikke lagres: {type(verdi).__name__}")
+
+
+def _fra_tilstand(tilstand: Optional[Dict[str, Any]]) -> Any:
+    if tilstand is None:
+        return None
+    if tilstand["type"] == "tidspunkt":
+        return pd.Timestamp(tilstand["verdi"])
+    if tilstand["type"] == "dato":
+        return datetime.date.fromisoformat(tilstand["verdi"])
+    return tilstand["verdi"]
+
+
+def _tidspunkt_literal(tidspunkt: pd.Timestamp, database: str) -> str:
+    sone = ""
+    if tidspunkt.tzinfo is not None:
+        forskyvning = tidspunkt.strftime("%z")
+        sone = f"{forskyvning[:3]}:{forskyvning[3:]}"
+        tidspunkt = tidspunkt.tz_localize(None)
+    if database == "bq":
+        # BigQuery har mikrosekunder, og DATETIME er uten tidssone
+        tekst = tidspunkt.strftime("%Y-%m-%d %H:%M:%S.%f")
+        return f"TIMESTAMP '{tekst}{sone}'" if sone else f"DATETIME '{tekst}'"
+    # Oracle har nanosekunder, og tidssonen skilles fra klokkeslettet med mellomrom
+    tekst = tidspunkt.isoformat(sep=" ")
+    return f"TIMESTAMP '{tekst} {sone}'" if sone else f"TIMESTAMP '{tekst}'"
+
+
+def sql_verdi(verdi: Any, database: str = "bq") -> str:
+    """
+    Skriver et vannmerke som en SQL-literal for BigQuery eller Oracle.
+
+    Tidspunkter uten tidssone blir DATETIME i BigQuery og TIMESTAMP i Oracle. Tidspunkter med
+    tidssone blir TIMESTAMP med tidssonen, som i Oracle er en TIMESTAMP WITH TIME ZONE.
+
+    Parameters
+    ----------
+    verdi : Any
+        Vannmerket, f.eks. et tall, en tekst, en dato eller et tidspunkt.
+    database : str, optional
+        "bq" eller "dvh" (default er "bq").
+    """
+    if isinstance(verdi, (pd.Timestamp, datetime.datetime, np.datetime64)):
+        return _tidspunkt_literal(pd.Timestamp(verdi), database.lower())
+    if isinstance(verdi, datetime.date):
+        return f"DATE '{verdi.isoformat()}'"
+    if isinstance(verdi, (int, float, np.integer, np.floating)):
+        return str(verdi)
+    return "'" + str(verdi).replace("'", "''") + "'"
+
+
+class InkrementeltUttrekk:
+    """
+    Henter bare nye rader fra en tabell som det kun legges til rader i, og lagrer dem lokalt som Parquet.
+
+    Det største vannmerket som er hentet lagres i en tilstandsfil i mappen. Neste gang hentes bare rader
+    med høyere vannmerke, og de legges til som en ny del i datasettet. les() gir alle delene samlet.
+
+    Rader som kommer inn senere med et vannmerke som er lavere enn eller lik det som allerede er hentet,
+    blir ikke med. Vannmerket bør derfor være en kolonne som alltid øker, f.eks. et løpenummer eller
+    tidspunktet raden ble lagt inn.
+
+    Parameters
+    ----------
+    sql_mal : str
+        Spørringen med {vilkaar} der filteret på vannmerket skal stå, f.eks.
+        "SELECT * FROM tabell WHERE {vilkaar}". Første gang erstattes {vilkaar} med 1=1.
+    database : str
+        "bq" eller "dvh".
+    vannmerke_kolonne : str
+        Kolonnen det filtreres på.
+    mappe : str
+        Mappen der datasettet og tilstanden lagres.
+    startverdi : optional
+        Vannmerket det skal hentes fra første gang. Hvis None hentes hele tabellen første gang.
+    biter : int, optional
+        Antall rader per Parquet-fil når mange nye rader hentes (default er 500_000).
+    connection : optional
+        Tilkobling som gjenbrukes. Hvis None kobles det til ved hver oppdatering.
+    """
+    def __init__(self,
+                 sql_mal: str,
+                 database: str,
+                 vannmerke_kolonne: str,
+                 mappe: str,
+                 startverdi: Any = None,
+                 biter: int = 500_000,
+                 connection=None) -> None:
+        if "{vilkaar}" not in sql_mal:
+            raise ValueError("sql_mal må inneholde {vilkaar}")
+        self.sql_mal = sql_mal
+        self.database = database.lower()
+        self.vannmerke_kolonne = vannmerke_kolonne.lower()
+        self.mappe = mappe
+        self.biter = biter
+        self.connection = connection
+        os.makedirs(mappe, exist_ok=True)
+        self._tilstand = self._les_tilstand()
+        if self._tilstand["vannmerke"] is None and startverdi is not None:
+            self._tilstand["vannmerke"] = _til_tilstand(startverdi)
+        self._rydd_opp()
+
+    @property
+    def vannmerke(self) -> Any:
+        """
+        Det største vannmerket som er hentet, eller startverdien hvis ingenting er hentet ennå.
+        """
+        return _fra_tilstand(self._tilstand["vannmerke"])
+
+    @property
+    def deler(self) -> List[str]:
+        return [os.path.join(self.mappe, del_) for del_ in self._tilstand["deler"]]
+
+    def _les_tilstand(self) -> Dict[str, Any]:
+        tilstandsfil = os.path.join(self.mappe, TILSTANDSFIL)
+        if os.path.exists(tilstandsfil):
+            with open(tilstandsfil, encoding="utf-8") as f:
+                return json.load(f)
+        return {"vannmerke": None, "deler": [], "rader": 0, "oppdatert": None}
+
+    def _lagre_tilstand(self, tilstand: Dict[str, Any]) -> None:
+        # Tilstanden i objektet byttes først når den er lagret, så den stemmer med filen også etter en feil
+        tilstandsfil = os.path.join(self.mappe, TILSTANDSFIL)
+        midlertidig = tilstandsfil + ".tmp"
+        with open(midlertidig, "w", encoding="utf-8") as f:
+            json.dump(tilstand, f, indent=2)
+        os.replace(midlertidig, tilstandsfil)
+        self._tilstand = tilstand
+
+    def _rydd_opp(self) -> None:
+        # Deler som ble lagret i tilstanden rett før et avbrudd, har fortsatt midlertidig navn
+        for del_ in self._tilstand["deler"]:
+            fil = os.path.join(self.mappe, del_)
+            if not os.path.exists(fil) and os.path.exists(fil + ".tmp"):
+                os.replace(fil + ".tmp", fil)
+        # Filer som ble skrevet før en avbrutt oppdatering, er ikke med i tilstanden og hentes på nytt
+        for fil in glob.glob(os.path.join(self.mappe, "del-*.parquet*")):
+            if os.path.basename(fil) not in self._tilstand["deler"]:
+                os.remove(fil)
+
+    def _skriv_del(self, df: pd.DataFrame, deler: List[str]) -> str:
+        # Delen får endelig navn i _lagre_deler, etter at tilstanden med den er lagret
+        nummer = int(deler[-1][4:10]) + 1 if deler else 0
+        navn = f"del-{nummer:06d}.parquet"
+        df.to_parquet(os.path.join(self.mappe, navn + ".tmp"), index=False)
+        return navn
+
+    def _lagre_deler(self, tilstand: Dict[str, Any], nye_deler: List[str]) -> None:
+        # Tilstanden med de nye delene og vannmerket lagres samlet før delene får endelig navn, så
+        # datasettet i mappen aldri har deler som ikke er i tilstanden
+        self._lagre_tilstand(tilstand)
+        for del_ in nye_deler:
+            fil = os.path.join(self.mappe, del_)
+            os.replace(fil + ".tmp", fil)
+
+    def lag_sql(self) -> str:
+        """
+        Returnerer spørringen som henter radene etter det lagrede vannmerket.
+        """
+        if self.vannmerke is None:
+            vilkaar = "1=1"
+        else:
+            vilkaar = f"{self.vannmerke_kolonne} > {sql_verdi(self.vannmerke, self.database)}"
+        # replace og ikke format, så andre krøllparenteser i SQL-en, f.eks. JSON eller regex, står urørt
+        return self.sql_mal.replace("{vilkaar}", vilkaar)
+
+    def oppdater(self) -> int:
+        """
+        Henter radene etter det lagrede vannmerket og legger dem til i datasettet.
+
+        Tilstanden lagres først når alle de nye radene er skrevet, og de nye delene og vannmerket lagres
+        samlet. En avbrutt oppdatering gjentas derfor i sin helhet neste gang.
+
+        Returns
+        -------
+        int
+            Antall nye rader.
+        """
+        nye_deler = []
+        nytt_vannmerke = self.vannmerke
+        antall = 0
+        for df in kjoer_spoerring_i_biter(self.lag_sql(), self.database, biter=self.biter, connection=self.connection):
+            if df.empty:
+                continue
+            if self.vannmerke_kolonne not in df.columns:
+                raise KeyError(f"Resultatet mangler vannmerkekolonnen {self.vannmerke_kolonne}")
+            stoerste = df[self.vannmerke_kolonne].max()
+            if nytt_vannmerke is None or stoerste > nytt_vannmerke:
+                nytt_vannmerke = stoerste
+            nye_deler.append(self._skriv_del(df, self._tilstand["deler"] + nye_deler))
+            antall += len(df)
+
+        tilstand = dict(self._tilstand, oppdatert=pd.Timestamp.now(tz="UTC").isoformat())
+        if antall:
+            tilstand["deler"] = self._tilstand["deler"] + nye_deler
+            tilstand["vannmerke"] = _til_tilstand(nytt_vannmerke)
+            tilstand["rader"] = self._tilstand["rader"] + antall
+        self._lagre_deler(tilstand, nye_deler)
+        return antall
+
+    def les(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Leser alle radene som er hentet så langt.
+
+        Parameters
+        ----------
+        kolonner : List[str], optional
+            Bare disse kolonnene leses fra Parquet-filene. Hvis None leses alle.
+        """
+        if not self.deler:
+            return pd.DataFrame(columns=kolonner)
+        deler = [pd.read_parquet(del_, columns=kolonner) for del_ in self.deler]
+        return pd.concat(deler, ignore_index=True) if len(deler) > 1 else deler[0]
+
+    def oppdater_og_les(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        self.oppdater()
+        return self.les(kolonner)
+
+    def komprimer(self) -> None:
+        """
+        Slår sammen alle delene til én Parquet-fil, f.eks. når mange daglige oppdateringer har gitt mange små filer.
+        """
+        if len(self._tilstand["deler"]) < 2:
+            return
+        gamle = self.deler
+        df = self.les()
+        navn = self._skriv_del(df, self._tilstand["deler"])
+        self._lagre_deler(dict(self._tilstand, deler=[navn]), [navn])
+        for fil in gamle:
+            os.remove(fil)
+
+    def nullstill(self) -> None:
+        """
+        Sletter datasettet og vannmerket, slik at neste oppdatering henter hele tabellen.
+        """
+        for fil in self.deler:
+            os.remove(fil)
+        self._lagre_tilstand({"vannmerke": None, "deler": [], "rader": 0, "oppdatert": None})
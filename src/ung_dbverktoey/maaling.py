@@ -0,0 +1,143 @@
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+
+def maal(funksjon: Callable[[], object],
+         gjentakelser: int = 1,
+         foer: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    """
+    Måler tid og største minnebruk for et kall til funksjon.
+
+    Tiden måles i egne kjøringer uten tracemalloc, som gjør Python-kode flere ganger tregere og ville
+    gitt tider som ikke kan sammenlignes med vanlig bruk. Minnebruken måles i én kjøring til med tracemalloc.
+
+    Parameters
+    ----------
+    funksjon : Callable[[], object]
+        Koden som måles.
+    gjentakelser : int, optional
+        Antall kjøringer for tiden (default er 1).
+    foer : Callable[[], None], optional
+        Kalles før hver kjøring, f.eks. for å tømme en cache.
+
+    Returns
+    -------
+    Dict[str, float]
+        'sekunder' er beste tid, som er minst påvirket av annen last på maskinen, 'sekunder_median'
+        er mediantiden og 'minne_mb' er største minnebruk i MB.
+    """
+    tider = []
+    for _ in range(gjentakelser):
+        if foer is not None:
+            foer()
+        start = time.perf_counter()
+        funksjon()
+        tider.append(time.perf_counter() - start)
+
+    if foer is not None:
+        foer()
+    tracemalloc.start()
+    try:
+        funksjon()
+        minne = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'sekunder': min(tider), 'sekunder_median': statistics.median(tider), 'minne_mb': minne / 1024 ** 2}
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        resultat = subprocess.run(['git', *args], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  capture_output=True, text=True, timeout=10, check=True)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return resultat.stdout.strip()
+
+
+def kjoeringsinfo() -> Dict[str, Any]:
+    """
+    Beskriver kjøringen, slik at resultater fra ulike versjoner og maskiner kan skilles fra hverandre.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Tidspunkt, pakkeversjon, commit (None utenfor et git-repo), om det er endringer som ikke er
+        committet, og Python-versjon, plattform og antall kjerner.
+    """
+    try:
+        versjon = metadata.version('ung-dataverktoey')
+    except metadata.PackageNotFoundError:
+        versjon = None
+    status = _git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'tidspunkt': datetime.now(timezone.utc).isoformat(),
+        'versjon': versjon,
+        'commit': _git('rev-parse', 'HEAD'),
+        'ucommittede_endringer': bool(status) if status is not None else None,
+        'python': platform.python_version(),
+        'plattform': platform.platform(),
+        'kjerner': os.cpu_count(),
+    }
+
+
+def _er_noekkel(verdi: Any) -> bool:
+    return isinstance(verdi, (str, int)) and not isinstance(verdi, bool)
+
+
+def _flat(verdi: Any, sti: str = '') -> Dict[str, float]:
+    # Tall i nøstede resultater får stien dit som nøkkel. En rad i en liste identifiseres av tekst- og
+    # heltallsfeltene sine, f.eks. klasse og kilde, og desimaltallene i raden er målingene.
+    if isinstance(verdi, bool) or verdi is None:
+        return {}
+    if isinstance(verdi, (int, float)):
+        return {sti: float(verdi)}
+    tall: Dict[str, float] = {}
+    if isinstance(verdi, dict):
+        for navn, underverdi in verdi.items():
+            if navn not in ('metadata', 'oppsett'):
+                tall.update(_flat(underverdi, f'{sti}.{navn}' if sti else str(navn)))
+    elif isinstance(verdi, list):
+        for nr, rad in enumerate(verdi):
+            if not isinstance(rad, dict):
+                continue
+            noekkel = '/'.join(str(felt) for felt in rad.values() if _er_noekkel(felt)) or str(nr)
+            tall.update(_flat({navn: felt for navn, felt in rad.items() if not _er_noekkel(felt)}, f'{sti}[{noekkel}]'))
+    return tall
+
+
+def sammenlign_kjoeringer(gammel: Dict, ny: Dict, terskel: float = 0.1) -> pd.DataFrame:
+    """
+    Sammenligner to resultater fra samme benchmark, f.eks. lagret med utfil før og etter en endring.
+
+    Alle tall i resultatene sammenlignes, utenom metadata og oppsett. Et tall som inneholder 'sekunder'
+    eller 'minne' i navnet, er forverret når det har økt med mer enn terskel. Sammenlign helst
+    kjøringer fra samme maskin, se metadata i resultatene.
+
+    Parameters
+    ----------
+    gammel, ny : Dict
+        Resultatene, f.eks. lest med json.load.
+    terskel : float, optional
+        Relativ endring som regnes som mer enn støy (default er 0.1, altså 10 %).
+
+    Returns
+    -------
+    pd.DataFrame
+        Én rad per måling med gammel og ny verdi, endring i prosent og om målingen er forverret.
+        Målinger som bare finnes i det ene resultatet, har NaN for det andre.
+    """
+    sammenligning = pd.DataFrame({'gammel': _flat(gammel), 'ny': _flat(ny)}, dtype=float)
+    endring = sammenligning['ny'] / sammenligning['gammel'] - 1
+    sammenligning['endring_prosent'] = endring * 100
+    lavere_er_bedre = sammenligning.index.str.contains('sekunder|minne')
+    sammenligning['forverret'] = lavere_er_bedre & (endring > terskel).to_numpy()
+    return sammenligning
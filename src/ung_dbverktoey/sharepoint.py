@@ -1,17 +1,121 @@
 from ung_dbverktoey.hemmeligheter import Tilgangskontroll
+from ung_dbverktoey.sporing import spenn
+from concurrent.futures import ThreadPoolExecutor
 from msal import ConfidentialClientApplication
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional
+import contextvars
 import httpx
 import io
+import math
+import time
+
+GRAPH_URL = 'https://graph.microsoft.com/v1.0'
+# Lengste ventetid i sekunder mellom to forsøk, uansett hva Retry-After sier
+MAKS_VENTETID = 60.0
+
+
+def ventetid(response: httpx.Response, forsoek: int, maks_ventetid: float = MAKS_VENTETID) -> float:
+    """
+    Returnerer sekunder å vente etter et strupet svar. Retry-After kan være sekunder eller en HTTP-dato.
+    Mangler den eller kan den ikke tolkes, ventes 1, 2, 4, ... sekunder etter forsøk 1, 2, 3, ...
+    Ventetiden er mellom 0 og maks_ventetid.
+    """
+    verdi = response.headers.get('Retry-After')
+    sekunder = None
+    if verdi is not None:
+        try:
+            sekunder = float(verdi)
+        except ValueError:
+            try:
+                tidspunkt = parsedate_to_datetime(verdi)
+            except (TypeError, ValueError):
+                tidspunkt = None
+            if tidspunkt is not None:
+                if tidspunkt.tzinfo is None:
+                    tidspunkt = tidspunkt.replace(tzinfo=timezone.utc)
+                sekunder = (tidspunkt - datetime.now(timezone.utc)).total_seconds()
+    if sekunder is None or math.isnan(sekunder):
+        sekunder = 2.0 ** (forsoek - 1)
+    return min(max(sekunder, 0.0), maks_ventetid)
+
+
+def send_med_forsoek(send: Callable[[], httpx.Response],
+                     maks_forsoek: int = 3,
+                     maks_ventetid: float = MAKS_VENTETID) -> httpx.Response:
+    """
+    Kaller send på nytt så lenge svaret er 429 eller 503, etter ventetiden Graph ber om.
+
+    Returns
+    -------
+    httpx.Response
+        Det første svaret som ikke er strupet, eller det siste svaret etter maks_forsoek forsøk.
+    """
+    for forsoek in range(1, maks_forsoek + 1):
+        response = send()
+        if response.status_code not in (429, 503) or forsoek == maks_forsoek:
+            break
+        time.sleep(ventetid(response, forsoek, maks_ventetid))
+    return response
+
 
 class SharepointConnector:
 
-    def __init__(self) -> None:
-        self.tilgang = Tilgangskontroll()
-        self.autentiserings_token = self.autentiser_mot_servicebruker(
-            self.tilgang.hemmeligheter['sharepoint_ung_client_id'],
-            self.tilgang.hemmeligheter['sharepoint_ung_tenant_id'],
-            self.tilgang.hemmeligheter['sharepoint_ung_client_secret']
-        )
+    def __init__(self,
+                 autentiserings_token: Optional[str] = None,
+                 klient: Optional[httpx.Client] = None,
+                 graph_url: str = GRAPH_URL,
+                 maks_forsoek: int = 3,
+                 maks_ventetid: float = MAKS_VENTETID) -> None:
+        """
+        Parameters
+        ----------
+        autentiserings_token : str, optional
+            Token for Graph. Hvis None autentiseres det med servicebrukeren fra hemmelighetene.
+        klient : httpx.Client, optional
+            Klient som deles av alle kall, slik at tilkoblingene gjenbrukes. Hvis None lages en ny.
+        graph_url : str, optional
+            Adressen til Graph (default er GRAPH_URL).
+        maks_forsoek : int, optional
+            Maks antall forsøk når Graph struper kallene med 429 eller 503 (default er 3).
+        maks_ventetid : float, optional
+            Lengste ventetid i sekunder mellom to forsøk, uansett hva Retry-After sier (default er MAKS_VENTETID).
+        """
+        self.graph_url = graph_url
+        self.maks_forsoek = maks_forsoek
+        self.maks_ventetid = maks_ventetid
+        self.klient = klient or httpx.Client(follow_redirects=True)
+        self._omraade_ider: Dict[str, str] = {}
+        if autentiserings_token is None:
+            self.tilgang = Tilgangskontroll()
+            autentiserings_token = self.autentiser_mot_servicebruker(
+                self.tilgang.hemmeligheter['sharepoint_ung_client_id'],
+                self.tilgang.hemmeligheter['sharepoint_ung_tenant_id'],
+                self.tilgang.hemmeligheter['sharepoint_ung_client_secret']
+            )
+        self.autentiserings_token = autentiserings_token
+
+    def _send(self, metode: str, url: str, gjenta: bool = True, **kwargs) -> httpx.Response:
+        """
+        Sender en forespørsel med den felles klienten, og prøver på nytt etter Retry-After ved struping.
+        Med gjenta=False sendes den bare én gang, for kall som ikke trygt kan gjentas.
+        """
+        with spenn(f"SharepointConnector {metode}", url=httpx.URL(url).path) as forespoersel:
+            forsoek = 0
+
+            def send() -> httpx.Response:
+                nonlocal forsoek
+                forsoek += 1
+                response = self.klient.request(metode, url, **kwargs)
+                forespoersel.sett("status", response.status_code)
+                forespoersel.sett("forsoek", forsoek)
+                return response
+
+            return send_med_forsoek(send, self.maks_forsoek if gjenta else 1, self.maks_ventetid)
+
+    def lukk(self) -> None:
+        self.klient.close()
 
     def autentiser_mot_servicebruker(self, client_id, tenant_id, client_secret):
         """
@@ -32,14 +136,17 @@ class SharepointConnector:
         """
         if autentiserings_token is None:
             autentiserings_token = self.autentiserings_token
+        if omraade_url in self._omraade_ider:
+            return self._omraade_ider[omraade_url]
 
         headers = {
             'Authorization': f'Bearer {autentiserings_token}'
         }
-        site_url = f'https://graph.microsoft.com/v1.0/sites/navno.sharepoint.com:/sites/{omraade_url}'
-        response = httpx.get(site_url, headers=headers, follow_redirects=True)
+        site_url = f'{self.graph_url}/sites/navno.sharepoint.com:/sites/{omraade_url}'
+        response = self._send('GET', site_url, headers=headers)
         if response.status_code == 200:
             site = response.json()
+            self._omraade_ider[omraade_url] = site['id']
             return site['id']
         else:
             raise Exception(f"Error fetching site ID: {response.status_code} - {response.text}")
@@ -56,8 +163,8 @@ class SharepointConnector:
         headers = {
             'Authorization': f'Bearer {autentiserings_token}'
         }
-        file_url = f'https://graph.microsoft.com/v1.0/sites/{omraade_id}/drive/root:/{filsti}:/content'
-        response = httpx.get(file_url, headers=headers, follow_redirects=True)
+        file_url = f'{self.graph_url}/sites/{omraade_id}/drive/root:/{filsti}:/content'
+        response = self._send('GET', file_url, headers=headers)
         if response.status_code == 200:
             data = response.content
             file_stream = io.BytesIO(data)
@@ -65,6 +172,18 @@ class SharepointConnector:
         else:
             raise Exception(f"Feil ved henting av fil: {response.status_code} - {response.text}")
 
+    def hent_mange_fra_sharepoint(self, omraade_url: str, filstier: List[str], maks_samtidighet: int = 4,
+                                  autentiserings_token: Optional[str] = None) -> Dict[str, io.BytesIO]:
+        """
+        Henter flere filer fra samme Sharepoint-område samtidig over de samme tilkoblingene.
+        """
+        # Områdeid hentes én gang før filene hentes i parallell
+        self.hent_omraade_id(omraade_url, autentiserings_token)
+        with ThreadPoolExecutor(max_workers=maks_samtidighet) as utfoerer:
+            # Hver fil hentes i en kopi av konteksten, så spennene havner under kallerens spenn
+            filer = [utfoerer.submit(contextvars.copy_context().run, self.hent_data_fra_sharepoint,
+                                     omraade_url, filsti, autentiserings_token) for filsti in filstier]
+            return {filsti: fil.result() for filsti, fil in zip(filstier, filer)}
 
     def send_email_med_servicekonto(self, subject, body, mottakere, avsender_epost, cc_mottakere=None, autentiserings_token=None):
         """
@@ -99,8 +218,9 @@ class SharepointConnector:
         }
 
         user_id = avsender_epost 
-        send_mail_url = f'https://graph.microsoft.com/v1.0/users/{user_id}/sendMail'
-        response = httpx.post(send_mail_url, headers=headers, json=email_data)
+        send_mail_url = f'{self.graph_url}/users/{user_id}/sendMail'
+        # sendMail gjentas ikke, siden et kall som ble strupet etter at e-posten var sendt, ville gitt en kopi
+        response = self._send('POST', send_mail_url, gjenta=False, headers=headers, json=email_data)
 
         if response.status_code == 202:
             print("Email sent successfully.")
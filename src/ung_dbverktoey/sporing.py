@@ -0,0 +1,356 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+
+class Spenn:
+    """
+    Ett tidsintervall i en sporing, f.eks. én spørring eller bygging av én dataserie.
+
+    Spenn lages med spenn() eller @sporet, ikke direkte.
+    """
+    def __init__(self, navn: str, spenn_id: int, forelder_id: Optional[int], attributter: Dict[str, Any]) -> None:
+        self.navn = navn
+        self.spenn_id = spenn_id
+        self.forelder_id = forelder_id
+        self.attributter = attributter
+        self.traad_id = threading.get_ident()
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.slutt_ns: Optional[int] = None
+        self.feil: Optional[str] = None
+
+    @property
+    def varighet_ns(self) -> int:
+        if self.slutt_ns is None:
+            return time.perf_counter_ns() - self._start_perf
+        return self.slutt_ns - self.start_ns
+
+    def sett(self, navn: str, verdi: Any) -> None:
+        """
+        Legger til et attributt, f.eks. antall rader som ble hentet.
+        """
+        self.attributter[navn] = verdi
+
+    def _avslutt(self) -> None:
+        # Varigheten måles med perf_counter, som er mer nøyaktig enn klokketiden
+        self.slutt_ns = self.start_ns + (time.perf_counter_ns() - self._start_perf)
+
+    def som_dict(self) -> Dict[str, Any]:
+        return {
+            'navn': self.navn,
+            'spenn_id': self.spenn_id,
+            'forelder_id': self.forelder_id,
+            'traad_id': self.traad_id,
+            'start_ns': self.start_ns,
+            'slutt_ns': self.slutt_ns,
+            'varighet_ms': self.varighet_ns / 1e6,
+            'attributter': self.attributter,
+            'feil': self.feil,
+        }
+
+
+class _InaktivtSpenn:
+    # Brukes når sporing ikke er startet, slik at koden som sporer ikke trenger å sjekke det
+    def sett(self, navn: str, verdi: Any) -> None:
+        pass
+
+
+_INAKTIVT_SPENN = _InaktivtSpenn()
+
+
+class Eksportoer(ABC):
+    """
+    Felles grensesnitt for å eksportere spennene i en sporing når den stoppes.
+    """
+    @abstractmethod
+    def eksporter(self, sporing: "Sporing") -> None:
+        """
+        Eksporterer alle spennene i sporingen, som er stoppet.
+        """
+
+
+class JsonEksportoer(Eksportoer):
+    """
+    Lagrer sporingen som JSON i Trace Event-formatet, som kan åpnes som en flammegraf-tidslinje
+    i f.eks. https://ui.perfetto.dev eller chrome://tracing. Spennene ligger også med alle feltene
+    under 'spenn'.
+
+    Parameters
+    ----------
+    filnavn : str
+        Stien til JSON-filen.
+    """
+    def __init__(self, filnavn: str) -> None:
+        self.filnavn = filnavn
+
+    def eksporter(self, sporing: "Sporing") -> None:
+        with open(self.filnavn, 'w', encoding='utf-8') as f:
+            json.dump(sporing.som_dict(), f, indent=2, default=str)
+
+
+class OpenTelemetryEksportoer(Eksportoer):
+    """
+    Sender spennene videre til OpenTelemetry med samme start, slutt, foreldre og attributter,
+    slik at de kan eksporteres med OpenTelemetry sine egne eksportører.
+
+    Krever opentelemetry-api, og opentelemetry-sdk med en konfigurert TracerProvider for å sende dem videre.
+
+    Parameters
+    ----------
+    tracer : optional
+        Tracer fra opentelemetry.trace. Hvis None brukes trace.get_tracer("ung_dataverktoey").
+    """
+    def __init__(self, tracer=None) -> None:
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetryEksportoer krever opentelemetry-api.") from e
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("ung_dataverktoey")
+
+    def eksporter(self, sporing: "Sporing") -> None:
+        otel_spenn = {}
+        # Spennene sorteres etter start, så foreldrene alltid er laget før barna
+        for spenn in sorted(sporing.spenn, key=lambda spenn: spenn.start_ns):
+            forelder = otel_spenn.get(spenn.forelder_id)
+            kontekst = self._trace.set_span_in_context(forelder) if forelder is not None else None
+            attributter = {navn: verdi if isinstance(verdi, (str, bool, int, float)) else str(verdi)
+                           for navn, verdi in spenn.attributter.items()}
+            otel = self.tracer.start_span(spenn.navn, context=kontekst, start_time=spenn.start_ns, attributes=attributter)
+            if spenn.feil is not None:
+                otel.set_status(self._trace.Status(self._trace.StatusCode.ERROR, spenn.feil))
+            otel_spenn[spenn.spenn_id] = otel
+        for spenn in sporing.spenn:
+            otel_spenn[spenn.spenn_id].end(end_time=spenn.slutt_ns)
+
+
+class Sporing:
+    """
+    Samler spennene fra én kjøring, f.eks. en nattlig jobb eller en datafortelling.
+
+    Parameters
+    ----------
+    navn : str
+        Navnet på kjøringen, som også blir rotspennet.
+    eksportoerer : Sequence[Eksportoer], optional
+        Eksportørene som får sporingen når den stoppes.
+    """
+    def __init__(self, navn: str, eksportoerer: Optional[Sequence[Eksportoer]] = None) -> None:
+        self.navn = navn
+        self.eksportoerer = list(eksportoerer or [])
+        self.spenn: List[Spenn] = []
+        self._laas = threading.Lock()
+        self._teller = itertools.count(1)
+        self._rot: Optional[Spenn] = None
+        self._rot_token: Optional[contextvars.Token] = None
+        self._stoppet = False
+
+    def _nytt_spenn(self, navn: str, forelder_id: Optional[int], attributter: Dict[str, Any]) -> Spenn:
+        # Spenn fra tråder som startes etter at sporingen er stoppet, tas ikke med, så listen ikke
+        # endres mens eksportørene leser den
+        with self._laas:
+            spenn = Spenn(navn, next(self._teller), forelder_id, attributter)
+            if not self._stoppet:
+                self.spenn.append(spenn)
+        return spenn
+
+    def _stopp(self) -> None:
+        with self._laas:
+            self._stoppet = True
+
+    def som_dict(self) -> Dict[str, Any]:
+        """
+        Returnerer sporingen i Trace Event-formatet, med spennene i tillegg under 'spenn'.
+        """
+        start = min((spenn.start_ns for spenn in self.spenn), default=0)
+        hendelser = [{
+            'name': spenn.navn,
+            'ph': 'X',
+            'ts': (spenn.start_ns - start) / 1e3,
+            'dur': spenn.varighet_ns / 1e3,
+            'pid': os.getpid(),
+            'tid': spenn.traad_id,
+            'args': {**spenn.attributter, **({'feil': spenn.feil} if spenn.feil else {})},
+        } for spenn in self.spenn]
+        return {
+            'traceEvents': hendelser,
+            'displayTimeUnit': 'ms',
+            'navn': self.navn,
+            'spenn': [spenn.som_dict() for spenn in self.spenn],
+        }
+
+    def tidslinje(self, bredde: int = 40) -> str:
+        """
+        Returnerer en tekstlig flammegraf der hvert spenn er en linje med innrykk etter nivå
+        og en stolpe som viser når det startet og hvor lenge det varte.
+        """
+        if not self.spenn:
+            return ''
+        start = min(spenn.start_ns for spenn in self.spenn)
+        total = max(spenn.start_ns + spenn.varighet_ns for spenn in self.spenn) - start or 1
+        barn: Dict[Optional[int], List[Spenn]] = {}
+        for spenn in sorted(self.spenn, key=lambda spenn: spenn.start_ns):
+            barn.setdefault(spenn.forelder_id, []).append(spenn)
+
+        linjer = []
+
+        def skriv(spenn: Spenn, nivaa: int) -> None:
+            fra = int((spenn.start_ns - start) / total * bredde)
+            lengde = max(1, round(spenn.varighet_ns / total * bredde))
+            stolpe = (' ' * fra + '█' * lengde).ljust(bredde)[:bredde]
+            navn = ('  ' * nivaa + spenn.navn)[:40]
+            linjer.append(f"{navn:<40} |{stolpe}| {spenn.varighet_ns / 1e6:10.1f} ms")
+            for barnet in barn.get(spenn.spenn_id, []):
+                skriv(barnet, nivaa + 1)
+
+        kjente = {spenn.spenn_id for spenn in self.spenn}
+        for spenn in sorted(self.spenn, key=lambda spenn: spenn.start_ns):
+            if spenn.forelder_id not in kjente:
+                skriv(spenn, 0)
+        return '\n'.join(linjer)
+
+
+_aktiv_sporing: Optional[Sporing] = None
+# Beskytter start og stopp av den aktive sporingen. Spennene i en sporing beskyttes av Sporing._laas.
+_sporing_laas = threading.Lock()
+_aktivt_spenn: contextvars.ContextVar[Optional[Spenn]] = contextvars.ContextVar('aktivt_spenn', default=None)
+
+
+def aktiv_sporing() -> Optional[Sporing]:
+    return _aktiv_sporing
+
+
+@contextmanager
+def spenn(navn: str, **attributter: Any) -> Iterator[Any]:
+    """
+    Måler tiden for koden i blokken som et spenn i den aktive sporingen.
+
+    Uten aktiv sporing gjøres ingenting, og spennet som gis er et tomt objekt der sett() ikke har noen virkning.
+
+    Examples
+    --------
+    >>> with spenn('kjoer_spoerring', database='bq') as s:
+    ...     df = ...
+    ...     s.sett('rader', len(df))
+    """
+    sporing = _aktiv_sporing
+    if sporing is None:
+        yield _INAKTIVT_SPENN
+        return
+    # Spenn i andre tråder, f.eks. fra ThreadPoolExecutor, havner under rotspennet hvis ikke oppgaven
+    # kjøres med contextvars.copy_context().run, slik kjoer_spoerringer og hent_mange_fra_sharepoint gjør
+    forelder = _aktivt_spenn.get() or sporing._rot
+    nytt = sporing._nytt_spenn(navn, forelder.spenn_id if forelder is not None else None, attributter)
+    token = _aktivt_spenn.set(nytt)
+    try:
+        yield nytt
+    except BaseException as e:
+        nytt.feil = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        nytt._avslutt()
+        _aktivt_spenn.reset(token)
+
+
+def sporet(navn: Optional[str] = None) -> Callable:
+    """
+    Dekoratør som måler hvert kall til funksjonen som et spenn. navn er funksjonens qualname hvis None.
+    """
+    def dekoratoer(funksjon: Callable) -> Callable:
+        spenn_navn = navn or funksjon.__qualname__
+
+        @functools.wraps(funksjon)
+        def innpakket(*args, **kwargs):
+            if _aktiv_sporing is None:
+                return funksjon(*args, **kwargs)
+            with spenn(spenn_navn):
+                return funksjon(*args, **kwargs)
+        return innpakket
+    return dekoratoer
+
+
+def start_sporing(navn: str = 'kjoering', eksportoerer: Optional[Sequence[Eksportoer]] = None) -> Sporing:
+    """
+    Starter sporing for resten av prosessen, til stopp_sporing kalles.
+
+    Spenn fra alle tråder i prosessen samles. Spenn fra andre prosesser, f.eks. prosessene i
+    bygg_parallelt, samles ikke. Der er det bare kallet i hovedprosessen som blir et spenn.
+
+    Parameters
+    ----------
+    navn : str, optional
+        Navnet på kjøringen (default er 'kjoering').
+    eksportoerer : Sequence[Eksportoer], optional
+        F.eks. [JsonEksportoer('sporing.json')].
+
+    Returns
+    -------
+    Sporing
+        Sporingen som spennene samles i.
+    """
+    global _aktiv_sporing
+    ny = Sporing(navn, eksportoerer)
+    # Rotspennet holdes åpent til sporingen stoppes, slik at alle spenn i denne konteksten havner under det
+    ny._rot = ny._nytt_spenn(navn, None, {})
+    with _sporing_laas:
+        if _aktiv_sporing is not None:
+            raise RuntimeError(f"Sporingen {_aktiv_sporing.navn} er allerede startet.")
+        _aktiv_sporing = ny
+    ny._rot_token = _aktivt_spenn.set(ny._rot)
+    return ny
+
+
+def stopp_sporing() -> Optional[Sporing]:
+    """
+    Stopper sporingen og sender den til eksportørene.
+
+    Returns
+    -------
+    Optional[Sporing]
+        Sporingen, eller None hvis ingen sporing var startet.
+    """
+    global _aktiv_sporing
+    with _sporing_laas:
+        sporing = _aktiv_sporing
+        if sporing is None:
+            return None
+        _aktiv_sporing = None
+    sporing._stopp()
+    sporing._rot._avslutt()
+    try:
+        _aktivt_spenn.reset(sporing._rot_token)
+    except (ValueError, RuntimeError):
+        # Stoppet i en annen kontekst enn den ble startet i, f.eks. en annen celle i en notebook
+        _aktivt_spenn.set(None)
+    for spenn in sporing.spenn:
+        if spenn.slutt_ns is None:
+            spenn._avslutt()
+    for eksportoer in sporing.eksportoerer:
+        eksportoer.eksporter(sporing)
+    return sporing
+
+
+@contextmanager
+def sporing(navn: str = 'kjoering', eksportoerer: Optional[Sequence[Eksportoer]] = None) -> Iterator[Sporing]:
+    """
+    Sporer alt som kjøres i blokken og eksporterer det til slutt.
+
+    Examples
+    --------
+    >>> with sporing('nattlig_jobb', [JsonEksportoer('sporing.json')]) as s:
+    ...     df = kjoer_spoerring(sql, 'bq')
+    >>> print(s.tidslinje())
+    """
+    aktiv = start_sporing(navn, eksportoerer)
+    try:
+        yield aktiv
+    finally:
+        stopp_sporing()
@@ -0,0 +1,116 @@
+import pickle
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from ung_mlverktoey.cache import SentimentCache
+from ung_mlverktoey.forbehandling import normaliser_tekster
+
+
+class SentimentBackend(ABC):
+    """
+    Felles grensesnitt for klassifikatorer som kan svare før LLM-en i SentimentModel.
+
+    En backend klassifiserer mange tekster i ett kall og oppgir hvor sikker den er per tekst,
+    slik at tekster med lav sikkerhet kan sendes videre til LLM-en.
+    """
+    @abstractmethod
+    def klassifiser(self, tekster: Iterable[str]) -> pd.DataFrame:
+        """
+        Klassifiserer tekstene.
+
+        Parameters
+        ----------
+        tekster : Iterable[str]
+            Tekstene som skal klassifiseres.
+
+        Returns
+        -------
+        pd.DataFrame
+            Kolonnene 'sentiment' og 'sikkerhet' (mellom 0 og 1), én rad per tekst i samme rekkefølge.
+        """
+
+
+class TfidfBackend(SentimentBackend):
+    """
+    Lett lokal klassifikator med TF-IDF på tegn-n-gram og logistisk regresjon.
+
+    Trenes på sentimenter som LLM-en allerede har satt, f.eks. fra en SentimentCache, og
+    klassifiserer tusenvis av tekster i sekundet på CPU.
+
+    Parameters
+    ----------
+    ngram_range : tuple, optional
+        Lengden på tegn-n-grammene (default er (2, 5)).
+    min_df : int, optional
+        Minste antall tekster et n-gram må finnes i (default er 1).
+    C : float, optional
+        Regulariseringsparameter til den logistiske regresjonen (default er 4.0).
+    """
+    def __init__(self, ngram_range: tuple = (2, 5), min_df: int = 1, C: float = 4.0) -> None:
+        self.ngram_range = ngram_range
+        self.min_df = min_df
+        self.C = C
+        self.modell: Optional[Pipeline] = None
+
+    def _lag_modell(self) -> Pipeline:
+        return Pipeline([
+            ('tfidf', TfidfVectorizer(analyzer='char_wb', ngram_range=self.ngram_range,
+                                      min_df=self.min_df, sublinear_tf=True)),
+            ('klassifikator', LogisticRegression(C=self.C, max_iter=1000, class_weight='balanced')),
+        ])
+
+    def _forbered(self, tekster: Iterable[str]) -> pd.Series:
+        # Samme normalisering som dedupliseringen, slik at tekster fra cachen og nye tekster ser like ut
+        return normaliser_tekster(pd.Series(list(tekster), dtype=object)).fillna('')
+
+    def tren(self, tekster: Iterable[str], sentimenter: Iterable[str]) -> "TfidfBackend":
+        """
+        Trener klassifikatoren på tekster med kjent sentiment.
+
+        Raises
+        ------
+        ValueError
+            Hvis treningsdataene har færre enn to ulike sentimenter.
+        """
+        sentimenter = pd.Series(list(sentimenter), dtype=object)
+        if sentimenter.nunique() < 2:
+            raise ValueError("Treningsdataene må ha minst to ulike sentimenter.")
+        modell = self._lag_modell()
+        modell.fit(self._forbered(tekster), sentimenter)
+        self.modell = modell
+        return self
+
+    def tren_fra_cache(self, cache: SentimentCache, modell: str, prompt: Optional[str] = None) -> "TfidfBackend":
+        """
+        Trener på alle sentimenter i cachen fra gitt modell, eventuelt bare fra én prompt.
+        """
+        df = cache.hent_alle(modell, prompt)
+        return self.tren(df['tekst'], df['sentiment'])
+
+    def klassifiser(self, tekster: Iterable[str]) -> pd.DataFrame:
+        if self.modell is None:
+            raise ValueError("TfidfBackend må trenes før bruk, se tren og tren_fra_cache.")
+        tekster = self._forbered(tekster)
+        if tekster.empty:
+            return pd.DataFrame({'sentiment': pd.Series(dtype=object), 'sikkerhet': pd.Series(dtype=float)})
+        sannsynligheter = self.modell.predict_proba(tekster)
+        beste = sannsynligheter.argmax(axis=1)
+        return pd.DataFrame({
+            'sentiment': self.modell.classes_[beste],
+            'sikkerhet': sannsynligheter[np.arange(len(beste)), beste],
+        })
+
+    def lagre(self, filnavn: str) -> None:
+        with open(filnavn, 'wb') as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def last(cls, filnavn: str) -> "TfidfBackend":
+        with open(filnavn, 'rb') as f:
+            return pickle.load(f)
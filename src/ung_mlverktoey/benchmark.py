@@ -0,0 +1,372 @@
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import metadata
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from langchain_core.callbacks import BaseCallbackHandler
+
+from ung_mlverktoey.sentiment import MODELL_FEILET, SENTIMENTER, SentimentModel
+
+
+# Enkle nøkkelord for den lokale serveren, slik at svarene ligner på en ekte modell
+POSITIVE_ORD = ('bra', 'god', 'flott', 'fornøyd', 'takk', 'glad', 'good', 'great', 'happy')
+NEGATIVE_ORD = ('dårlig', 'ikke bra', 'elendig', 'misfornøyd', 'vanskelig', 'treg', 'bad', 'poor', 'slow')
+
+
+def _enkel_klassifisering(tekst: str) -> str:
+    tekst = tekst.casefold()
+    positiv = any(ord_ in tekst for ord_ in POSITIVE_ORD)
+    negativ = any(ord_ in tekst for ord_ in NEGATIVE_ORD)
+    if positiv and negativ:
+        return 'Mixed'
+    if positiv:
+        return 'Positive'
+    if negativ:
+        return 'Negative'
+    return 'Neutral'
+
+
+class LokalOllamaServer:
+    """
+    Lokal erstatning for Ollama som svarer på /api/chat, for benchmark og testing uten modellserver.
+
+    Serveren finner tekstene i prompten til SENTIMENT_ANALYSE og SENTIMENT_ANALYSE_PAKKET og svarer
+    med JSON i samme format som modellen. Antall tokens anslås som antall ord.
+
+    Tekstene klassifiseres med enkle nøkkelord, så svarene er de samme fra gang til gang og uavhengige
+    av fasiten. Treffsikkerheten mot serveren sier derfor ingenting om en ekte modell, men et fall
+    viser at tekster eller svar blir borte eller blandet på veien gjennom vår egen kode.
+
+    Parameters
+    ----------
+    forsinkelse : float, optional
+        Ventetid i sekunder per kall, for å etterligne modellens svartid (default er 0.0).
+    """
+    def __init__(self, forsinkelse: float = 0.0) -> None:
+        self.forsinkelse = forsinkelse
+        self.antall_kall = 0
+        self._laas = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._lag_handler())
+        self._server.daemon_threads = True
+        self._traad: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        vert, port = self._server.server_address[:2]
+        return f"http://{vert}:{port}"
+
+    def klassifiser(self, tekst: str) -> str:
+        return _enkel_klassifisering(' '.join(tekst.split()))
+
+    def svar(self, prompt: str) -> str:
+        if '### The texts, one per numbered line' in prompt:
+            blokk = prompt.split('### The texts, one per numbered line', 1)[1].split('###', 1)[0]
+            linjer = re.findall(r'^\s*(\d+)\.\s?(.*)$', blokk, re.MULTILINE)
+            return json.dumps([{'id': int(nr), 'sentiment': self.klassifiser(tekst)} for nr, tekst in linjer])
+        treff = re.search(r'### The text:\s*(.*?)\s*###', prompt, re.DOTALL)
+        tekst = treff.group(1) if treff else prompt
+        return json.dumps({'sentiment': self.klassifiser(tekst)})
+
+    def _lag_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                lengde = int(self.headers.get('Content-Length', 0))
+                forespoersel = json.loads(self.rfile.read(lengde) or b'{}')
+                if self.path.rstrip('/') != '/api/chat':
+                    self.send_error(404)
+                    return
+                with server._laas:
+                    server.antall_kall += 1
+                if server.forsinkelse:
+                    time.sleep(server.forsinkelse)
+                prompt = '\n'.join(str(melding.get('content', '')) for melding in forespoersel.get('messages', []))
+                innhold = server.svar(prompt)
+                felles = {
+                    'model': forespoersel.get('model', ''),
+                    'created_at': datetime.now(timezone.utc).isoformat(),
+                }
+                slutt = {
+                    **felles,
+                    'message': {'role': 'assistant', 'content': ''},
+                    'done': True,
+                    'done_reason': 'stop',
+                    'total_duration': int(server.forsinkelse * 1e9),
+                    'prompt_eval_count': len(prompt.split()),
+                    'eval_count': len(innhold.split()),
+                }
+                if forespoersel.get('stream', True):
+                    linjer = [{**felles, 'message': {'role': 'assistant', 'content': innhold}, 'done': False}, slutt]
+                    kropp = ''.join(json.dumps(linje) + '\n' for linje in linjer).encode('utf-8')
+                    innholdstype = 'application/x-ndjson'
+                else:
+                    kropp = json.dumps({**slutt, 'message': {'role': 'assistant', 'content': innhold}}).encode('utf-8')
+                    innholdstype = 'application/json'
+                self.send_response(200)
+                self.send_header('Content-Type', innholdstype)
+                self.send_header('Content-Length', str(len(kropp)))
+                self.end_headers()
+                self.wfile.write(kropp)
+
+        return Handler
+
+    def start(self) -> "LokalOllamaServer":
+        self._traad = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._traad.start()
+        return self
+
+    def stopp(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "LokalOllamaServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stopp()
+
+
+class _Svartider(BaseCallbackHandler):
+    """
+    Måler tiden for hvert modellkall, fra forespørselen starter til svaret er mottatt.
+    """
+    def __init__(self) -> None:
+        self.svartider: List[float] = []
+        self._start: Dict = {}
+        self._laas = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start[run_id] = time.perf_counter()
+
+    def _slutt(self, run_id) -> None:
+        start = self._start.pop(run_id, None)
+        if start is not None:
+            with self._laas:
+                self.svartider.append(time.perf_counter() - start)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        self._slutt(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._slutt(run_id)
+
+
+def forvirringsmatrise(fasit: pd.Series, prediksjon: pd.Series) -> pd.DataFrame:
+    """
+    Forvirringsmatrise med fasit som rader og prediksjon som kolonner, over de fire klassene
+    og 'Model failed' for tekster uten gyldig svar.
+    """
+    prediksjon_klasser = list(SENTIMENTER) + [MODELL_FEILET]
+    return (
+        pd.crosstab(pd.Series(fasit.values, name='fasit'), pd.Series(prediksjon.values, name='prediksjon'))
+        .reindex(index=list(SENTIMENTER), columns=prediksjon_klasser, fill_value=0)
+        .astype(int)
+    )
+
+
+def _versjon() -> Optional[str]:
+    try:
+        return metadata.version('ung-dataverktoey')
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def kjoer_benchmark(eksempelfil: str,
+                    tekst_kolonne: str = 'tekst',
+                    fasit_kolonne: str = 'fasit',
+                    modell: str = 'llama3.2',
+                    pakke_stoerrelse: int = 1,
+                    batch_stoerrelse: int = 256,
+                    maks_samtidighet: int = 4,
+                    lokal_server: bool = True,
+                    forsinkelse: float = 0.0,
+                    base_url: Optional[str] = None,
+                    utfil: Optional[str] = None) -> Dict:
+    """
+    Kjører SentimentModel på et merket utvalg og måler treffsikkerhet og gjennomstrømning.
+
+    Med lokal_server=True går kallene til LokalOllamaServer i stedet for Ollama, slik at
+    benchmarken kan kjøres uten modellserver. Tallene måler da overhead i vår egen kode
+    (prompt, batching, tolkning) og ikke modellen, og treffsikkerheten er for nøkkelordene
+    i serveren og bare meningsfull mot en ekte modell. Deduplisering og cache er slått av, slik
+    at alle tekster sendes til modellen.
+
+    Parameters
+    ----------
+    eksempelfil : str
+        CSV- eller Excel-fil med tekst og fasit per rad.
+    tekst_kolonne : str, optional
+        Kolonnen med tekst (default er 'tekst').
+    fasit_kolonne : str, optional
+        Kolonnen med riktig sentiment, en av 'Positive', 'Negative', 'Mixed' og 'Neutral' (default er 'fasit').
+    modell : str, optional
+        Navnet på Ollama-modellen (default er 'llama3.2').
+    pakke_stoerrelse : int, optional
+        Antall tekster per modellkall, se SentimentModel.run_batch (default er 1).
+    batch_stoerrelse : int, optional
+        Antall tekster per batch (default er 256).
+    maks_samtidighet : int, optional
+        Maks antall samtidige kall (default er 4).
+    lokal_server : bool, optional
+        Bruker LokalOllamaServer, som svarer med enkle nøkkelord, i stedet for Ollama (default er True).
+    forsinkelse : float, optional
+        Ventetid per kall i den lokale serveren, i sekunder (default er 0.0).
+    base_url : str, optional
+        Adressen til Ollama når lokal_server=False.
+    utfil : str, optional
+        Lagrer resultatet som JSON i denne filen.
+
+    Returns
+    -------
+    Dict
+        Resultatet med metadata, gjennomstrømning, svartider (p50/p95), tokens,
+        treffsikkerhet og forvirringsmatrise. Kan sammenlignes med sammenlign_resultater.
+    """
+    if eksempelfil.endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(eksempelfil)
+    else:
+        df = pd.read_csv(eksempelfil)
+    tekster = df[tekst_kolonne].astype(str)
+    fasit = df[fasit_kolonne].astype(str).str.strip().str.capitalize()
+
+    server = None
+    if lokal_server:
+        server = LokalOllamaServer(forsinkelse=forsinkelse).start()
+        base_url = server.base_url
+
+    try:
+        sentiment_modell = SentimentModel(modell=modell, base_url=base_url, ventetid=0.0)
+        svartider = _Svartider()
+        sentiment_modell.llama_model.callbacks = [svartider]
+        resultat = sentiment_modell.run_batch(
+            tekster,
+            batch_stoerrelse=batch_stoerrelse,
+            maks_samtidighet=maks_samtidighet,
+            vis_fremdrift=False,
+            dedupliser=False,
+            pakke_stoerrelse=pakke_stoerrelse,
+        )
+    finally:
+        if server is not None:
+            server.stopp()
+
+    kjoering = sentiment_modell.siste_kjoering
+    prediksjon = resultat['label']
+    matrise = forvirringsmatrise(fasit, prediksjon)
+    svartider_ms = np.array(svartider.svartider) * 1000
+
+    resultater = {
+        'metadata': {
+            'tidspunkt': datetime.now(timezone.utc).isoformat(),
+            'versjon': _versjon(),
+            'modell': modell,
+            'prompt_hash': hashlib.sha256(sentiment_modell._cache_prompt(pakke_stoerrelse).encode('utf-8')).hexdigest()[:12],
+            'eksempelfil': eksempelfil,
+            'lokal_server': lokal_server,
+            'treffsikkerhet_gjelder': 'nøkkelordene i LokalOllamaServer' if lokal_server else modell,
+            'forsinkelse': forsinkelse,
+            'pakke_stoerrelse': pakke_stoerrelse,
+            'batch_stoerrelse': batch_stoerrelse,
+            'maks_samtidighet': maks_samtidighet,
+        },
+        'antall_tekster': len(tekster),
+        'sekunder': kjoering['sekunder'],
+        'tekster_per_sekund': kjoering['tekster_per_sekund'],
+        'modellkall': kjoering['modellkall'],
+        'nye_forsoek': kjoering['nye_forsoek'],
+        'fallback': kjoering['fallback'],
+        'feilet': kjoering['feilet'],
+        'svartid_ms': {
+            'p50': float(np.percentile(svartider_ms, 50)) if len(svartider_ms) else None,
+            'p95': float(np.percentile(svartider_ms, 95)) if len(svartider_ms) else None,
+        },
+        'tokens': {
+            'input': kjoering['input_tokens'],
+            'output': kjoering['output_tokens'],
+            'per_tekst': (kjoering['input_tokens'] + kjoering['output_tokens']) / len(tekster) if len(tekster) else 0.0,
+        },
+        'treffsikkerhet': float((prediksjon.values == fasit.values).mean()) if len(tekster) else 0.0,
+        'forvirringsmatrise': {fasit_klasse: rad.to_dict() for fasit_klasse, rad in matrise.iterrows()},
+    }
+
+    if utfil is not None:
+        with open(utfil, 'w', encoding='utf-8') as f:
+            json.dump(resultater, f, indent=2, ensure_ascii=False)
+    return resultater
+
+
+def sammenlign_resultater(gammel: Dict, ny: Dict) -> pd.DataFrame:
+    """
+    Sammenligner to resultater fra kjoer_benchmark, f.eks. før og etter en endring.
+
+    Returns
+    -------
+    pd.DataFrame
+        Én rad per nøkkeltall med gammel og ny verdi og endring i prosent.
+    """
+    def noekkeltall(resultat: Dict) -> Dict[str, float]:
+        return {
+            'tekster_per_sekund': resultat['tekster_per_sekund'],
+            'svartid_p50_ms': resultat['svartid_ms']['p50'],
+            'svartid_p95_ms': resultat['svartid_ms']['p95'],
+            'modellkall': resultat['modellkall'],
+            'tokens_per_tekst': resultat['tokens']['per_tekst'],
+            'treffsikkerhet': resultat['treffsikkerhet'],
+            'feilet': resultat['feilet'],
+        }
+
+    sammenligning = pd.DataFrame({'gammel': noekkeltall(gammel), 'ny': noekkeltall(ny)}, dtype=float)
+    sammenligning['endring_prosent'] = (sammenligning['ny'] / sammenligning['gammel'] - 1) * 100
+    return sammenligning
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark av sentimentklassifisering på et merket utvalg.')
+    parser.add_argument('eksempelfil', help='CSV- eller Excel-fil med tekst og fasit')
+    parser.add_argument('--tekst-kolonne', default='tekst')
+    parser.add_argument('--fasit-kolonne', default='fasit')
+    parser.add_argument('--modell', default='llama3.2')
+    parser.add_argument('--pakke-stoerrelse', type=int, default=1)
+    parser.add_argument('--maks-samtidighet', type=int, default=4)
+    parser.add_argument('--forsinkelse', type=float, default=0.0, help='Ventetid per kall i den lokale serveren')
+    parser.add_argument('--ollama', action='store_true', help='Bruk en ekte Ollama-server i stedet for den lokale')
+    parser.add_argument('--base-url', default=None)
+    parser.add_argument('--utfil', default=None)
+    parser.add_argument('--sammenlign', default=None, help='Tidligere resultatfil å sammenligne med')
+    args = parser.parse_args()
+
+    resultater = kjoer_benchmark(
+        args.eksempelfil,
+        tekst_kolonne=args.tekst_kolonne,
+        fasit_kolonne=args.fasit_kolonne,
+        modell=args.modell,
+        pakke_stoerrelse=args.pakke_stoerrelse,
+        maks_samtidighet=args.maks_samtidighet,
+        lokal_server=not args.ollama,
+        forsinkelse=args.forsinkelse,
+        base_url=args.base_url,
+        utfil=args.utfil,
+    )
+    print(json.dumps(resultater, indent=2, ensure_ascii=False))
+    if args.sammenlign is not None:
+        with open(args.sammenlign, encoding='utf-8') as f:
+            print(sammenlign_resultater(json.load(f), resultater))
+
+
+if __name__ == "__main__":
+    main()
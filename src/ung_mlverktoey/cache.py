@@ -0,0 +1,161 @@
+import hashlib
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+
+def tekst_hash(tekst: str) -> str:
+    return hashlib.sha256(str(tekst).encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    """
+    Diskbasert cache for sentimentresultater i SQLite.
+
+    Nøkkelen er hash av teksten, modellnavnet og hash av prompten, slik at en ny modell
+    eller en endret prompt gir nye oppslag i stedet for gamle resultater.
+
+    Parameters
+    ----------
+    filnavn : str, optional
+        Stien til SQLite-filen (default er "sentiment_cache.sqlite").
+    """
+    def __init__(self, filnavn: str = "sentiment_cache.sqlite") -> None:
+        self.filnavn = filnavn
+        self.treff = 0
+        self.bom = 0
+        self._tilkobling = sqlite3.connect(filnavn, check_same_thread=False)
+        self._tilkobling.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sentiment (
+                tekst_hash TEXT NOT NULL,
+                modell TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                tekst TEXT,
+                sentiment TEXT NOT NULL,
+                opprettet REAL NOT NULL,
+                PRIMARY KEY (tekst_hash, modell, prompt_hash)
+            )
+            """
+        )
+        self._tilkobling.commit()
+
+    def hent_mange(self, tekster: Iterable[str], modell: str, prompt: str) -> List[Optional[str]]:
+        """
+        Slår opp mange tekster samtidig.
+
+        Returns
+        -------
+        List[Optional[str]]
+            Sentiment per tekst i samme rekkefølge, eller None for tekster som ikke er i cachen.
+        """
+        tekster = list(tekster)
+        hasher = [tekst_hash(tekst) for tekst in tekster]
+        prompt_hash = tekst_hash(prompt)
+        funnet: Dict[str, str] = {}
+        unike = list(set(hasher))
+        # SQLite har en grense på antall parametere per spørring
+        for start in range(0, len(unike), 500):
+            del_hasher = unike[start:start + 500]
+            plassholdere = ",".join("?" * len(del_hasher))
+            rader = self._tilkobling.execute(
+                f"SELECT tekst_hash, sentiment FROM sentiment "
+                f"WHERE modell = ? AND prompt_hash = ? AND tekst_hash IN ({plassholdere})",
+                [modell, prompt_hash, *del_hasher],
+            ).fetchall()
+            funnet.update(rader)
+        resultat = [funnet.get(h) for h in hasher]
+        antall_treff = sum(sentiment is not None for sentiment in resultat)
+        self.treff += antall_treff
+        self.bom += len(resultat) - antall_treff
+        return resultat
+
+    def hent(self, tekst: str, modell: str, prompt: str) -> Optional[str]:
+        return self.hent_mange([tekst], modell, prompt)[0]
+
+    def lagre_mange(self, resultater: Iterable[Tuple[str, str]], modell: str, prompt: str) -> None:
+        """
+        Lagrer par av (tekst, sentiment). Eksisterende oppføringer overskrives.
+        """
+        prompt_hash = tekst_hash(prompt)
+        naa = time.time()
+        self._tilkobling.executemany(
+            "INSERT OR REPLACE INTO sentiment VALUES (?, ?, ?, ?, ?, ?)",
+            [(tekst_hash(tekst), modell, prompt_hash, tekst, sentiment, naa) for tekst, sentiment in resultater],
+        )
+        self._tilkobling.commit()
+
+    def lagre(self, tekst: str, sentiment: str, modell: str, prompt: str) -> None:
+        self.lagre_mange([(tekst, sentiment)], modell, prompt)
+
+    def hent_alle(self, modell: str, prompt: Optional[str] = None) -> pd.DataFrame:
+        """
+        Henter alle lagrede tekster og sentimenter for en modell, eventuelt bare for en gitt prompt.
+        Brukes f.eks. som treningsdata for en lokal klassifikator.
+
+        Returns
+        -------
+        pd.DataFrame
+            Kolonnene 'tekst' og 'sentiment'.
+        """
+        if prompt is None:
+            rader = self._tilkobling.execute(
+                "SELECT tekst, sentiment FROM sentiment WHERE modell = ? AND tekst IS NOT NULL", [modell]
+            ).fetchall()
+        else:
+            rader = self._tilkobling.execute(
+                "SELECT tekst, sentiment FROM sentiment WHERE modell = ? AND prompt_hash = ? AND tekst IS NOT NULL",
+                [modell, tekst_hash(prompt)],
+            ).fetchall()
+        return pd.DataFrame(rader, columns=['tekst', 'sentiment'])
+
+    def statistikk(self) -> Dict[str, float]:
+        """
+        Returnerer treff, bom, treffrate og antall lagrede oppføringer.
+        """
+        antall = self._tilkobling.execute("SELECT COUNT(*) FROM sentiment").fetchone()[0]
+        oppslag = self.treff + self.bom
+        return {
+            "treff": self.treff,
+            "bom": self.bom,
+            "treffrate": self.treff / oppslag if oppslag else 0.0,
+            "antall_oppfoeringer": antall,
+        }
+
+    def fjern_modell(self, modell: str, prompt: Optional[str] = None) -> int:
+        """
+        Fjerner oppføringer for en modell, eventuelt bare for en gitt prompt.
+
+        Returns
+        -------
+        int
+            Antall fjernede oppføringer.
+        """
+        if prompt is None:
+            markoer = self._tilkobling.execute("DELETE FROM sentiment WHERE modell = ?", [modell])
+        else:
+            markoer = self._tilkobling.execute(
+                "DELETE FROM sentiment WHERE modell = ? AND prompt_hash = ?", [modell, tekst_hash(prompt)]
+            )
+        self._tilkobling.commit()
+        return markoer.rowcount
+
+    def behold_kun(self, modell: str, prompt: str) -> int:
+        """
+        Fjerner alle oppføringer som ikke tilhører gitt modell og prompt, f.eks. etter en modelloppgradering.
+
+        Returns
+        -------
+        int
+            Antall fjernede oppføringer.
+        """
+        markoer = self._tilkobling.execute(
+            "DELETE FROM sentiment WHERE NOT (modell = ? AND prompt_hash = ?)", [modell, tekst_hash(prompt)]
+        )
+        self._tilkobling.commit()
+        return markoer.rowcount
+
+    def lukk(self) -> None:
+        self._tilkobling.close()
@@ -0,0 +1,77 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Svar uten innhold som klassifiseres som "Neutral" uten å spørre modellen
+TRIVIELLE_SVAR = {
+    '', 'nei', 'nei takk', 'ingen', 'ingenting', 'ingen kommentar', 'ingen kommentarer',
+    'har ingen', 'har ingen kommentar', 'vet ikke', 'n/a', 'na', 'x', 'xx', 'xxx',
+}
+TRIVIELT_SENTIMENT = 'Neutral'
+
+
+def normaliser_tekster(tekster: pd.Series) -> pd.Series:
+    """
+    Normaliserer tekster for sammenligning: unicode-normalisering, små bokstaver og sammenslått mellomrom.
+    """
+    return (
+        tekster
+        .astype('string')
+        .str.normalize('NFKC')
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.strip()
+        .str.casefold()
+    )
+
+
+def er_triviell(normaliserte_tekster: pd.Series) -> pd.Series:
+    """
+    Markerer tomme svar, svar uten bokstaver eller tall, og standardsvar som "Nei" og "Ingen kommentar".
+    """
+    uten_tegnsetting = normaliserte_tekster.str.strip(' .,!?-_*/')
+    return (
+        normaliserte_tekster.isna()
+        | uten_tegnsetting.isin(TRIVIELLE_SVAR)
+        | ~normaliserte_tekster.str.contains(r'\w', regex=True).fillna(False).astype(bool)
+    ).astype(bool)
+
+
+def dedupliser_tekster(tekster: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """
+    Slår sammen tekster som er like etter normalisering, og skiller ut trivielle svar.
+
+    Den normaliserte teksten brukes bare til å finne like tekster. Hver gruppe representeres av
+    den første opprinnelige teksten, som er den som sendes til modellen og lagres i cachen, slik at
+    f.eks. run_model("BRA!!") treffer det run_batch har lagret.
+
+    Parameters
+    ----------
+    tekster : pd.Series
+        Tekstene som skal forbehandles.
+
+    Returns
+    -------
+    Tuple[pd.Series, np.ndarray]
+        Én opprinnelig tekst per gruppe av ikke-trivielle tekster, og for hver opprinnelige rad
+        posisjonen til gruppen, eller -1 for trivielle svar.
+    """
+    normalisert = normaliser_tekster(tekster)
+    normalisert = normalisert.mask(er_triviell(normalisert))
+    koder, _ = pd.factorize(normalisert)
+    # factorize nummererer gruppene i den rekkefølgen de først forekommer, så første rad i hver gruppe
+    # står i samme rekkefølge som gruppene
+    grupper, foerste = np.unique(koder, return_index=True)
+    foerste = foerste[grupper >= 0]
+    return pd.Series(tekster.iloc[foerste].to_numpy(), dtype=object), koder
+
+
+def fordel_til_rader(unike_verdier, koder: np.ndarray, standardverdi=TRIVIELT_SENTIMENT) -> np.ndarray:
+    """
+    Fordeler verdier for de unike tekstene, f.eks. sentiment, tilbake til alle opprinnelige rader.
+    Rader med kode -1 (trivielle svar) får standardverdi.
+    """
+    # Indeks -1 treffer det siste elementet, som er verdien for trivielle svar
+    oppslag = np.array(list(unike_verdier) + [standardverdi], dtype=object)
+    return oppslag[koder]
@@ -18,4 +18,26 @@ sentiment: STR
 Wrap it in a JSON object and remove \n.
 Do not talk, explain, summarize, or make up information. Do not say anything before or after the JSON object. Think step-by-step.
 
-"""
\ No newline at end of file
+"""
+
+SENTIMENT_ANALYSE_PAKKET = """
+### Context
+The texts have not been classified with a sentiment. The possible categories of sentiments
+are "Positive", "Negative", "Mixed", "Neutral". Please categorize each text to the correct sentiment.
+If a text is only positive, classify as "Positive",
+if a text is only negative, classify as "Negative",
+if there are some positives and some negatives, classify as "Mixed",
+if there is no clear sentiment in a text, classify as "Neutral"
+
+### The texts, one per numbered line:
+{texts}
+
+### Task
+For each numbered text, identify the correct sentiment. 
+
+### Expected output
+A JSON array with exactly {antall} objects in the same order as the texts: [{{"id": INT, "sentiment": STR}}]
+Wrap it in a JSON array and remove \n.
+Do not talk, explain, summarize, or make up information. Do not say anything before or after the JSON array. Think step-by-step.
+
+"""
@@ -1,48 +1,557 @@
+import asyncio
+import json
+import re
+import time
+from typing import Any, Callable, Dict, Generator, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import httpx
+import numpy as np
+import pandas as pd
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_ollama import ChatOllama
 from langchain_core.runnables.base import Runnable
 
-from ung_mlverktoey.prompts import SENTIMENT_ANALYSE
+from ung_dbverktoey.sporing import sporet
+from ung_mlverktoey.backends import SentimentBackend
+from ung_mlverktoey.cache import SentimentCache
+from ung_mlverktoey.forbehandling import TRIVIELT_SENTIMENT, dedupliser_tekster, er_triviell, fordel_til_rader, normaliser_tekster
+from ung_mlverktoey.prompts import SENTIMENT_ANALYSE, SENTIMENT_ANALYSE_PAKKET
+
+
+SENTIMENTER = ('Positive', 'Negative', 'Mixed', 'Neutral')
+MODELL_FEILET = 'Model failed'
+
+# Feilkategorier per tekst
+FEIL_TILKOBLING = 'tilkoblingsfeil'
+FEIL_TIDSAVBRUDD = 'tidsavbrudd'
+FEIL_MODELL = 'modellfeil'
+FEIL_UGYLDIG_JSON = 'ugyldig_json'
+FEIL_UKJENT_SENTIMENT = 'ukjent_sentiment'
+
+# JSON-skjema som begrenser hva Ollama kan svare
+SENTIMENT_SKJEMA = {
+    'type': 'object',
+    'properties': {'sentiment': {'type': 'string', 'enum': list(SENTIMENTER)}},
+    'required': ['sentiment'],
+}
+SENTIMENT_PAKKET_SKJEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {'id': {'type': 'integer'}, 'sentiment': {'type': 'string', 'enum': list(SENTIMENTER)}},
+        'required': ['id', 'sentiment'],
+    },
+}
+
+
+# Regex for JSON i et modellsvar med tekst rundt, per forventet type, i den rekkefølgen de prøves
+JSON_MOENSTRE = {
+    dict: (r'\{.*\}', r'\{[^{}]*\}'),
+    list: (r'\[.*\]', r'\[.*?\]'),
+}
+
+
+class _Kall(NamedTuple):
+    kjede: Runnable
+    inputs: List[Dict]
+    config: Dict
+
+
+class _Vent(NamedTuple):
+    sekunder: float
+
+
+# Klassifiseringen skrives én gang som generatorer som gir fra seg modellkallene og ventetidene i stedet
+# for å utføre dem. SentimentModel._kjoer utfører dem synkront og _akjoer asynkront.
+Steg = Generator[Union[_Kall, _Vent], Any, Any]
+
+
+def tolk_json(tekst: str,
+              forventet: Tuple[type, ...] = (dict, list),
+              godta: Optional[Callable[[Any], bool]] = None) -> Any:
+    """
+    Tolker JSON fra modellsvaret. Hvis modellen har skrevet tekst rundt JSON-en,
+    hentes JSON-en ut med regex før vi gir opp.
 
+    Alle treff på regexene prøves, slik at et svar som står etter annen JSON i teksten også blir funnet.
+
+    Parameters
+    ----------
+    tekst : str
+        Modellsvaret.
+    forventet : Tuple[type, ...], optional
+        Typene som godtas, i den rekkefølgen de letes etter, f.eks. (dict,) for ett objekt og
+        (list, dict) for et array som kan være pakket inn i et objekt (default er (dict, list)).
+    godta : Callable[[Any], bool], optional
+        Sier om en verdi har formen vi venter, f.eks. at objektet har nøkkelen 'sentiment'. Den første
+        verdien som godtas, velges foran andre verdier av forventet type.
+
+    Returns
+    -------
+    Any
+        Den første verdien som godtas, ellers den første av forventet type, eller None hvis ingen
+        gyldig JSON av forventet type ble funnet.
+
+    Examples
+    --------
+    >>> tolk_json('Her er svaret: {"merknad": 1} og {"sentiment": "positiv"}',
+    ...           (dict,), lambda verdi: 'sentiment' in verdi)
+    {'sentiment': 'positiv'}
+    """
+    kandidater = []
+    try:
+        kandidater.append(json.loads(tekst))
+    except (json.JSONDecodeError, TypeError):
+        pass
+    for moenster in (moenster for type_ in forventet for moenster in JSON_MOENSTRE[type_]):
+        for treff in re.finditer(moenster, tekst or '', re.DOTALL):
+            try:
+                kandidater.append(json.loads(treff.group(0)))
+            except json.JSONDecodeError:
+                continue
+    kandidater = [verdi for verdi in kandidater if isinstance(verdi, forventet)]
+    if godta is not None:
+        godtatt = next((verdi for verdi in kandidater if godta(verdi)), None)
+        if godtatt is not None:
+            return godtatt
+    return kandidater[0] if kandidater else None
+
+
+def normaliser_sentiment(sentiment: Any) -> Optional[str]:
+    if not isinstance(sentiment, str):
+        return None
+    sentiment = sentiment.strip().capitalize()
+    return sentiment if sentiment in SENTIMENTER else None
+
+
+def feilkategori(feil: BaseException) -> str:
+    if isinstance(feil, (httpx.TimeoutException, asyncio.TimeoutError, TimeoutError)):
+        return FEIL_TIDSAVBRUDD
+    if isinstance(feil, (httpx.ConnectError, ConnectionError)):
+        return FEIL_TILKOBLING
+    return FEIL_MODELL
 
 
 class SentimentModel:
 
-    
-    def __init__(self) -> None:
-        self.llama_model = ChatOllama(model = "llama3.2", temperature = 0)
+
+    def __init__(self,
+                 modell: str = "llama3.2",
+                 cache: Optional[SentimentCache] = None,
+                 strukturert_output: bool = True,
+                 maks_forsoek: int = 3,
+                 ventetid: float = 1.0,
+                 base_url: Optional[str] = None,
+                 backend: Optional[SentimentBackend] = None,
+                 terskel: float = 0.8) -> None:
+        """
+        Parameters
+        ----------
+        modell : str, optional
+            Navnet på Ollama-modellen (default er "llama3.2").
+        cache : SentimentCache, optional
+            Cache for resultater. Hvis None sendes alle tekster til modellen.
+        strukturert_output : bool, optional
+            Ber Ollama om svar som følger et JSON-skjema (default er True).
+        maks_forsoek : int, optional
+            Maks antall forsøk per tekst ved tilkoblingsfeil, tidsavbrudd og andre unntak (default er 3).
+        ventetid : float, optional
+            Ventetid i sekunder før første nye forsøk, dobles for hvert forsøk (default er 1.0).
+        base_url : str, optional
+            Adressen til Ollama-serveren. Hvis None brukes standardadressen til Ollama.
+        backend : SentimentBackend, optional
+            Rask klassifikator som prøves før LLM-en, f.eks. en TfidfBackend trent på cachen.
+            Hvis None går alle tekster til LLM-en.
+        terskel : float, optional
+            Minste sikkerhet for å bruke svaret fra backend. Tekster under terskelen sendes til LLM-en (default er 0.8).
+        """
+        self.modell = modell
+        self.prompt = SENTIMENT_ANALYSE
+        self.cache = cache
+        self.strukturert_output = strukturert_output
+        self.maks_forsoek = maks_forsoek
+        self.ventetid = ventetid
+        self.base_url = base_url
+        self.backend = backend
+        self.terskel = terskel
+        if base_url is None:
+            self.llama_model = ChatOllama(model = modell, temperature = 0)
+        else:
+            self.llama_model = ChatOllama(model = modell, temperature = 0, base_url = base_url)
+        self._kjede = None
+        self._pakket_kjede = None
+        self.siste_kjoering: Dict[str, float] = {}
 
 
     def create_prompt(self, prompt_template: str) -> PromptTemplate:
         return PromptTemplate.from_template(prompt_template)
 
 
-    def create_ollama_chain(self, ollama_llm: ChatOllama, 
+    def create_ollama_chain(self, ollama_llm: ChatOllama,
                             prompt_template: PromptTemplate) -> Runnable:
         return prompt_template | ollama_llm | JsonOutputParser()
-    
+
+    def _llm(self, skjema: Dict) -> Runnable:
+        if self.strukturert_output:
+            return self.llama_model.bind(format=skjema)
+        return self.llama_model
+
+    @property
+    def kjede(self) -> Runnable:
+        # Kjeden bygges én gang og gjenbrukes for alle kall. Svaret tolkes av _tolk_output,
+        # slik at JSON med tekst rundt kan reddes uten et nytt modellkall.
+        if self._kjede is None:
+            self._kjede = self.create_prompt(self.prompt) | self._llm(SENTIMENT_SKJEMA)
+        return self._kjede
+
+    @property
+    def pakket_kjede(self) -> Runnable:
+        if self._pakket_kjede is None:
+            self._pakket_kjede = self.create_prompt(SENTIMENT_ANALYSE_PAKKET) | self._llm(SENTIMENT_PAKKET_SKJEMA)
+        return self._pakket_kjede
+
+    def _formater_pakke(self, tekster: List[str]) -> Dict[str, str]:
+        # Linjeskift i tekstene fjernes så hver tekst står på sin egen nummererte linje
+        linjer = [f"{nr}. {' '.join(str(tekst).split())}" for nr, tekst in enumerate(tekster, start=1)]
+        return {'texts': '\n'.join(linjer), 'antall': str(len(tekster))}
+
+    def _innhold(self, output, forventet: Tuple[type, ...], godta: Callable[[Any], bool]) -> Any:
+        if isinstance(output, (dict, list)):
+            return output
+        return tolk_json(getattr(output, 'content', output), forventet, godta)
+
+    @staticmethod
+    def _pakkeliste(innhold: Any) -> Any:
+        if isinstance(innhold, dict):
+            # Noen ganger pakker modellen listen inn i et objekt
+            return next((verdi for verdi in innhold.values() if isinstance(verdi, list)), None)
+        return innhold
+
+    def _tolk_pakke(self, output, antall: int) -> List[Optional[str]]:
+        """
+        Tolker svaret på en pakket prompt. Gir None for tekster uten gyldig sentiment,
+        og bare None hvis svaret ikke er en liste med riktig lengde.
+        """
+        if isinstance(output, BaseException):
+            return [None] * antall
+        innhold = self._pakkeliste(self._innhold(
+            output, (list, dict), lambda verdi: len(self._pakkeliste(verdi) or ()) == antall))
+        if not isinstance(innhold, list) or len(innhold) != antall:
+            return [None] * antall
+        sentimenter: List[Optional[str]] = [None] * antall
+        for posisjon, element in enumerate(innhold):
+            if not isinstance(element, dict):
+                continue
+            nr = element.get('id', posisjon + 1)
+            indeks = nr - 1 if isinstance(nr, int) and 1 <= nr <= antall else posisjon
+            sentimenter[indeks] = normaliser_sentiment(element.get('sentiment'))
+        return sentimenter
+
+    def _tolk_output(self, output) -> Tuple[str, Optional[str]]:
+        """
+        Gir (sentiment, feilkategori). Feilkategorien er None når tolkningen lyktes.
+        """
+        if isinstance(output, BaseException):
+            return MODELL_FEILET, feilkategori(output)
+        innhold = self._innhold(output, (dict,), lambda verdi: 'sentiment' in verdi)
+        if not isinstance(innhold, dict):
+            return MODELL_FEILET, FEIL_UGYLDIG_JSON
+        sentiment = normaliser_sentiment(innhold.get('sentiment'))
+        if sentiment is None:
+            return MODELL_FEILET, FEIL_UKJENT_SENTIMENT
+        return sentiment, None
+
+    def _tell_tokens(self, outputs: List) -> None:
+        for output in outputs:
+            bruk = getattr(output, 'usage_metadata', None)
+            if bruk:
+                self.siste_kjoering['input_tokens'] = self.siste_kjoering.get('input_tokens', 0) + bruk.get('input_tokens', 0)
+                self.siste_kjoering['output_tokens'] = self.siste_kjoering.get('output_tokens', 0) + bruk.get('output_tokens', 0)
+
+    def _batch_med_forsoek(self, kjede: Runnable, inputs: List[Dict], config: Dict) -> Steg:
+        outputs = yield _Kall(kjede, inputs, config)
+        self.siste_kjoering['modellkall'] = self.siste_kjoering.get('modellkall', 0) + len(inputs)
+        # Bare unntak prøves på nytt. Ugyldige svar gjentas med temperature 0 og prøves ikke igjen.
+        for forsoek in range(1, self.maks_forsoek):
+            feilet = [i for i, output in enumerate(outputs) if isinstance(output, Exception)]
+            if not feilet:
+                break
+            yield _Vent(self.ventetid * 2 ** (forsoek - 1))
+            nye = yield _Kall(kjede, [inputs[i] for i in feilet], config)
+            self.siste_kjoering['modellkall'] += len(feilet)
+            self.siste_kjoering['nye_forsoek'] = self.siste_kjoering.get('nye_forsoek', 0) + len(feilet)
+            for i, output in zip(feilet, nye):
+                outputs[i] = output
+        self._tell_tokens(outputs)
+        return outputs
+
+    def _kjoer(self, steg: Steg) -> Any:
+        """
+        Utfører modellkallene og ventetidene fra steg synkront og returnerer resultatet.
+        """
+        svar = None
+        while True:
+            try:
+                handling = steg.send(svar)
+            except StopIteration as slutt:
+                return slutt.value
+            if isinstance(handling, _Vent):
+                time.sleep(handling.sekunder)
+                svar = None
+            else:
+                svar = handling.kjede.batch(handling.inputs, config=handling.config, return_exceptions=True)
+
+    async def _akjoer(self, steg: Steg) -> Any:
+        """
+        Asynkron variant av _kjoer.
+        """
+        svar = None
+        while True:
+            try:
+                handling = steg.send(svar)
+            except StopIteration as slutt:
+                return slutt.value
+            if isinstance(handling, _Vent):
+                await asyncio.sleep(handling.sekunder)
+                svar = None
+            else:
+                svar = await handling.kjede.abatch(handling.inputs, config=handling.config, return_exceptions=True)
+
+    @sporet('SentimentModel.run_model')
     def run_model(self, text):
 
-        sentiment_prompt = self.create_prompt(SENTIMENT_ANALYSE)
+        if er_triviell(normaliser_tekster(pd.Series([text]))).iloc[0]:
+            return {'text': text, 'sentiment': TRIVIELT_SENTIMENT, 'feil': None}
 
-        model = self.create_ollama_chain(self.llama_model,
-                                         sentiment_prompt)
+        if self.cache is not None:
+            sentiment = self.cache.hent(text, self.modell, self.prompt)
+            if sentiment is not None:
+                return {'text': text, 'sentiment': sentiment, 'feil': None}
 
-        text = text
+        if self.backend is not None:
+            lokalt = self.backend.klassifiser([text]).iloc[0]
+            if lokalt['sikkerhet'] >= self.terskel:
+                return {'text': text, 'sentiment': lokalt['sentiment'], 'feil': None}
 
         inp = {'text': text}
 
-        output = model.invoke(inp)
+        output = self._kjoer(self._batch_med_forsoek(self.kjede, [inp], {}))[0]
+
+        sentiment, feil = self._tolk_output(output)
 
-        sentiment = output.get('sentiment', 'Model failed')
+        if self.cache is not None and feil is None:
+            self.cache.lagre(text, sentiment, self.modell, self.prompt)
 
         final_output = {
             'text': text,
-            'sentiment': sentiment
+            'sentiment': sentiment,
+            'feil': feil
         }
 
         return final_output
 
+    def _som_serie(self, tekster: Union[pd.Series, Iterable[str]]) -> pd.Series:
+        if isinstance(tekster, pd.Series):
+            return tekster
+        return pd.Series(list(tekster))
+
+    def _som_df(self, tekster: pd.Series, sentimenter: List[str], feil: List[Optional[str]],
+                tekst_kolonne: str, sentiment_kolonne: str) -> pd.DataFrame:
+        return pd.DataFrame({
+            tekst_kolonne: tekster.values,
+            sentiment_kolonne: sentimenter,
+            'feil': feil,
+        }, index=tekster.index)
+
+    def _cache_prompt(self, pakke_stoerrelse: int) -> str:
+        # Resultater fra pakket modus lagres under en egen nøkkel, siden de kommer fra en annen prompt
+        if pakke_stoerrelse > 1:
+            return self.prompt + SENTIMENT_ANALYSE_PAKKET
+        return self.prompt
+
+    def _fra_cache(self, tekster: pd.Series, prompt: str) -> List[Optional[str]]:
+        if self.cache is None:
+            return [None] * len(tekster)
+        return self.cache.hent_mange(tekster.tolist(), self.modell, prompt)
+
+    def _til_cache(self, tekster: List[str], resultater: List[Tuple[str, Optional[str]]], prompt: str) -> None:
+        if self.cache is None:
+            return
+        self.cache.lagre_mange(
+            [(tekst, sentiment) for tekst, (sentiment, feil) in zip(tekster, resultater) if feil is None],
+            self.modell, prompt
+        )
+
+    def _fra_backend(self, tekster: pd.Series, sentimenter: List[Optional[str]], mangler: List[int]) -> List[int]:
+        """
+        Klassifiserer manglende tekster med backend i ett vektorisert kall. Returnerer tekstene
+        som fortsatt mangler sentiment fordi backend var for usikker.
+        """
+        if self.backend is None or not mangler:
+            return mangler
+        lokalt = self.backend.klassifiser([tekster.iloc[i] for i in mangler])
+        sikker = (lokalt['sikkerhet'] >= self.terskel).to_numpy()
+        for i, sentiment in zip(np.asarray(mangler)[sikker], lokalt['sentiment'].to_numpy()[sikker]):
+            sentimenter[i] = sentiment
+        self.siste_kjoering['lokalt'] = int(sikker.sum())
+        return [i for i, er_sikker in zip(mangler, sikker) if not er_sikker]
+
+    def _klassifiser_enkeltvis(self, tekster: List[str], config: Dict) -> Steg:
+        outputs = yield from self._batch_med_forsoek(self.kjede, [{'text': tekst} for tekst in tekster], config)
+        return [self._tolk_output(output) for output in outputs]
+
+    def _pakk(self, tekster: List[str], pakke_stoerrelse: int) -> List[List[str]]:
+        return [tekster[i:i + pakke_stoerrelse] for i in range(0, len(tekster), pakke_stoerrelse)]
+
+    def _samle_pakker(self, pakker: List[List[str]], outputs: List) -> List[Optional[Tuple[str, Optional[str]]]]:
+        resultater: List[Optional[Tuple[str, Optional[str]]]] = []
+        for pakke, output in zip(pakker, outputs):
+            resultater.extend(None if sentiment is None else (sentiment, None)
+                              for sentiment in self._tolk_pakke(output, len(pakke)))
+        self.siste_kjoering['fallback'] += sum(resultat is None for resultat in resultater)
+        return resultater
+
+    def _klassifiser_pakket(self, tekster: List[str], pakke_stoerrelse: int, config: Dict) -> Steg:
+        pakker = self._pakk(tekster, pakke_stoerrelse)
+        outputs = yield from self._batch_med_forsoek(self.pakket_kjede, [self._formater_pakke(pakke) for pakke in pakker], config)
+        resultater = self._samle_pakker(pakker, outputs)
+        # Tekster som ikke fikk gyldig svar i pakken klassifiseres enkeltvis
+        feilet = [i for i, resultat in enumerate(resultater) if resultat is None]
+        if feilet:
+            enkeltvis = yield from self._klassifiser_enkeltvis([tekster[i] for i in feilet], config)
+            for i, resultat in zip(feilet, enkeltvis):
+                resultater[i] = resultat
+        return resultater
+
+    def _start_kjoering(self, antall: int) -> None:
+        self.siste_kjoering = {'tekster': antall, 'lokalt': 0, 'modellkall': 0, 'nye_forsoek': 0, 'fallback': 0, 'feilet': 0,
+                               'input_tokens': 0, 'output_tokens': 0, 'start': time.perf_counter()}
+
+    def _avslutt_kjoering(self, feil: List[Optional[str]], vis_fremdrift: bool) -> None:
+        sekunder = time.perf_counter() - self.siste_kjoering.pop('start')
+        antall = self.siste_kjoering['tekster']
+        self.siste_kjoering['sekunder'] = sekunder
+        self.siste_kjoering['tekster_per_sekund'] = antall / sekunder if sekunder > 0 else 0.0
+        self.siste_kjoering['feilet'] = sum(kategori is not None for kategori in feil)
+        if vis_fremdrift and antall:
+            print(f"{antall} tekster klassifisert på {sekunder:.1f} s "
+                  f"({self.siste_kjoering['tekster_per_sekund']:.1f} tekster/s, {self.siste_kjoering['lokalt']} lokalt, "
+                  f"{self.siste_kjoering['modellkall']} modellkall, {self.siste_kjoering['fallback']} enkeltvis etter pakkefeil, "
+                  f"{self.siste_kjoering['feilet']} feilet)")
+
+    def _klassifiser(self, tekster: pd.Series, batch_stoerrelse: int, maks_samtidighet: int,
+                     vis_fremdrift: bool, pakke_stoerrelse: int = 1) -> Steg:
+        prompt = self._cache_prompt(pakke_stoerrelse)
+        sentimenter = self._fra_cache(tekster, prompt)
+        feil: List[Optional[str]] = [None] * len(tekster)
+        mangler = [i for i, sentiment in enumerate(sentimenter) if sentiment is None]
+        config = {'max_concurrency': maks_samtidighet}
+        self._start_kjoering(len(mangler))
+        # Svar fra backend lagres ikke i cachen, som bare skal inneholde svar fra LLM-en
+        mangler = self._fra_backend(tekster, sentimenter, mangler)
+        for start in range(0, len(mangler), batch_stoerrelse):
+            indekser = mangler[start:start + batch_stoerrelse]
+            batch = [tekster.iloc[i] for i in indekser]
+            if pakke_stoerrelse > 1:
+                resultater = yield from self._klassifiser_pakket(batch, pakke_stoerrelse, config)
+            else:
+                resultater = yield from self._klassifiser_enkeltvis(batch, config)
+            self._til_cache(batch, resultater, prompt)
+            for i, (sentiment, kategori) in zip(indekser, resultater):
+                sentimenter[i] = sentiment
+                feil[i] = kategori
+            if vis_fremdrift:
+                print(f"Klassifisert {start + len(indekser)}/{len(mangler)} tekster ({len(tekster) - len(mangler)} fra cache eller backend)")
+        self._avslutt_kjoering(feil, vis_fremdrift)
+        return sentimenter, feil
+
+    def _fordel(self, tekster: pd.Series, koder, sentimenter: List[str], feil: List[Optional[str]],
+                tekst_kolonne: str, sentiment_kolonne: str) -> pd.DataFrame:
+        return self._som_df(tekster,
+                            fordel_til_rader(sentimenter, koder),
+                            fordel_til_rader(feil, koder, standardverdi=None),
+                            tekst_kolonne, sentiment_kolonne)
+
+    def _klassifiser_tekster(self, tekster: Union[pd.Series, Iterable[str]], batch_stoerrelse: int,
+                             maks_samtidighet: int, vis_fremdrift: bool, tekst_kolonne: str, sentiment_kolonne: str,
+                             dedupliser: bool, pakke_stoerrelse: int) -> Steg:
+        tekster = self._som_serie(tekster)
+        if not dedupliser:
+            sentimenter, feil = yield from self._klassifiser(tekster, batch_stoerrelse, maks_samtidighet,
+                                                             vis_fremdrift, pakke_stoerrelse)
+            return self._som_df(tekster, sentimenter, feil, tekst_kolonne, sentiment_kolonne)
+
+        unike, koder = dedupliser_tekster(tekster)
+        if vis_fremdrift:
+            print(f"{len(unike)} unike tekster til modellen av {len(tekster)} totalt")
+        sentimenter, feil = yield from self._klassifiser(unike, batch_stoerrelse, maks_samtidighet, vis_fremdrift, pakke_stoerrelse)
+        return self._fordel(tekster, koder, sentimenter, feil, tekst_kolonne, sentiment_kolonne)
+
+    @sporet('SentimentModel.run_batch')
+    def run_batch(self,
+                  tekster: Union[pd.Series, Iterable[str]],
+                  batch_stoerrelse: int = 256,
+                  maks_samtidighet: int = 4,
+                  vis_fremdrift: bool = True,
+                  tekst_kolonne: str = 'kommentar',
+                  sentiment_kolonne: str = 'label',
+                  dedupliser: bool = True,
+                  pakke_stoerrelse: int = 1) -> pd.DataFrame:
+        """
+        Klassifiserer mange tekster med samme kjede og begrenset antall samtidige kall mot Ollama.
+
+        Er cache satt, sendes bare tekster som ikke allerede er klassifisert med samme modell og prompt.
+        Er backend satt, klassifiseres resten først lokalt, og bare tekster der backend er mindre
+        sikker enn terskel sendes til LLM-en.
+
+        Parameters
+        ----------
+        tekster : Union[pd.Series, Iterable[str]]
+            Tekstene som skal klassifiseres. Indeksen til en Series beholdes i resultatet.
+        batch_stoerrelse : int, optional
+            Antall tekster per batch, fremdrift rapporteres etter hver batch (default er 256).
+        maks_samtidighet : int, optional
+            Maks antall samtidige kall mot modellen (default er 4).
+        vis_fremdrift : bool, optional
+            Skriver ut fremdrift etter hver batch (default er True).
+        tekst_kolonne : str, optional
+            Navnet på tekstkolonnen i resultatet (default er 'kommentar').
+        sentiment_kolonne : str, optional
+            Navnet på sentimentkolonnen i resultatet (default er 'label').
+        dedupliser : bool, optional
+            Tekster som er like etter normalisering (små bokstaver, mellomrom og unicode), sendes til
+            modellen bare én gang, som den første opprinnelige teksten. Tomme og trivielle svar som
+            "Nei" og "Ingen kommentar" blir "Neutral" uten modellkall (default er True).
+        pakke_stoerrelse : int, optional
+            Antall tekster per modellkall. Over 1 brukes en nummerert liste i prompten og et JSON-array
+            som svar, og tekster uten gyldig svar klassifiseres enkeltvis. Gjennomstrømningen lagres
+            i siste_kjoering (default er 1).
+
+        Returns
+        -------
+        pd.DataFrame
+            Opprinnelig tekst, sentiment og feilkategori per rad med samme indeks som input.
+            Kolonnenavnene samsvarer med standardverdiene til JitterKommentarData. Tekster som
+            feiler får 'Model failed' og en feilkategori i kolonnen 'feil'.
+        """
+        return self._kjoer(self._klassifiser_tekster(tekster, batch_stoerrelse, maks_samtidighet, vis_fremdrift,
+                                                     tekst_kolonne, sentiment_kolonne, dedupliser, pakke_stoerrelse))
+
+    async def arun_batch(self,
+                         tekster: Union[pd.Series, Iterable[str]],
+                         batch_stoerrelse: int = 256,
+                         maks_samtidighet: int = 4,
+                         vis_fremdrift: bool = True,
+                         tekst_kolonne: str = 'kommentar',
+                         sentiment_kolonne: str = 'label',
+                         dedupliser: bool = True,
+                         pakke_stoerrelse: int = 1) -> pd.DataFrame:
+        """
+        Asynkron variant av run_batch, for bruk i notebooks med kjørende event loop.
+        """
+        return await self._akjoer(self._klassifiser_tekster(tekster, batch_stoerrelse, maks_samtidighet, vis_fremdrift,
+                                                            tekst_kolonne, sentiment_kolonne, dedupliser, pakke_stoerrelse))
+
 if __name__ == '__main__':
-    pass
\ No newline at end of file
+    pass
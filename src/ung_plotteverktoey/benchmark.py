@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import tempfile
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ung_dbverktoey.maaling import kjoeringsinfo, maal, sammenlign_kjoeringer
+from ung_plotteverktoey.data import (
+    BulletData, HighChartData, IndikatorData, JitterKommentarData, KolonneData, KommentarData,
+    ParallellData, PieData, StabletKolonneData,
+)
+from ung_plotteverktoey.kilder import toem_arbeidsbok_cache
+from ung_plotteverktoey.parallell import bygg_parallelt
+from ung_plotteverktoey.plots import JitterKommentarDiagram
+from ung_plotteverktoey.serialisering import orjson
+
+SENTIMENTER = ['Positive', 'Mixed', 'Negative', 'Neutral']
+KOMMENTAR_ORD = np.array(['bra', 'dårlig', 'kurs', 'lærer', 'opplegg', 'nyttig', 'kjedelig', 'veldig', 'ikke', 'helt'])
+
+
+def _lag_kommentarer(rng: np.random.Generator, antall: int, kommentarlengde: Tuple[int, int]) -> List[str]:
+    lengder = rng.integers(kommentarlengde[0], kommentarlengde[1] + 1, antall)
+    return [' '.join(rng.choice(KOMMENTAR_ORD, lengde)) for lengde in lengder]
+
+
+def lag_kommentar_df(antall: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Lager tilfeldige kommentarer med sentiment, i formatet til JitterKommentarData.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'kommentar': _lag_kommentarer(rng, antall, (3, 24)),
+        'label': rng.choice(SENTIMENTER, antall),
+    })
+
+
+def lag_undersoekelse(respondenter: int = 1_000,
+                      spoersmaal: int = 10,
+                      alternativer: int = 5,
+                      kommentarlengde: Tuple[int, int] = (3, 25),
+                      andel_ubesvart: float = 0.05,
+                      seed: int = 0) -> pd.DataFrame:
+    """
+    Lager en syntetisk spørreundersøkelse i bredt format, én rad per respondent.
+
+    Parameters
+    ----------
+    respondenter : int, optional
+        Antall rader (default er 1_000).
+    spoersmaal : int, optional
+        Antall spørsmålskolonner, 'spm_1', 'spm_2' osv. (default er 10).
+    alternativer : int, optional
+        Antall svaralternativer per spørsmål. Svarene er tekstene '1' til f.eks. '5' (default er 5).
+    kommentarlengde : Tuple[int, int], optional
+        Minste og største antall ord i kolonnen 'kommentar' (default er (3, 25)).
+    andel_ubesvart : float, optional
+        Andelen svar som mangler (default er 0.05).
+    seed : int, optional
+        Seed for tilfeldige tall (default er 0).
+
+    Returns
+    -------
+    pd.DataFrame
+        Spørsmålskolonnene, 'gruppe', 'vekt', 'kommentar' og 'label' med sentiment.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        f'spm_{nr}': rng.integers(1, alternativer + 1, respondenter).astype(str)
+        for nr in range(1, spoersmaal + 1)
+    }, dtype=object)
+    df = df.mask(rng.random(df.shape) < andel_ubesvart)
+    df['gruppe'] = rng.choice(['Øst', 'Vest', 'Nord', 'Sør', 'Midt'], respondenter)
+    df['vekt'] = rng.uniform(0.5, 2.0, respondenter)
+    df['kommentar'] = _lag_kommentarer(rng, respondenter, kommentarlengde)
+    df['label'] = rng.choice(SENTIMENTER, respondenter)
+    return df
+
+
+def lag_dataklasser(kilde: str, df: Optional[pd.DataFrame], filnavn: Optional[str],
+                    spoersmaal: List[str], alternativer: int) -> Dict[str, Callable[[], HighChartData]]:
+    """
+    Fabrikker for hver HighChartData-klasse med den syntetiske undersøkelsen som kilde.
+    """
+    svar = [str(nr) for nr in range(1, alternativer + 1)]
+    felles = {'kilde': kilde, 'df': df, 'filnavn': filnavn}
+    return {
+        'KolonneData': lambda: KolonneData(kolonner=spoersmaal[:1], svar_alternativer=svar, **felles),
+        'StabletKolonneData': lambda: StabletKolonneData(kolonner=spoersmaal, svar_alternativer=svar, **felles),
+        'ParallellData': lambda: ParallellData(kolonner=spoersmaal, **felles),
+        'IndikatorData': lambda: IndikatorData(kolonner=spoersmaal[:1], **felles),
+        'PieData': lambda: PieData(kolonner=spoersmaal[:1], svar_alternativer=svar, vekt_kolonne='vekt', **felles),
+        'BulletData': lambda: BulletData(kolonner=spoersmaal, x_axis_categories=spoersmaal, gruppe_kolonne='gruppe', **felles),
+        'JitterKommentarData': lambda: JitterKommentarData(kolonner={'label': 'label', 'kommentar': 'kommentar'},
+                                                           svar_alternativer=SENTIMENTER, **felles),
+        'KommentarData': lambda: KommentarData(kolonner=['kommentar'], **felles),
+    }
+
+
+def benchmark_data(respondenter: int = 1_000,
+                   spoersmaal: int = 10,
+                   alternativer: int = 5,
+                   kommentarlengde: Tuple[int, int] = (3, 25),
+                   kilder: Iterable[str] = ('df', 'excel'),
+                   klasser: Optional[Iterable[str]] = None,
+                   gjentakelser: int = 3,
+                   seed: int = 0,
+                   utfil: Optional[str] = None) -> Dict:
+    """
+    Måler tid og minnebruk for å bygge dataserier med hver HighChartData-klasse fra en syntetisk undersøkelse.
+    Tiden og minnebruken måles i hver sine kjøringer, se ung_dbverktoey.maaling.maal.
+
+    For kilde='excel' skrives undersøkelsen til en midlertidig Excel-fil, og arbeidsbok-cachen
+    tømmes før hver måling, slik at tiden inkluderer lesingen av filen. Cachen for dataserier brukes ikke.
+
+    Parameters
+    ----------
+    respondenter, spoersmaal, alternativer, kommentarlengde : optional
+        Størrelsen på undersøkelsen, se lag_undersoekelse.
+    kilder : Iterable[str], optional
+        Kildene som måles, 'df' og/eller 'excel' (default er ('df', 'excel')).
+    klasser : Iterable[str], optional
+        Navnene på klassene som måles. Hvis None måles alle.
+    gjentakelser : int, optional
+        Antall kjøringer per måling (default er 3).
+    seed : int, optional
+        Seed for den syntetiske undersøkelsen (default er 0).
+    utfil : str, optional
+        Lagrer resultatet som JSON i denne filen.
+
+    Returns
+    -------
+    Dict
+        Versjon og commit under 'metadata', parametrene under 'oppsett' og én rad per klasse og kilde
+        under 'resultater'. To resultater kan sammenlignes med sammenlign_kjoeringer.
+    """
+    df = lag_undersoekelse(respondenter, spoersmaal, alternativer, kommentarlengde, seed=seed)
+    spoersmaal_kolonner = [f'spm_{nr}' for nr in range(1, spoersmaal + 1)]
+    resultater = []
+    with tempfile.TemporaryDirectory() as mappe:
+        for kilde in kilder:
+            filnavn = None
+            if kilde == 'excel':
+                filnavn = os.path.join(mappe, 'undersoekelse.xlsx')
+                df.to_excel(filnavn, index=False)
+            fabrikker = lag_dataklasser(kilde, df if kilde == 'df' else None, filnavn, spoersmaal_kolonner, alternativer)
+            for navn, fabrikk in fabrikker.items():
+                if klasser is not None and navn not in klasser:
+                    continue
+                maaling = maal(lambda: fabrikk().dataserier, gjentakelser, foer=toem_arbeidsbok_cache)
+                resultater.append({'klasse': navn, 'kilde': kilde, **maaling})
+
+    resultat = {
+        'metadata': kjoeringsinfo(),
+        'oppsett': {
+            'respondenter': respondenter,
+            'spoersmaal': spoersmaal,
+            'alternativer': alternativer,
+            'kommentarlengde': list(kommentarlengde),
+            'gjentakelser': gjentakelser,
+            'seed': seed,
+        },
+        'resultater': resultater,
+    }
+    if utfil is not None:
+        with open(utfil, 'w', encoding='utf-8') as f:
+            json.dump(resultat, f, indent=2)
+    return resultat
+
+
+def sammenlign_serialisering(antall_punkter: Iterable[int] = (1_000, 10_000, 50_000),
+                             gjentakelser: int = 3,
+                             utfil: Optional[str] = None) -> List[Dict]:
+    """
+    Sammenligner validert serialisering gjennom HighchartsOptions med den raske veien
+    (rask_grense) for et JitterKommentarDiagram med økende antall punkter.
+
+    Dataseriene lages én gang per størrelse, slik at bare oppbyggingen av innstillingene
+    og serialiseringen til JavaScript måles.
+
+    Parameters
+    ----------
+    antall_punkter : Iterable[int], optional
+        Antall kommentarer per måling (default er (1_000, 10_000, 50_000)).
+    gjentakelser : int, optional
+        Antall kjøringer per måling, beste tid rapporteres (default er 3).
+    utfil : str, optional
+        Lagrer resultatet som JSON i denne filen.
+
+    Returns
+    -------
+    List[Dict]
+        Én rad per størrelse med målingene fra maal for begge veier, forholdet mellom de beste tidene
+        og om orjson ble brukt.
+    """
+    resultater = []
+    for antall in antall_punkter:
+        data = JitterKommentarData(kilde='df', df=lag_kommentar_df(antall),
+                                   svar_alternativer=['Positive', 'Mixed', 'Negative', 'Neutral'])
+        data.dataserier
+
+        validert = maal(lambda: JitterKommentarDiagram(data).til_js(), gjentakelser)
+        rask = maal(lambda: JitterKommentarDiagram(data, rask_grense=0).til_js(), gjentakelser)
+        resultater.append({
+            'antall_punkter': antall,
+            'validert': validert,
+            'rask': rask,
+            'forhold': validert['sekunder'] / rask['sekunder'] if rask['sekunder'] > 0 else None,
+            'orjson': orjson is not None,
+        })
+
+    if utfil is not None:
+        with open(utfil, 'w', encoding='utf-8') as f:
+            json.dump({'metadata': kjoeringsinfo(), 'resultater': resultater}, f, indent=2)
+    return resultater
+
+
+def sammenlign_parallell(respondenter: int = 50_000,
+                         spoersmaal: int = 20,
+                         antall_diagrammer: int = 24,
+                         prosesser: Iterable[int] = (1, 2, 4),
+                         utfil: Optional[str] = None) -> List[Dict]:
+    """
+    Bygger mange diagrammer etter hverandre og med bygg_parallelt med ulikt antall prosesser.
+
+    Dataseriene fra bygg_parallelt sammenlignes med dem som er bygget etter hverandre, og det
+    gis en feil hvis de er ulike. Minnebruken fra maal gjelder bare hovedprosessen.
+    """
+    # Stokket rekkefølge, så en indeks som ikke tas vare på i prosessene gir andre dataserier
+    df = lag_undersoekelse(respondenter, spoersmaal).sample(frac=1, random_state=0)
+    kolonner = [f'spm_{nr}' for nr in range(1, spoersmaal + 1)]
+    svar = ['1', '2', '3', '4', '5']
+    maler = [
+        (KolonneData, lambda nr: {'kolonner': [kolonner[nr % spoersmaal]], 'svar_alternativer': svar}),
+        (StabletKolonneData, lambda nr: {'kolonner': kolonner, 'svar_alternativer': svar}),
+        (PieData, lambda nr: {'kolonner': [kolonner[nr % spoersmaal]], 'svar_alternativer': svar, 'vekt_kolonne': 'vekt'}),
+        (BulletData, lambda nr: {'kolonner': kolonner, 'gruppe_kolonne': 'gruppe'}),
+        (ParallellData, lambda nr: {'kolonner': kolonner[:5], 'maks_linjer': 200}),
+    ]
+    spesifikasjoner = [(klasse, lag(nr)) for nr, (klasse, lag) in
+                       ((nr, maler[nr % len(maler)]) for nr in range(antall_diagrammer))]
+
+    def som_tekst(objekter: List[HighChartData]) -> List[str]:
+        return [json.dumps(objekt.dataserier, sort_keys=True, default=str) for objekt in objekter]
+
+    objekter = []
+
+    def etter_hverandre():
+        objekter[:] = [klasse(**{**argumenter, 'kilde': 'df', 'df': df}) for klasse, argumenter in spesifikasjoner]
+        for objekt in objekter:
+            objekt.dataserier
+
+    resultater = [{'metode': 'etter_hverandre', 'prosesser': 1, **maal(etter_hverandre)}]
+    fasit = som_tekst(objekter)
+    for antall in prosesser:
+        def parallelt():
+            objekter[:] = bygg_parallelt(spesifikasjoner, delt_df=df, maks_prosesser=antall)
+
+        maaling = maal(parallelt)
+        ulike = [spesifikasjoner[nr][0].__name__ for nr, (a, b) in enumerate(zip(fasit, som_tekst(objekter))) if a != b]
+        if ulike:
+            raise AssertionError(f"bygg_parallelt med {antall} prosesser ga andre dataserier for {', '.join(ulike)}")
+        resultater.append({'metode': 'bygg_parallelt', 'prosesser': antall, **maaling})
+    for resultat in resultater:
+        resultat['speedup'] = resultater[0]['sekunder'] / resultat['sekunder']
+
+    if utfil is not None:
+        with open(utfil, 'w', encoding='utf-8') as f:
+            json.dump({'metadata': kjoeringsinfo(),
+                       'oppsett': {'respondenter': respondenter, 'spoersmaal': spoersmaal,
+                                   'antall_diagrammer': antall_diagrammer},
+                       'resultater': resultater}, f, indent=2)
+    return resultater
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark av plotteverktøyet.')
+    undervalg = parser.add_subparsers(dest='maaling', required=True)
+
+    data = undervalg.add_parser('data', help='Bygging av dataserier for hver HighChartData-klasse')
+    data.add_argument('--respondenter', type=int, default=1_000)
+    data.add_argument('--spoersmaal', type=int, default=10)
+    data.add_argument('--alternativer', type=int, default=5)
+    data.add_argument('--kommentarlengde', type=int, nargs=2, default=[3, 25])
+    data.add_argument('--kilder', nargs='+', default=['df', 'excel'])
+    data.add_argument('--klasser', nargs='+', default=None)
+    data.add_argument('--gjentakelser', type=int, default=3)
+    data.add_argument('--utfil', default=None)
+
+    serialisering = undervalg.add_parser('serialisering', help='Validert og rask serialisering av diagrammer')
+    serialisering.add_argument('--antall-punkter', type=int, nargs='+', default=[1_000, 10_000, 50_000])
+    serialisering.add_argument('--gjentakelser', type=int, default=3)
+    serialisering.add_argument('--utfil', default=None)
+
+    parallell = undervalg.add_parser('parallell', help='Bygging av mange diagrammer i en pool av prosesser')
+    parallell.add_argument('--respondenter', type=int, default=50_000)
+    parallell.add_argument('--spoersmaal', type=int, default=20)
+    parallell.add_argument('--antall-diagrammer', type=int, default=24)
+    parallell.add_argument('--prosesser', type=int, nargs='+', default=[1, 2, 4])
+    parallell.add_argument('--utfil', default=None)
+
+    sammenlign = undervalg.add_parser('sammenlign', help='Sammenligner to resultatfiler fra samme måling')
+    sammenlign.add_argument('gammel')
+    sammenlign.add_argument('ny')
+    sammenlign.add_argument('--terskel', type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.maaling == 'data':
+        resultat = benchmark_data(args.respondenter, args.spoersmaal, args.alternativer, tuple(args.kommentarlengde),
+                                  args.kilder, args.klasser, args.gjentakelser, utfil=args.utfil)
+        print(pd.DataFrame(resultat['resultater']).to_string(index=False))
+    elif args.maaling == 'sammenlign':
+        with open(args.gammel, encoding='utf-8') as gammel, open(args.ny, encoding='utf-8') as ny:
+            print(sammenlign_kjoeringer(json.load(gammel), json.load(ny), args.terskel).to_string())
+    elif args.maaling == 'parallell':
+        resultater = sammenlign_parallell(args.respondenter, args.spoersmaal, args.antall_diagrammer,
+                                          args.prosesser, args.utfil)
+        print(pd.DataFrame(resultater).to_string(index=False))
+    else:
+        resultater = sammenlign_serialisering(args.antall_punkter, args.gjentakelser, args.utfil)
+        print(pd.json_normalize(resultater).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
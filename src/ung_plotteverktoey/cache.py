@@ -0,0 +1,119 @@
+import copy
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+
+def fingeravtrykk_fil(filnavn: str) -> str:
+    """
+    Lager et fingeravtrykk av en fil basert på sti, endringstidspunkt og størrelse.
+
+    Parameters
+    ----------
+    filnavn : str
+        Stien til filen.
+
+    Returns
+    -------
+    str
+        Fingeravtrykket som en heksadesimal streng.
+    """
+    status = os.stat(filnavn)
+    innhold = f"{os.path.abspath(filnavn)}|{status.st_mtime_ns}|{status.st_size}"
+    return hashlib.sha256(innhold.encode("utf-8")).hexdigest()
+
+
+def fingeravtrykk_df(df: pd.DataFrame) -> str:
+    """
+    Lager et fingeravtrykk av innholdet i en DataFrame, inkludert kolonnenavn og indeks.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        DataFrame som skal fingeravtrykkes.
+
+    Returns
+    -------
+    str
+        Fingeravtrykket som en heksadesimal streng.
+    """
+    h = hashlib.sha256()
+    h.update(repr(list(df.columns)).encode("utf-8"))
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    except TypeError:
+        # Kolonner med uhashbare verdier (f.eks. lister) faller tilbake til pickle
+        h.update(pickle.dumps(df))
+    return h.hexdigest()
+
+
+class DataserieCache:
+    """
+    Minnecache med LRU-utkastelse for ferdigberegnede dataserier, med valgfri lagring på disk.
+
+    Parameters
+    ----------
+    maks_antall : int, optional
+        Maks antall oppføringer i minnet før de minst nylig brukte kastes ut (default er 128).
+    mappe : str, optional
+        Mappe for lagring på disk. Hvis None brukes kun minnet.
+    """
+    def __init__(self, maks_antall: int = 128, mappe: Optional[str] = None):
+        self.maks_antall = maks_antall
+        self.mappe = mappe
+        self._oppfoeringer: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        if self.mappe is not None:
+            os.makedirs(self.mappe, exist_ok=True)
+
+    def _diskfil(self, noekkel: str) -> str:
+        return os.path.join(self.mappe, f"{noekkel}.pkl")
+
+    def hent(self, noekkel: str) -> Optional[Dict[str, Any]]:
+        """
+        Henter en oppføring fra cachen, eller None hvis den ikke finnes.
+        """
+        if noekkel in self._oppfoeringer:
+            self._oppfoeringer.move_to_end(noekkel)
+            return copy.deepcopy(self._oppfoeringer[noekkel])
+        if self.mappe is not None and os.path.exists(self._diskfil(noekkel)):
+            with open(self._diskfil(noekkel), "rb") as f:
+                oppfoering = pickle.load(f)
+            self._legg_i_minnet(noekkel, oppfoering)
+            return copy.deepcopy(oppfoering)
+        return None
+
+    def lagre(self, noekkel: str, oppfoering: Dict[str, Any]) -> None:
+        """
+        Lagrer en oppføring i minnet, og på disk hvis mappe er satt.
+        """
+        oppfoering = copy.deepcopy(oppfoering)
+        self._legg_i_minnet(noekkel, oppfoering)
+        if self.mappe is not None:
+            with open(self._diskfil(noekkel), "wb") as f:
+                pickle.dump(oppfoering, f)
+
+    def _legg_i_minnet(self, noekkel: str, oppfoering: Dict[str, Any]) -> None:
+        self._oppfoeringer[noekkel] = oppfoering
+        self._oppfoeringer.move_to_end(noekkel)
+        while len(self._oppfoeringer) > self.maks_antall:
+            self._oppfoeringer.popitem(last=False)
+
+    def toem(self) -> None:
+        """
+        Tømmer minnet, og sletter lagrede oppføringer på disk hvis mappe er satt.
+        """
+        self._oppfoeringer.clear()
+        if self.mappe is not None:
+            for fil in os.listdir(self.mappe):
+                if fil.endswith(".pkl"):
+                    os.remove(os.path.join(self.mappe, fil))
+
+    def __len__(self) -> int:
+        return len(self._oppfoeringer)
+
+
+standard_cache = DataserieCache()
@@ -1,21 +1,58 @@
+from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
 from pypalettes import load_cmap
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
+import hashlib
 import pickle
 import random
 
+from ung_plotteverktoey.cache import DataserieCache, standard_cache
+from ung_plotteverktoey.kilder import Datakilde, ExcelKilde, lag_datakilde, normaliser_kolonne
+from ung_plotteverktoey.statistikk import beregn_statistikk
+from ung_dbverktoey.sporing import spenn
+
+
+def _svar_som_tekst(svar):
+    # Desimaltall uten desimaler skrives som heltall, slik databasene gjør når de gjør tall om til tekst
+    if isinstance(svar, (float, np.floating)) and float(svar).is_integer():
+        return str(int(svar))
+    return svar if pd.isna(svar) else str(svar)
+
+
+def _som_tekst(svar: pd.Series) -> pd.Series:
+    # Hver unike verdi gjøres om én gang, og manglende svar (kode -1) får den siste verdien, NaN
+    koder, unike = pd.factorize(svar)
+    tekst = np.append(np.array([_svar_som_tekst(verdi) for verdi in unike], dtype=object), np.nan)
+    return pd.Series(tekst[koder], index=svar.index)
+
+
+def normaliser_svar(svar: Union[pd.Series, pd.Index], svar_alternativer: List) -> pd.Series:
+    """
+    Gjør svarene sammenlignbare med svar_alternativer, uansett om kilden gir dem som tall eller tekst.
+
+    Er alle svaralternativene tall, sammenlignes svarene som tall, og svar som ikke er tall blir NaN.
+    Ellers sammenlignes de som tekst, der 1.0 blir '1' slik som i BigQuery og DVH. Manglende svar
+    forblir manglende.
+    """
+    svar = pd.Series(svar)
+    if svar_alternativer and all(isinstance(alternativ, (int, float, np.number)) and not isinstance(alternativ, bool)
+                                 for alternativ in svar_alternativer):
+        return pd.to_numeric(svar, errors='coerce')
+    return _som_tekst(svar)
+
 
 class HighChartData:
     def __init__(self, 
                  filnavn: str = None, 
-                 kilde: str = None,
+                 kilde: Union[str, Datakilde] = None,
                  df: pd.DataFrame = None,
                  kolonner: List[str] = None, 
                  svar_alternativer: List[str] = None,
                  x_axis_labels: List[str] = None,
                  tilfeldige_farger: bool = None,
-                 farger_seed: int = None
+                 farger_seed: int = None,
+                 cache: Union[bool, DataserieCache] = False
                  ):
         self.kilde = kilde
         self.df = df
@@ -25,17 +62,82 @@ class HighChartData:
         self.x_axis_labels = x_axis_labels or kolonner
         self.tilfeldige_farger = tilfeldige_farger
         self.farger_seed = farger_seed
-        self.dataserier = self.lag_dataserier()
+        self.cache = cache
+        self._datakilde = None
+        self._dataserier = None
+
+    @property
+    def datakilde(self) -> Datakilde:
+        if self._datakilde is None:
+            self._datakilde = lag_datakilde(self.kilde, filnavn=self.filnavn, df=self.df)
+        return self._datakilde
+
+    @property
+    def dataserier(self) -> List[Dict]:
+        # Dataseriene bygges først når de brukes
+        if self._dataserier is None:
+            self._dataserier = self._bygg_dataserier()
+        return self._dataserier
+
+    @dataserier.setter
+    def dataserier(self, dataserier: List[Dict]):
+        self._dataserier = dataserier
+
+    def kolonner_som_leses(self) -> Optional[List[str]]:
+        return self.kolonner
+
+    def hent_df(self) -> pd.DataFrame:
+        return self.datakilde.les(self.kolonner_som_leses())
+
+    # Attributter som settes i lag_dataserier og som diagrammene trenger i tillegg til dataserier
+    _cache_attributter = ()
+
+    def _hent_cache(self) -> DataserieCache:
+        if isinstance(self.cache, DataserieCache):
+            return self.cache
+        return standard_cache
+
+    def _cache_noekkel(self) -> Optional[str]:
+        kilde_avtrykk = self.datakilde.fingeravtrykk()
+        if kilde_avtrykk is None:
+            # Uten fingeravtrykk kan ikke cachen vite om kilden er endret
+            return None
+        argumenter = {
+            navn: verdi for navn, verdi in sorted(vars(self).items())
+            if not navn.startswith('_') and navn not in ('df', 'cache', 'kilde')
+        }
+        argumenter['kilde'] = type(self.datakilde).__name__
+        innhold = f"{type(self).__module__}.{type(self).__qualname__}|{kilde_avtrykk}|{argumenter!r}"
+        return hashlib.sha256(innhold.encode('utf-8')).hexdigest()
+
+    def _lag_dataserier_sporet(self) -> List[Dict]:
+        with spenn(f'{type(self).__name__}.lag_dataserier', kilde=type(self.datakilde).__name__) as bygging:
+            dataserier = self.lag_dataserier()
+            bygging.sett('serier', len(dataserier))
+        return dataserier
+
+    def _bygg_dataserier(self) -> List[Dict]:
+        if not self.cache:
+            return self._lag_dataserier_sporet()
+        noekkel = self._cache_noekkel()
+        if noekkel is None:
+            return self._lag_dataserier_sporet()
+        cache = self._hent_cache()
+        oppfoering = cache.hent(noekkel)
+        if oppfoering is None:
+            dataserier = self._lag_dataserier_sporet()
+            oppfoering = {
+                'dataserier': dataserier,
+                'attributter': {navn: getattr(self, navn) for navn in self._cache_attributter},
+            }
+            cache.lagre(noekkel, oppfoering)
+            return dataserier
+        for navn, verdi in oppfoering['attributter'].items():
+            setattr(self, navn, verdi)
+        return oppfoering['dataserier']
 
     def normaliser_kolonne(self, kolonne_navn):
-        return (
-            kolonne_navn
-            .strip()
-            .lower()
-            .replace(' ', '_')
-            .replace('\xa0', '_')
-            .replace('\n', '')
-        )
+        return normaliser_kolonne(kolonne_navn)
     
     def les_df(self) -> pd.DataFrame:
         df_selected = self.df[self.kolonner]
@@ -43,25 +145,38 @@ class HighChartData:
         
 
     def les_excel(self) -> pd.DataFrame:
-        df = pd.read_excel(io=self.filnavn, engine='openpyxl')
-        df.columns = [self.normaliser_kolonne(kol) for kol in df.columns]
-        self.normaliserte_kolonner = [self.normaliser_kolonne(kol) for kol in self.kolonner]
-
-        df_selected = df[self.normaliserte_kolonner]
-        df_selected.columns = self.kolonner
-        return df_selected
+        return ExcelKilde(self.filnavn).les(self.kolonner)
     
     def tell_antall(self, df: pd.DataFrame) -> Dict[str, List[int]]:
         antall = {}
         for kolonne in self.kolonner:
             telling = (
-                df[kolonne]
-                .astype(str)
+                normaliser_svar(df[kolonne], self.svar_alternativer)
                 .value_counts()
                 .reindex(self.svar_alternativer, fill_value=0)
             )
             antall[kolonne] = telling.tolist()
         return antall
+
+    def hent_antall(self) -> Dict[str, List[int]]:
+        """
+        Teller svarene som tell_antall. Kan kilden aggregere, telles det i kilden i stedet for å hente alle radene.
+        """
+        if not self.datakilde.aggregerer:
+            return self.tell_antall(self.hent_df())
+        telling = self.datakilde.tell(self.kolonner)
+        antall = {}
+        for kolonne in self.kolonner:
+            per_kolonne = telling[telling['kolonne'] == kolonne]
+            # Svarene sammenlignes på samme måte som i tell_antall
+            antall[kolonne] = (
+                per_kolonne['antall']
+                .groupby(normaliser_svar(per_kolonne['svar'], self.svar_alternativer).to_numpy())
+                .sum()
+                .reindex(self.svar_alternativer, fill_value=0)
+                .tolist()
+            )
+        return antall
     
     def langt_format(self, df: pd.DataFrame) -> pd.DataFrame:
         df = df.reset_index(names='idx')
@@ -85,13 +200,7 @@ class HighChartData:
 class KolonneData(HighChartData):
     
     def lag_dataserier(self) -> List[Dict]:
-        if self.kilde == 'excel':
-            df = self.les_excel()
-        elif self.kilde == 'df':
-            df = self.les_df()
-        else:
-            raise ValueError(f"Invalid kilde: {self.kilde}. Expected 'excel' or 'df'.")
-        antall = self.tell_antall(df)
+        antall = self.hent_antall()
         formatert_data = []
 
         for kolonne, label, data in zip(antall.keys(), self.x_axis_labels, antall.values()):
@@ -107,14 +216,7 @@ class KolonneData(HighChartData):
     
 class StabletKolonneData(HighChartData):
     def lag_dataserier(self) -> List[Dict]:
-        if self.kilde == 'excel':
-            df = self.les_excel()
-        elif self.kilde == 'df':
-            df = self.les_df()
-        else:
-            raise ValueError(f"Invalid kilde: {self.kilde}. Expected 'excel' or 'df'.")
-
-        antall = self.tell_antall(df)
+        antall = self.hent_antall()
         formatert_data = []
 
         colors = self.get_colors(len(self.svar_alternativer))  # Generate colors for all svar_alternativer
@@ -135,9 +237,30 @@ class StabletKolonneData(HighChartData):
 
 
 class ParallellData(HighChartData):
-    def __init__(self, filnavn: str, kolonner: List[str], svar_alternativer: Dict[str, List[str]] = None, tilfeldige_farger: bool = None, farger_seed: int = None):
-        self.svar_alternativer = svar_alternativer or {}
-        super().__init__(filnavn, kolonner, self.svar_alternativer, tilfeldige_farger=tilfeldige_farger, farger_seed=farger_seed)
+    """
+    Dataserier for parallelle koordinater, én linje per respondent.
+
+    Med maks_linjer slås respondenter med nøyaktig samme svar sammen til én linje, der linjebredden
+    viser hvor mange som svarte slik, og bare de maks_linjer vanligste svarkombinasjonene tas med.
+    Det holder diagrammet brukbart med titusenvis av respondenter.
+    """
+    _cache_attributter = ('_respons_mapping',)
+
+    def __init__(self, filnavn: str = None, kolonner: List[str] = None, svar_alternativer: Dict[str, List[str]] = None, tilfeldige_farger: bool = None, farger_seed: int = None, cache: Union[bool, DataserieCache] = False, kilde: Union[str, Datakilde] = 'excel', df: pd.DataFrame = None, maks_linjer: Optional[int] = None):
+        self._respons_mapping = None
+        self.maks_linjer = maks_linjer
+        super().__init__(filnavn=filnavn, kilde=kilde, df=df, kolonner=kolonner, svar_alternativer=svar_alternativer or {}, tilfeldige_farger=tilfeldige_farger, farger_seed=farger_seed, cache=cache)
+
+    @property
+    def respons_mapping(self) -> Dict:
+        # respons_mapping settes når dataseriene bygges
+        if self._respons_mapping is None:
+            self.dataserier
+        return self._respons_mapping
+
+    @respons_mapping.setter
+    def respons_mapping(self, respons_mapping: Dict):
+        self._respons_mapping = respons_mapping
 
     def langt_format(self, df: pd.DataFrame) -> pd.DataFrame:
         df = df.reset_index(names='idx')
@@ -153,32 +276,45 @@ class ParallellData(HighChartData):
             if kolonne in self.svar_alternativer:
                 categories = self.svar_alternativer[kolonne]
             else:
-                categories = df_lang[df_lang['Spørsmål'] == kolonne]['Svar'].unique()
+                # Manglende svar får ingen kategori, og flere NaN ville gitt like nøkler i mappingen
+                categories = df_lang[df_lang['Spørsmål'] == kolonne]['Svar'].dropna().unique()
             for idx, response in enumerate((categories)):
                 respons_mapping[response] = idx
         
-        df_lang['MappedSvar'] = df_lang['Svar'].astype(str).map(respons_mapping)
+        # Svar og kategorier sammenlignes som tekst, så 1, 1.0 og '1' gir samme verdi
+        tekst_mapping = {_svar_som_tekst(response): idx for response, idx in respons_mapping.items()}
+        df_lang['MappedSvar'] = _som_tekst(df_lang['Svar']).map(tekst_mapping)
         self.respons_mapping = respons_mapping
         return df_lang, respons_mapping
     
     def generer_parallell_koordinat_data(self, df_lang_med_mapping):
-        parallel_coordinates_data = []
-        for _, group in df_lang_med_mapping.groupby('idx'):
-            mapped_svar_list = group['MappedSvar'].tolist()
-            parallel_coordinates_data.append(mapped_svar_list)
-        
-        return parallel_coordinates_data
+        # Én rad per respondent med svarene i samme rekkefølge som kolonner
+        bred = df_lang_med_mapping.pivot(index='idx', columns='Spørsmål', values='MappedSvar')
+        return bred[self.kolonner].values.tolist()
+
+    def saml_linjer(self, data: List[List]) -> List[Dict]:
+        """
+        Slår sammen like svarkombinasjoner og beholder de maks_linjer vanligste.
+        """
+        antall = pd.DataFrame(data).value_counts(dropna=False).head(self.maks_linjer)
+        stoerste = antall.iloc[0] if len(antall) else 1
+        formatert_data = []
+        for svar, antall_svar in antall.items():
+            formatert_data.append({
+                'name': f'{antall_svar} svar',
+                'data': [None if pd.isna(verdi) else verdi for verdi in svar],
+                'lineWidth': float(1 + 9 * antall_svar / stoerste),
+                'custom': {'antall': int(antall_svar)},
+            })
+        return formatert_data
 
     def lag_dataserier(self) -> List[Dict]:
-        if self.kilde == 'excel':
-            df = self.les_excel()
-        elif self.kilde == 'df':
-            df = self.les_df()
-        else:
-            raise ValueError(f"Invalid kilde: {self.kilde}. Expected 'excel' or 'df'.")
+        df = self.hent_df()
         df = self.langt_format(df)
         df, self.respons_mapping = self.map_responser_til_verdier(df)
         data = self.generer_parallell_koordinat_data(df)
+        if self.maks_linjer is not None:
+            return self.saml_linjer(data)
         formatert_data = []
         for i in range(len(data)):
             formatert_data.append({
@@ -188,19 +324,80 @@ class ParallellData(HighChartData):
         return formatert_data
     
 
-class IndikatorData(HighChartData):
-    
-    def finn_gjennomsnitt(self, df: pd.Series) -> float:
-        return  df.mean().values[0]
+class StatistikkData(HighChartData, ABC):
+    """
+    Felles grunnlag for diagrammer som viser gjennomsnitt per spørsmål, som bullet- og indikatordiagram.
+
+    Statistikken beregnes i én vektorisert aggregering når dataseriene bygges. Med gruppe_kolonne
+    beregnes den i tillegg per gruppe, og dataserier_per_gruppe gir dataserier for små multipler.
+    """
+    _cache_attributter = ('_statistikk', '_statistikk_per_gruppe')
+
+    def __init__(self, *args, gruppe_kolonne: str = None, konfidensnivaa: float = 0.95, **kwargs):
+        self.gruppe_kolonne = gruppe_kolonne
+        self.konfidensnivaa = konfidensnivaa
+        self._statistikk = None
+        self._statistikk_per_gruppe = None
+        super().__init__(*args, **kwargs)
+
+    def kolonner_som_leses(self) -> Optional[List[str]]:
+        if self.gruppe_kolonne is None:
+            return self.kolonner
+        return self.kolonner + [self.gruppe_kolonne]
+
+    @property
+    def statistikk(self) -> pd.DataFrame:
+        # statistikken settes når dataseriene bygges
+        if self._statistikk is None:
+            self.dataserier
+        return self._statistikk
+
+    @property
+    def statistikk_per_gruppe(self) -> Optional[pd.DataFrame]:
+        if self.gruppe_kolonne is not None and self._statistikk_per_gruppe is None:
+            self.dataserier
+        return self._statistikk_per_gruppe
+
+    def beregn_statistikk(self, df: pd.DataFrame) -> pd.DataFrame:
+        self._statistikk = beregn_statistikk(df, self.kolonner, konfidensnivaa=self.konfidensnivaa)
+        if self.gruppe_kolonne is not None:
+            self._statistikk_per_gruppe = beregn_statistikk(df, self.kolonner, self.gruppe_kolonne, self.konfidensnivaa)
+        return self._statistikk
+
+    @abstractmethod
+    def formater_dataserier(self, statistikk: pd.DataFrame) -> List[Dict]:
+        """
+        Lager dataseriene fra statistikken for alle respondentene eller for én gruppe.
+        """
+
+    def dataserier_per_gruppe(self) -> Dict[str, List[Dict]]:
+        if self.statistikk_per_gruppe is None:
+            raise ValueError("dataserier_per_gruppe krever at gruppe_kolonne er satt.")
+        return {
+            gruppe: self.formater_dataserier(statistikk)
+            for gruppe, statistikk in self.statistikk_per_gruppe.groupby(self.gruppe_kolonne, sort=False)
+        }
+
+    def hent_statistikk(self) -> pd.DataFrame:
+        """
+        Beregner statistikken som beregn_statistikk. Kan kilden aggregere, beregnes den i kilden i stedet
+        for å hente alle radene.
+        """
+        if not self.datakilde.aggregerer:
+            return self.beregn_statistikk(self.hent_df())
+        self._statistikk = self.datakilde.beregn_statistikk(self.kolonner, konfidensnivaa=self.konfidensnivaa)
+        if self.gruppe_kolonne is not None:
+            self._statistikk_per_gruppe = self.datakilde.beregn_statistikk(self.kolonner, self.gruppe_kolonne, self.konfidensnivaa)
+        return self._statistikk
 
     def lag_dataserier(self) -> List[Dict]:
-        if self.kilde == 'excel':
-            df = self.les_excel()
-        elif self.kilde == 'df':
-            df = self.les_df()
-        else:
-            raise ValueError(f"Invalid kilde: {self.kilde}. Expected 'excel' or 'df'.")
-        gj_snitt = self.finn_gjennomsnitt(df)
+        return self.formater_dataserier(self.hent_statistikk())
+
+
+class IndikatorData(StatistikkData):
+
+    def formater_dataserier(self, statistikk: pd.DataFrame) -> List[Dict]:
+        gj_snitt = statistikk['gjennomsnitt'].iloc[0]
 
         formatert_data = [{
                 'data': gj_snitt,
@@ -220,31 +417,57 @@ class IndikatorData(HighChartData):
     
 
 class PieData(HighChartData):
+    def __init__(self, *args, vekt_kolonne: str = None, **kwargs):
+        self.vekt_kolonne = vekt_kolonne
+        super().__init__(*args, **kwargs)
+
+    def kolonner_som_leses(self) -> Optional[List[str]]:
+        if self.vekt_kolonne is None:
+            return self.kolonner
+        return self.kolonner + [self.vekt_kolonne]
+
+    def tell_svar(self, df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+        # Teller per kolonne i bredt format og slår sammen de unike svarene før de plasseres i kategorier
+        antall = pd.concat([df[kolonne].value_counts(dropna=False) for kolonne in self.kolonner])
+        if self.vekt_kolonne is None:
+            return antall, antall
+        vekter = pd.to_numeric(df[self.vekt_kolonne], errors='coerce').fillna(0)
+        vektet_antall = pd.concat([vekter.groupby(df[kolonne], dropna=False).sum() for kolonne in self.kolonner])
+        return antall, vektet_antall
+
+    def hent_svar(self) -> Tuple[pd.Series, pd.Series]:
+        """
+        Teller svarene som tell_svar. Kan kilden aggregere, telles det i kilden i stedet for å hente alle radene.
+        """
+        if not self.datakilde.aggregerer:
+            return self.tell_svar(self.hent_df())
+        telling = self.datakilde.tell(self.kolonner, self.vekt_kolonne).set_index('svar')
+        if self.vekt_kolonne is None:
+            return telling['antall'], telling['antall']
+        return telling['antall'], telling['vekt']
 
     def finn_andel(self, df):
-        df = self.langt_format(df)
+        return self.beregn_andel(*self.tell_svar(df))
 
-        df['Svar'] = df['Svar'].apply(lambda x: x if x in self.svar_alternativer else 'Annet')
+    def beregn_andel(self, antall: pd.Series, vektet_antall: pd.Series) -> List[Dict]:
+        kategorier = self.svar_alternativer + ['Annet']
 
-        df_andel = df.groupby('Svar').agg(Antall=('Svar', 'count')).reset_index()
+        # Svar som ikke er blant svar_alternativer, inkludert manglende svar, telles som 'Annet'
+        def per_kategori(telling: pd.Series) -> np.ndarray:
+            svar = normaliser_svar(telling.index, self.svar_alternativer)
+            kategori = svar.where(svar.isin(self.svar_alternativer), 'Annet').astype(object).to_numpy()
+            return telling.groupby(kategori, sort=False).sum().reindex(kategorier, fill_value=0).to_numpy(dtype=float)
 
-        
-        df_andel['Prosent'] = (df_andel['Antall'] / df_andel['Antall'].sum()) * 100
-        df_andel['Prosent'] = df_andel['Prosent'].fillna(0)
-        df_andel['Svar'] = pd.Categorical(df_andel['Svar'], categories=self.svar_alternativer + ['Annet'], ordered=True)
-        df_andel = df_andel.sort_values('Svar')
+        antall = per_kategori(antall)
+        vektet_antall = per_kategori(vektet_antall)
+        total = vektet_antall.sum()
+        prosent = vektet_antall / total * 100 if total else np.zeros(len(kategorier))
 
-        data = df_andel[['Svar', 'Prosent']].rename(columns={'Svar': 'name', 'Prosent': 'y'}).to_dict(orient='records')
+        data = [{'name': kategori, 'y': float(prosent[i])} for i, kategori in enumerate(kategorier) if antall[i] > 0]
         return data
 
     def lag_dataserier(self) -> List[Dict]:
-        if self.kilde == 'excel':
-            df = self.les_excel()
-        elif self.kilde == 'df':
-            df = self.les_df()
-        else:
-            raise ValueError(f"Invalid kilde: {self.kilde}. Expected 'excel' or 'df'.")
-        data = self.finn_andel(df)
+        data = self.beregn_andel(*self.hent_svar())
         formatert_data = [{
             'tooltip': {'value_suffix': '%', 'value_decimals': '1'},
             'type': 'pie',
@@ -276,58 +499,49 @@ class PieData(HighChartData):
         return formatert_data
 
 
-class BulletData(HighChartData):
-    def __init__(self, filnavn: str, kolonner: List[str], svar_alternativer: List[str], x_axis_categories: List[str] = None):
+class BulletData(StatistikkData):
+    def __init__(self, filnavn: str = None, kolonner: List[str] = None, svar_alternativer: List[str] = None, x_axis_categories: List[str] = None, cache: Union[bool, DataserieCache] = False, kilde: Union[str, Datakilde] = 'excel', df: pd.DataFrame = None, gruppe_kolonne: str = None, konfidensnivaa: float = 0.95):
         self.x_axis_categories = x_axis_categories or kolonner
-        super().__init__(filnavn, kolonner, svar_alternativer)
+        super().__init__(filnavn=filnavn, kilde=kilde, df=df, kolonner=kolonner, svar_alternativer=svar_alternativer, cache=cache, gruppe_kolonne=gruppe_kolonne, konfidensnivaa=konfidensnivaa)
 
-    def gjennomsnitt_per_kolonne(self, df, spoersmaal):
-        df_spoersmaal = df[df['Spørsmål'] == spoersmaal]
-        return df_spoersmaal['Svar'].mean()
-
-    def lag_dataserier(self) -> List[Dict]:
-        if self.kilde == 'excel':
-            df = self.les_excel()
-        elif self.kilde == 'df':
-            df = self.les_df()
-        else:
-            raise ValueError(f"Invalid kilde: {self.kilde}. Expected 'excel' or 'df'.")
-        df_long = self.langt_format(df)
-        df_long['Svar'] = pd.to_numeric(df_long['Svar'], errors='coerce')
-
-        gj_snitt = [self.gjennomsnitt_per_kolonne(df_long, q) for q in self.kolonner]
+    def formater_dataserier(self, statistikk: pd.DataFrame) -> List[Dict]:
         farger = load_cmap("flattastic_flatui").colors
 
-        dataserier = [{'y': gj_snitt[i] if not pd.isna(gj_snitt[i]) else 0, 
+        dataserier = [{'y': gj_snitt if not pd.isna(gj_snitt) else 0, 
                         'target': 5, 'color': farger[5]} 
-                        for i in range(len(self.kolonner))]
+                        for gj_snitt in statistikk['gjennomsnitt']]
         return dataserier
 
 
 class JitterKommentarData(HighChartData):
     def __init__(self, 
-                 kilde: str = None,
-                 df: str = None,
+                 kilde: Union[str, Datakilde] = None,
+                 df: pd.DataFrame = None,
                  filnavn: str = None, 
                  kolonner: Dict[str, str] = None,
-                 svar_alternativer: List[str] = None):
+                 svar_alternativer: List[str] = None,
+                 cache: Union[bool, DataserieCache] = False):
         self.kilde = kilde       
+        self.filnavn = filnavn
         self.svar_alternativer = svar_alternativer
         self.kolonner = kolonner or {}
         self.label = self.kolonner.get('label', 'label')
         self.kommentar = self.kolonner.get('kommentar', 'kommentar')
+        self.cache = cache
         self.df = df
-        self.df = self.get_df()
-        self.dataserier = self.lag_dataserier()
+        self._datakilde = None
+        self._dataserier = None
+
+    def kolonner_som_leses(self) -> Optional[List[str]]:
+        # Manglende label-kolonne skal gi tomme dataserier, så bare kolonnene som finnes leses.
+        # Kan ikke kilden si hvilke kolonner den har, leses alle.
+        kolonnenavn = self.datakilde.kolonnenavn()
+        if kolonnenavn is None:
+            return None
+        return [kolonne for kolonne in (self.label, self.kommentar) if kolonne in kolonnenavn]
 
     def get_df(self):
-        if self.kilde == 'pickle':
-            df = self.df_from_pickle
-        elif self.kilde == 'df':
-            df = self.df
-        else:
-            raise ValueError(f"Invalid kilde: {self.kilde}. Expected 'pickle' or 'df'.")
-        return df
+        return self.hent_df()
 
     def df_from_pickle(self, filnavn):
         with open(filnavn, 'rb') as f:
@@ -349,7 +563,7 @@ class JitterKommentarData(HighChartData):
         return jitter_data
 
     def lag_dataserier(self) -> List[Dict]:
-        df = self.df
+        df = self.get_df()
         colors = load_cmap("flattastic_flatui").colors
         colors = [colors[3], colors[2], colors[1], colors[6]]
         dataserie = []
@@ -389,14 +603,17 @@ class KommentarData(HighChartData):
                  filnavn: str = None, 
                 kolonner: Dict[str, str] = None,
                 svar_alternativer: List[str] = None,
-                kilde: str = None,
-                df: pd.DataFrame = None):
+                kilde: Union[str, Datakilde] = None,
+                df: pd.DataFrame = None,
+                cache: Union[bool, DataserieCache] = False):
         self.filnavn = filnavn
         self.svar_alternativer = svar_alternativer
         self.kolonner = kolonner
         self.kilde = kilde
         self.df = df
-        self.dataserier = self.lag_dataserier()
+        self.cache = cache
+        self._datakilde = None
+        self._dataserier = None
     
     def formater_kommentar_linjeskift(self, comment, max_length=50):
         if not isinstance(comment, str):
@@ -413,12 +630,7 @@ class KommentarData(HighChartData):
         return formatted_comment.strip()  
 
     def lag_dataserier(self) -> List[Dict]:
-        if self.kilde == 'excel':
-            df = self.les_excel()
-        elif self.kilde == 'df':
-            df = self.les_df()
-        else:
-            raise ValueError(f"Invalid kilde: {self.kilde}. Expected 'excel' or 'df'.")
+        df = self.hent_df()
         df = df.sample(frac=1).reset_index(drop=True)
         colors = load_cmap("flattastic_flatui").colors
         colors = [colors[6]]
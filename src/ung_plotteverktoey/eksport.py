@@ -0,0 +1,116 @@
+import html
+import os
+from typing import Dict, Iterable, List, Optional
+
+from ung_plotteverktoey.plots import HIGHCHARTS_URL, HighChartBase, sorter_moduler
+from ung_plotteverktoey.serialisering import til_json
+
+
+def diagram_moduler(diagrammer: Iterable[HighChartBase]) -> List[str]:
+    """
+    Finner Highcharts-modulene som trengs for alle diagrammene, hver modul bare én gang.
+
+    Returns
+    -------
+    List[str]
+        Modulene i rekkefølgen de må lastes, med 'highcharts' først.
+    """
+    moduler = ['highcharts']
+    for diagram in diagrammer:
+        for modul in diagram.moduler():
+            if modul not in moduler:
+                moduler.append(modul)
+    return sorter_moduler(moduler)
+
+
+def skript_tagger(moduler: Iterable[str], url: str = HIGHCHARTS_URL) -> str:
+    return '\n'.join(f'<script src="{url}/{modul}.js"></script>' for modul in moduler)
+
+
+def diagram_js(diagram: HighChartBase) -> str:
+    """
+    Returnerer JavaScript som tegner diagrammet i elementet med id diagram.diagram_id.
+    Funksjoner i innstillingene, f.eks. formatter og events, beholdes.
+    """
+    return diagram.til_js()
+
+
+def diagram_json(diagram: HighChartBase) -> Dict:
+    """
+    Returnerer innstillingene til diagrammet som en dict som kan lagres som JSON.
+    JavaScript-funksjoner i innstillingene kan ikke uttrykkes i JSON og blir utelatt.
+    """
+    innstillinger = diagram.innstillinger
+    # Samme trimming som HighchartsOptions.to_json, men uten å feile på numpy-tall i dataseriene
+    som_dict = innstillinger.trim_dict(innstillinger._to_untrimmed_dict(),
+                                       to_json=True,
+                                       context=innstillinger.__class__.__name__)
+    if diagram.raa_serier is not None:
+        som_dict['series'] = diagram.raa_serier
+    return som_dict
+
+
+def eksporter_json(diagrammer: Iterable[HighChartBase], filnavn: str) -> None:
+    """
+    Lagrer innstillingene til mange diagrammer i én JSON-fil, med diagram_id som nøkkel,
+    sammen med modulene som trengs for å tegne dem.
+    """
+    diagrammer = list(diagrammer)
+    innhold = {
+        'moduler': diagram_moduler(diagrammer),
+        'diagrammer': {diagram.diagram_id: diagram_json(diagram) for diagram in diagrammer},
+    }
+    with open(filnavn, 'w', encoding='utf-8') as f:
+        f.write(til_json(innhold))
+
+
+def eksporter_html(diagrammer: Iterable[HighChartBase],
+                   filnavn: str,
+                   tittel: str = ' ',
+                   js_filnavn: Optional[str] = None,
+                   highcharts_url: str = HIGHCHARTS_URL) -> None:
+    """
+    Skriver mange diagrammer til én statisk HTML-side uten notebook eller Quarto.
+
+    Highcharts og modulene lastes bare én gang for hele siden, og innstillingene til alle
+    diagrammene serialiseres én gang til ett skript.
+
+    Parameters
+    ----------
+    diagrammer : Iterable[HighChartBase]
+        Diagrammene som skal med, i rekkefølgen de vises.
+    filnavn : str
+        Stien til HTML-filen.
+    tittel : str, optional
+        Tittelen på siden (default er ' ').
+    js_filnavn : str, optional
+        Hvis satt lagres skriptet med diagrammene i denne filen ved siden av HTML-filen og lenkes
+        inn, i stedet for å legges direkte i siden. Filnavnet er relativt til mappen til HTML-filen.
+    highcharts_url : str, optional
+        Adressen Highcharts lastes fra, f.eks. en lokal kopi (default er HIGHCHARTS_URL).
+    """
+    diagrammer = list(diagrammer)
+    skript = '\n'.join(diagram_js(diagram) for diagram in diagrammer)
+    if js_filnavn is None:
+        diagram_skript = f'<script>\n{skript}\n</script>'
+    else:
+        with open(os.path.join(os.path.dirname(os.path.abspath(filnavn)), js_filnavn), 'w', encoding='utf-8') as f:
+            f.write(skript)
+        diagram_skript = f'<script src="{html.escape(js_filnavn)}"></script>'
+
+    elementer = '\n'.join(f'<div id="{diagram.diagram_id}"></div>' for diagram in diagrammer)
+    side = f"""<!DOCTYPE html>
+<html lang="no">
+<head>
+<meta charset="utf-8">
+<title>{html.escape(tittel)}</title>
+{skript_tagger(diagram_moduler(diagrammer), highcharts_url)}
+</head>
+<body>
+{elementer}
+{diagram_skript}
+</body>
+</html>
+"""
+    with open(filnavn, 'w', encoding='utf-8') as f:
+        f.write(side)
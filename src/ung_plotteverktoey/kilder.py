@@ -0,0 +1,626 @@
+import hashlib
+import os
+import pickle
+import warnings
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ung_plotteverktoey.cache import fingeravtrykk_df, fingeravtrykk_fil
+from ung_plotteverktoey.statistikk import STATISTIKK_KOLONNER, legg_til_konfidensintervall
+
+
+def normaliser_kolonne(kolonne_navn: str) -> str:
+    return (
+        kolonne_navn
+        .strip()
+        .lower()
+        .replace(' ', '_')
+        .replace('\xa0', '_')
+        .replace('\n', '')
+    )
+
+
+class Datakilde(ABC):
+    """
+    Felles grensesnitt for å laste data til HighChartData-klassene.
+
+    En instans kan deles mellom flere diagrammer, slik at kilden bare lastes én gang.
+
+    Kilder med aggregerer = True kan telle svar og beregne statistikk selv med tell og
+    beregn_statistikk, og da hentes bare det aggregerte resultatet i stedet for alle radene.
+    """
+    aggregerer = False
+
+    @abstractmethod
+    def les(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Leser data fra kilden.
+
+        Parameters
+        ----------
+        kolonner : List[str], optional
+            Kolonnene som skal returneres. Hvis None returneres alle kolonner.
+
+        Returns
+        -------
+        pd.DataFrame
+            Dataene med kolonnene i oppgitt rekkefølge.
+        """
+
+    def fingeravtrykk(self) -> Optional[str]:
+        """
+        Returnerer et fingeravtrykk av kildens innhold, brukt som del av cache-nøkkelen.
+        """
+        return None
+
+    def kolonnenavn(self) -> Optional[List[str]]:
+        """
+        Returnerer kolonnene i kilden uten å lese dataene, eller None hvis kilden ikke kan det.
+        """
+        return None
+
+
+class DataFrameKilde(Datakilde):
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+
+    def les(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        if kolonner is None:
+            return self.df
+        return self.df[kolonner]
+
+    def kolonnenavn(self) -> Optional[List[str]]:
+        return list(self.df.columns)
+
+    def fingeravtrykk(self) -> Optional[str]:
+        return fingeravtrykk_df(self.df)
+
+
+# Prosessfelles cache med normaliserte ark, nøkkel er (sti, ark, engine) og verdi er (fingeravtrykk, df, komplett)
+_arbeidsbok_cache: Dict[Tuple[str, Union[str, int], str], Tuple[str, pd.DataFrame, bool]] = {}
+
+
+def _les_ark(filnavn: str, ark: Union[str, int], engine: str, kolonner: Optional[Set[str]], parquet_mappe: Optional[str]) -> pd.DataFrame:
+    if parquet_mappe is not None:
+        parquet_fil = os.path.join(parquet_mappe, f"{fingeravtrykk_fil(filnavn)}_{ark}.parquet")
+        if not os.path.exists(parquet_fil):
+            df = pd.read_excel(io=filnavn, sheet_name=ark, engine=engine)
+            df.columns = [normaliser_kolonne(str(kol)) for kol in df.columns]
+            os.makedirs(parquet_mappe, exist_ok=True)
+            try:
+                df.to_parquet(parquet_fil, index=False)
+            except (ValueError, TypeError, ImportError) as e:
+                # Ark med blandede typer i samme kolonne kan ikke lagres som Parquet
+                warnings.warn(f"Kunne ikke lagre {filnavn} som Parquet, leser fra Excel: {e}")
+                return df if kolonner is None else df[[kol for kol in df.columns if kol in kolonner]]
+        return pd.read_parquet(parquet_fil, columns=None if kolonner is None else sorted(kolonner))
+
+    usecols = None if kolonner is None else (lambda kol: normaliser_kolonne(str(kol)) in kolonner)
+    df = pd.read_excel(io=filnavn, sheet_name=ark, engine=engine, usecols=usecols)
+    df.columns = [normaliser_kolonne(str(kol)) for kol in df.columns]
+    return df
+
+
+def les_arbeidsbok(filnavn: str,
+                   kolonner: Optional[List[str]] = None,
+                   ark: Union[str, int] = 0,
+                   engine: str = 'openpyxl',
+                   parquet_mappe: Optional[str] = None) -> pd.DataFrame:
+    """
+    Leser et ark fra en Excel-fil med normaliserte kolonnenavn, og deler resultatet i hele prosessen.
+
+    Hvert ark parses bare én gang per endring av filen. Ber man om kolonner som ikke er lest
+    ennå, leses bare de manglende kolonnene og legges til det som allerede er i cachen.
+
+    Parameters
+    ----------
+    filnavn : str
+        Stien til Excel-filen.
+    kolonner : List[str], optional
+        Kolonnene som trengs (normaliseres før oppslag). Hvis None leses hele arket.
+    ark : Union[str, int], optional
+        Arknavn eller indeks (default er 0).
+    engine : str, optional
+        Engine til pd.read_excel, f.eks. 'openpyxl' eller den raskere 'calamine' (default er 'openpyxl').
+    parquet_mappe : str, optional
+        Hvis satt konverteres arket til Parquet i denne mappen første gang, og senere lesinger
+        henter bare de nødvendige kolonnene fra Parquet-filen.
+
+    Returns
+    -------
+    pd.DataFrame
+        Arket med normaliserte kolonnenavn. Returnerer alle kolonner som er lest så langt.
+        Tabellen deles med cachen og skal ikke endres.
+    """
+    noekkel = (os.path.abspath(filnavn), ark, engine)
+    avtrykk = fingeravtrykk_fil(filnavn)
+    oppfoering = _arbeidsbok_cache.get(noekkel)
+    if oppfoering is None or oppfoering[0] != avtrykk:
+        oppfoering = (avtrykk, pd.DataFrame(), False)
+
+    _, df, komplett = oppfoering
+    if kolonner is None:
+        if not komplett:
+            df = _les_ark(filnavn, ark, engine, None, parquet_mappe)
+            komplett = True
+    elif not komplett:
+        mangler = {normaliser_kolonne(kol) for kol in kolonner} - set(df.columns)
+        if mangler:
+            df_nye = _les_ark(filnavn, ark, engine, mangler, parquet_mappe)
+            if df.columns.empty:
+                df = df_nye
+            elif len(df_nye) == len(df):
+                df = pd.concat([df, df_nye], axis=1)
+            else:
+                df = _les_ark(filnavn, ark, engine, None, parquet_mappe)
+                komplett = True
+
+    _arbeidsbok_cache[noekkel] = (avtrykk, df, komplett)
+    return df
+
+
+def toem_arbeidsbok_cache() -> None:
+    _arbeidsbok_cache.clear()
+
+
+class ExcelKilde(Datakilde):
+    """
+    Excel-fil som kilde. Lesingen går via les_arbeidsbok, slik at flere diagrammer fra samme fil deler én parsing.
+
+    engine og parquet_mappe faller tilbake til klasseattributtene standard_engine og
+    standard_parquet_mappe, som også gjelder for kilde='excel'.
+    """
+    standard_engine = 'openpyxl'
+    standard_parquet_mappe = None
+
+    def __init__(self, filnavn: str, ark: Union[str, int] = 0, engine: str = None, parquet_mappe: str = None):
+        self.filnavn = filnavn
+        self.ark = ark
+        self.engine = engine or self.standard_engine
+        self.parquet_mappe = parquet_mappe or self.standard_parquet_mappe
+
+    def les_normalisert(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Returnerer arket med normaliserte kolonnenavn. Tabellen deles med cachen og skal ikke endres.
+        """
+        return les_arbeidsbok(self.filnavn, kolonner, ark=self.ark, engine=self.engine, parquet_mappe=self.parquet_mappe)
+
+    def les(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        df = self.les_normalisert(kolonner)
+        if kolonner is None:
+            # Arket deles med cachen, så diagrammer som endrer det må få sin egen kopi
+            return df.copy()
+        df_selected = df[[normaliser_kolonne(kol) for kol in kolonner]]
+        df_selected.columns = kolonner
+        return df_selected
+
+    def fingeravtrykk(self) -> Optional[str]:
+        return fingeravtrykk_fil(self.filnavn)
+
+
+class PickleKilde(Datakilde):
+    def __init__(self, filnavn: str):
+        self.filnavn = filnavn
+        self._df = None
+
+    def les(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        if self._df is None:
+            with open(self.filnavn, 'rb') as f:
+                self._df = pickle.load(f)
+        if kolonner is None:
+            return self._df
+        return self._df[kolonner]
+
+    def fingeravtrykk(self) -> Optional[str]:
+        return fingeravtrykk_fil(self.filnavn)
+
+
+class ParquetKilde(Datakilde):
+    """
+    Parquet- eller Feather-fil som kilde, der bare kolonnene diagrammet trenger leses.
+
+    Feather-filer (.feather, .arrow) leses med minnetilordning, så kolonnene hentes fra filen først når
+    de brukes. Parquet-filer leses med memory_map. filnavn kan også være en mappe med Parquet-filer,
+    f.eks. mappen til et InkrementeltUttrekk, der bare delene i den lagrede tilstanden leses.
+
+    Dette er det anbefalte mellomformatet mellom kjoer_spoerring og diagrammene, f.eks.
+    kjoer_spoerring(sql, "bq").to_parquet("uttrekk.parquet") og kilde='parquet'.
+
+    Parameters
+    ----------
+    filnavn : str
+        Stien til filen eller mappen.
+    """
+    FEATHER_ENDELSER = ('.feather', '.arrow', '.ipc')
+
+    def __init__(self, filnavn: str):
+        self.filnavn = filnavn
+
+    def _er_feather(self) -> bool:
+        return self.filnavn.lower().endswith(self.FEATHER_ENDELSER)
+
+    def _filer(self) -> List[str]:
+        if not os.path.isdir(self.filnavn):
+            return [self.filnavn]
+        from ung_dbverktoey.inkrementell import lagrede_deler
+
+        # I mappen til et InkrementeltUttrekk leses bare delene i tilstanden, ikke halvferdige oppdateringer
+        deler = lagrede_deler(self.filnavn)
+        if deler is not None:
+            return deler
+        return sorted(os.path.join(self.filnavn, fil) for fil in os.listdir(self.filnavn) if fil.endswith('.parquet'))
+
+    def _feather_kolonner(self) -> Tuple[List[str], List[str]]:
+        # Kolonnene i filen og indekskolonnene som pyarrow lagret med preserve_index
+        import pyarrow as pa
+
+        with pa.memory_map(self.filnavn) as fil:
+            skjema = pa.ipc.open_file(fil).schema
+        indeks = [navn for navn in (skjema.pandas_metadata or {}).get('index_columns', []) if isinstance(navn, str)]
+        return [navn for navn in skjema.names if navn not in indeks], indeks
+
+    def les(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        if self._er_feather():
+            from pyarrow import feather
+
+            if kolonner is not None:
+                # Indekskolonnene må leses med for at to_pandas skal gjenopprette indeksen
+                kolonner = list(kolonner) + [navn for navn in self._feather_kolonner()[1] if navn not in kolonner]
+            return feather.read_table(self.filnavn, columns=kolonner, memory_map=True).to_pandas()
+        # En mappe leses fil for fil, slik at deler med ulike typer i en kolonne også kan slås sammen
+        deler = [pd.read_parquet(fil, columns=kolonner, memory_map=True) for fil in self._filer()]
+        return pd.concat(deler, ignore_index=True) if len(deler) > 1 else deler[0]
+
+    def kolonnenavn(self) -> Optional[List[str]]:
+        if self._er_feather():
+            return self._feather_kolonner()[0]
+        from pyarrow import parquet
+
+        return parquet.read_schema(self._filer()[0]).names
+
+    def fingeravtrykk(self) -> Optional[str]:
+        if not os.path.isdir(self.filnavn):
+            return fingeravtrykk_fil(self.filnavn)
+        innhold = '|'.join(fingeravtrykk_fil(fil) for fil in self._filer())
+        return hashlib.sha256(innhold.encode("utf-8")).hexdigest()
+
+
+# Uttrykkene som skiller BigQuery og DVH (Oracle) i spørringene fra SqlKilde
+_SQL_DIALEKTER: Dict[str, Dict[str, str]] = {
+    'bq': {
+        'identifikator': '`{}`',
+        'tekst': 'CAST({} AS STRING)',
+        'tall': 'SAFE_CAST({} AS FLOAT64)',
+        'median': 'APPROX_QUANTILES({}, 2)[OFFSET(1)]',
+    },
+    'dvh': {
+        'identifikator': '{}',
+        'tekst': 'TO_CHAR({})',
+        'tall': 'TO_NUMBER({} DEFAULT NULL ON CONVERSION ERROR)',
+        'median': 'MEDIAN({})',
+    },
+}
+
+
+def _sql_tekst(verdi: str) -> str:
+    return "'" + str(verdi).replace("'", "''") + "'"
+
+
+class SqlKilde(Datakilde):
+    """
+    Tabell eller spørring i BigQuery eller DVH som kilde, der tellinger, andeler og gjennomsnitt
+    beregnes med GROUP BY i databasen.
+
+    KolonneData, StabletKolonneData, PieData og diagrammene basert på StatistikkData henter da bare
+    det aggregerte resultatet. Andre diagrammer henter kolonnene de trenger med les.
+
+    Svarene telles som tekst. Diagrammene sammenligner dem med svar_alternativer med normaliser_svar,
+    som tall hvis svaralternativene er tall, og får samme resultat som fra en DataFrame. I BigQuery er medianen
+    tilnærmet (APPROX_QUANTILES). Fingeravtrykket bygger på spørringen, så endringer i tabellen
+    fanges ikke opp av cachen for dataserier.
+
+    Parameters
+    ----------
+    tabell : str, optional
+        Tabellen, f.eks. "prosjekt.datasett.tabell".
+    sql : str, optional
+        Spørring som brukes i stedet for en tabell.
+    database : str, optional
+        "bq" eller "dvh" (default er "bq").
+    connection : optional
+        Tilkobling som gjenbrukes. Hvis None kobles det til for hver spørring.
+    """
+    aggregerer = True
+
+    def __init__(self, tabell: str = None, sql: str = None, database: str = 'bq', connection=None):
+        if (tabell is None) == (sql is None):
+            raise ValueError("Oppgi enten tabell eller sql.")
+        database = database.lower()
+        if database not in _SQL_DIALEKTER:
+            raise ValueError(f"Invalid database: {database}. Expected one of {list(_SQL_DIALEKTER)}.")
+        self.tabell = tabell
+        self.sql = sql
+        self.database = database
+        self.connection = connection
+        self._dialekt = _SQL_DIALEKTER[database]
+
+    def _kolonne(self, navn: str) -> str:
+        return self._dialekt['identifikator'].format(navn)
+
+    def _fra(self) -> str:
+        if self.sql is not None:
+            return f"({self.sql}) kilde"
+        return self._kolonne(self.tabell) if self.database == 'bq' else self.tabell
+
+    def _kjoer(self, sql: str) -> pd.DataFrame:
+        from ung_dbverktoey.db import kjoer_spoerring
+
+        return kjoer_spoerring(sql, self.database, connection=self.connection)
+
+    def les(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        utvalg = '*' if kolonner is None else ', '.join(self._kolonne(kolonne) for kolonne in kolonner)
+        df = self._kjoer(f"SELECT {utvalg} FROM {self._fra()}")
+        if kolonner is not None:
+            df.columns = kolonner
+        return df
+
+    def tell(self, kolonner: List[str], vekt_kolonne: Optional[str] = None) -> pd.DataFrame:
+        """
+        Teller svarene i hver kolonne med GROUP BY.
+
+        Returns
+        -------
+        pd.DataFrame
+            Kolonnene 'kolonne', 'svar' og 'antall', og 'vekt' med summen av vekt_kolonne hvis den er satt.
+            Manglende svar har svar lik None.
+        """
+        deler = []
+        for kolonne in kolonner:
+            svar = self._dialekt['tekst'].format(self._kolonne(kolonne))
+            vekt = ''
+            if vekt_kolonne is not None:
+                vekt = f", SUM(COALESCE({self._dialekt['tall'].format(self._kolonne(vekt_kolonne))}, 0)) AS vekt"
+            deler.append(
+                f"SELECT {_sql_tekst(kolonne)} AS kolonne, {svar} AS svar, COUNT(*) AS antall{vekt} "
+                f"FROM {self._fra()} GROUP BY {svar}"
+            )
+        telling = self._kjoer('\nUNION ALL\n'.join(deler))
+        telling['antall'] = telling['antall'].astype(int)
+        if vekt_kolonne is not None:
+            telling['vekt'] = telling['vekt'].astype(float)
+        return telling
+
+    def beregn_statistikk(self,
+                          kolonner: List[str],
+                          gruppe_kolonne: str = None,
+                          konfidensnivaa: float = 0.95) -> pd.DataFrame:
+        """
+        Beregner gjennomsnitt, median, antall og standardavvik per spørsmål med GROUP BY, og gir samme
+        resultat som statistikk.beregn_statistikk.
+        """
+        if gruppe_kolonne is None:
+            gruppe_utvalg, gruppe, gruppering = '', '', ''
+        else:
+            gruppe_utvalg = f", {self._kolonne(gruppe_kolonne)} AS gruppe"
+            gruppe = ", gruppe"
+            gruppering = " WHERE gruppe IS NOT NULL GROUP BY gruppe"
+        deler = []
+        for kolonne in kolonner:
+            tall = self._dialekt['tall'].format(self._kolonne(kolonne))
+            deler.append(
+                f"SELECT {_sql_tekst(kolonne)} AS spoersmaal{gruppe}, "
+                f"AVG(verdi) AS gjennomsnitt, {self._dialekt['median'].format('verdi')} AS median, "
+                f"COUNT(verdi) AS antall, STDDEV_SAMP(verdi) AS standardavvik "
+                f"FROM (SELECT {tall} AS verdi{gruppe_utvalg} FROM {self._fra()}) utvalg{gruppering}"
+            )
+        statistikk = self._kjoer('\nUNION ALL\n'.join(deler))
+        for kolonne in ('gjennomsnitt', 'median', 'standardavvik'):
+            statistikk[kolonne] = statistikk[kolonne].astype(float)
+
+        # Samme rekkefølge som lokalt: spørsmålene som i kolonner, og gruppene sortert
+        statistikk['spoersmaal'] = pd.Categorical(statistikk['spoersmaal'], categories=kolonner, ordered=True)
+        sortering = ['spoersmaal'] if gruppe_kolonne is None else ['spoersmaal', 'gruppe']
+        statistikk = statistikk.sort_values(sortering, ignore_index=True)
+        statistikk['spoersmaal'] = statistikk['spoersmaal'].astype(str)
+        statistikk = statistikk.rename(columns={'spoersmaal': 'Spørsmål', 'gruppe': gruppe_kolonne})
+        forklarende = ['Spørsmål'] if gruppe_kolonne is None else ['Spørsmål', gruppe_kolonne]
+        return legg_til_konfidensintervall(statistikk, konfidensnivaa)[forklarende + STATISTIKK_KOLONNER]
+
+    def fingeravtrykk(self) -> Optional[str]:
+        innhold = f"{self.database}|{self.tabell}|{self.sql}"
+        return hashlib.sha256(innhold.encode("utf-8")).hexdigest()
+
+
+def _legg_sammen(samlet: Optional[pd.Series], ny: pd.Series) -> pd.Series:
+    if samlet is None:
+        return ny
+    return pd.concat([samlet, ny]).groupby(level=list(range(ny.index.nlevels)), dropna=False, sort=False).sum()
+
+
+def _statistikk_fra_antall(antall: pd.Series) -> Dict[str, float]:
+    # Samme som mean, median, count og std i pandas, men fra antall per unike verdi
+    antall = antall[antall > 0].sort_index()
+    verdier = antall.index.to_numpy(dtype=float)
+    vekter = antall.to_numpy(dtype=float)
+    n = int(vekter.sum())
+    if n == 0:
+        return {'gjennomsnitt': np.nan, 'median': np.nan, 'antall': 0, 'standardavvik': np.nan}
+    gjennomsnitt = (verdier * vekter).sum() / n
+    standardavvik = np.sqrt((vekter * (verdier - gjennomsnitt) ** 2).sum() / (n - 1)) if n > 1 else np.nan
+    kumulativ = np.cumsum(vekter)
+    median = (verdier[np.searchsorted(kumulativ, (n - 1) // 2, side='right')]
+              + verdier[np.searchsorted(kumulativ, n // 2, side='right')]) / 2
+    return {'gjennomsnitt': gjennomsnitt, 'median': median, 'antall': n, 'standardavvik': standardavvik}
+
+
+class BitKilde(Datakilde):
+    """
+    Kilde som leses i biter, for data som ikke får plass i minnet.
+
+    KolonneData, StabletKolonneData, PieData og diagrammene basert på StatistikkData teller svarene
+    bit for bit og slår sammen tellingene, så bare én bit og tellingene ligger i minnet samtidig.
+    Gjennomsnitt, median og standardavvik beregnes fra antall per unike svarverdi, og blir de samme som
+    med hele tabellen i minnet. Vektede andeler kan avvike i siste desimal, siden vektene summeres i en annen
+    rekkefølge. Minnebruken avhenger av antall unike svar, som er lite for spørreundersøkelser.
+    Andre diagrammer leser alle bitene og slår dem sammen med les.
+
+    Parameters
+    ----------
+    biter : Callable[[Optional[List[str]]], Iterable[pd.DataFrame]] | Iterable[pd.DataFrame]
+        Funksjon som tar kolonnene som trengs (None for alle) og gir bitene, slik at de kan leses flere
+        ganger og bare med de nødvendige kolonnene. Kan også være bitene direkte, f.eks. en generator,
+        men da kan de bare leses én gang.
+    """
+    aggregerer = True
+
+    def __init__(self, biter: Union[Callable[[Optional[List[str]]], Iterable[pd.DataFrame]], Iterable[pd.DataFrame]]):
+        self.biter = biter
+        self._brukt = False
+
+    @classmethod
+    def fra_parquet(cls, filnavn: str, biter: int = 100_000) -> "BitKilde":
+        """
+        Leser en Parquet-fil, eller en mappe med Parquet-filer, biter rader om gangen.
+        """
+        from pyarrow import parquet
+
+        def lag_biter(kolonner: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+            filer = ParquetKilde(filnavn)._filer()
+            for fil in filer:
+                for bit in parquet.ParquetFile(fil, memory_map=True).iter_batches(batch_size=biter, columns=kolonner):
+                    yield bit.to_pandas()
+
+        return cls(lag_biter)
+
+    @classmethod
+    def fra_spoerring(cls, sql: str, database: str = 'bq', biter: int = 100_000, connection=None) -> "BitKilde":
+        """
+        Strømmer resultatet av en spørring med kjoer_spoerring_i_biter.
+        """
+        def lag_biter(kolonner: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+            from ung_dbverktoey.db import kjoer_spoerring_i_biter
+
+            for bit in kjoer_spoerring_i_biter(sql, database, biter=biter, connection=connection):
+                yield bit if kolonner is None else bit[kolonner]
+
+        return cls(lag_biter)
+
+    def _bitene(self, kolonner: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+        if callable(self.biter):
+            for bit in self.biter(kolonner):
+                yield bit if kolonner is None else bit[kolonner]
+            return
+        if self._brukt and iter(self.biter) is self.biter:
+            raise ValueError("Bitene er allerede lest. Send med en funksjon som lager bitene for å lese dem flere ganger.")
+        self._brukt = True
+        for bit in self.biter:
+            yield bit if kolonner is None else bit[kolonner]
+
+    def les(self, kolonner: Optional[List[str]] = None) -> pd.DataFrame:
+        return pd.concat(list(self._bitene(kolonner)), ignore_index=True)
+
+    def tell(self, kolonner: List[str], vekt_kolonne: Optional[str] = None) -> pd.DataFrame:
+        """
+        Teller svarene i hver kolonne bit for bit, med samme resultat som SqlKilde.tell, men med svarene
+        som de er i stedet for som tekst.
+        """
+        antall = {kolonne: None for kolonne in kolonner}
+        vekt = {kolonne: None for kolonne in kolonner}
+        lest = kolonner if vekt_kolonne is None else kolonner + [vekt_kolonne]
+        for bit in self._bitene(lest):
+            if vekt_kolonne is not None:
+                vekter = pd.to_numeric(bit[vekt_kolonne], errors='coerce').fillna(0)
+            for kolonne in kolonner:
+                antall[kolonne] = _legg_sammen(antall[kolonne], bit[kolonne].value_counts(dropna=False))
+                if vekt_kolonne is not None:
+                    vekt[kolonne] = _legg_sammen(vekt[kolonne], vekter.groupby(bit[kolonne], dropna=False).sum())
+
+        deler = []
+        for kolonne in kolonner:
+            if antall[kolonne] is None:
+                continue
+            del_ = pd.DataFrame({'kolonne': kolonne, 'svar': antall[kolonne].index, 'antall': antall[kolonne].to_numpy()})
+            if vekt_kolonne is not None:
+                del_['vekt'] = vekt[kolonne].reindex(antall[kolonne].index).to_numpy(dtype=float)
+            deler.append(del_)
+        if not deler:
+            return pd.DataFrame(columns=['kolonne', 'svar', 'antall'] + ([] if vekt_kolonne is None else ['vekt']))
+        telling = pd.concat(deler, ignore_index=True)
+        telling['antall'] = telling['antall'].astype(int)
+        return telling
+
+    def beregn_statistikk(self,
+                          kolonner: List[str],
+                          gruppe_kolonne: str = None,
+                          konfidensnivaa: float = 0.95) -> pd.DataFrame:
+        """
+        Beregner samme statistikk som statistikk.beregn_statistikk, bit for bit.
+        """
+        antall = {kolonne: None for kolonne in kolonner}
+        grupper = None
+        lest = kolonner if gruppe_kolonne is None else kolonner + [gruppe_kolonne]
+        for bit in self._bitene(lest):
+            tall = bit[kolonner].apply(pd.to_numeric, errors='coerce')
+            if gruppe_kolonne is not None:
+                grupper = _legg_sammen(grupper, bit[gruppe_kolonne].value_counts())
+            for kolonne in kolonner:
+                if gruppe_kolonne is None:
+                    telling = tall[kolonne].value_counts()
+                else:
+                    telling = tall[kolonne].groupby([bit[gruppe_kolonne], tall[kolonne]]).size()
+                antall[kolonne] = _legg_sammen(antall[kolonne], telling)
+
+        rader = []
+        for kolonne in kolonner:
+            telling = antall[kolonne] if antall[kolonne] is not None else pd.Series(dtype=float)
+            if gruppe_kolonne is None:
+                rader.append({'Spørsmål': kolonne, **_statistikk_fra_antall(telling)})
+                continue
+            for gruppe in (grupper.sort_index().index if grupper is not None else []):
+                per_gruppe = telling.xs(gruppe, level=0) if gruppe in telling.index.get_level_values(0) else pd.Series(dtype=float)
+                rader.append({'Spørsmål': kolonne, gruppe_kolonne: gruppe, **_statistikk_fra_antall(per_gruppe)})
+
+        forklarende = ['Spørsmål'] if gruppe_kolonne is None else ['Spørsmål', gruppe_kolonne]
+        statistikk = pd.DataFrame(rader, columns=forklarende + ['gjennomsnitt', 'median', 'antall', 'standardavvik'])
+        return legg_til_konfidensintervall(statistikk, konfidensnivaa)[forklarende + STATISTIKK_KOLONNER]
+
+
+KILDER: Dict[str, Callable[..., Datakilde]] = {
+    'excel': lambda filnavn=None, df=None: ExcelKilde(filnavn),
+    'df': lambda filnavn=None, df=None: DataFrameKilde(df),
+    'pickle': lambda filnavn=None, df=None: PickleKilde(filnavn),
+    'parquet': lambda filnavn=None, df=None: ParquetKilde(filnavn),
+    'feather': lambda filnavn=None, df=None: ParquetKilde(filnavn),
+    # For kilde='bq' er filnavn tabellen i BigQuery
+    'bq': lambda filnavn=None, df=None: SqlKilde(tabell=filnavn),
+    # For kilde='biter' er df bitene, eller filnavn en Parquet-fil eller -mappe som leses i biter
+    'biter': lambda filnavn=None, df=None: BitKilde(df) if df is not None else BitKilde.fra_parquet(filnavn),
+}
+
+
+def registrer_kilde(navn: str, fabrikk: Callable[..., Datakilde]) -> None:
+    """
+    Registrerer en ny kildetype som kan brukes med kilde='<navn>'.
+
+    Parameters
+    ----------
+    navn : str
+        Navnet på kildetypen.
+    fabrikk : Callable[..., Datakilde]
+        Funksjon som tar filnavn og df som nøkkelordargumenter og returnerer en Datakilde.
+    """
+    KILDER[navn] = fabrikk
+
+
+def lag_datakilde(kilde, filnavn: str = None, df: pd.DataFrame = None) -> Datakilde:
+    """
+    Lager en Datakilde fra et kildenavn, eller returnerer kilden uendret hvis den allerede er en Datakilde.
+    """
+    if isinstance(kilde, Datakilde):
+        return kilde
+    if kilde not in KILDER:
+        raise ValueError(f"Invalid kilde: {kilde}. Expected one of {list(KILDER)} or a Datakilde.")
+    return KILDER[kilde](filnavn=filnavn, df=df)
@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+import pandas as pd
+
+from ung_dbverktoey.sporing import spenn
+from ung_plotteverktoey.data import HighChartData
+from ung_plotteverktoey.kilder import DataFrameKilde, Datakilde, ParquetKilde
+
+# Et diagram beskrives av klassen og argumentene til konstruktøren
+Spesifikasjon = Tuple[Type[HighChartData], Dict[str, Any]]
+
+# Kilden for delt_df når den ikke kan lagres som Arrow IPC, satt én gang per prosess av _initialiser
+_delt_kilde: Optional[Datakilde] = None
+
+
+def _initialiser(kilde: Optional[Datakilde]) -> None:
+    global _delt_kilde
+    _delt_kilde = kilde
+
+
+def _bruker_delt_df(argumenter: Dict[str, Any]) -> bool:
+    return all(argumenter.get(navn) is None for navn in ('kilde', 'df', 'filnavn'))
+
+
+def _bygg(klasse: Type[HighChartData], argumenter: Dict[str, Any]) -> Dict[str, Any]:
+    if _bruker_delt_df(argumenter):
+        argumenter = {**argumenter, 'kilde': _delt_kilde}
+    data = klasse(**argumenter)
+    # Samme innhold som en oppføring i DataserieCache, så resultatet kan settes på objektet i hovedprosessen
+    return {
+        'dataserier': data.dataserier,
+        'attributter': {navn: getattr(data, navn) for navn in data._cache_attributter},
+    }
+
+
+def _kan_lagres_som_arrow(df: pd.DataFrame) -> bool:
+    # Arrow gjør om kolonnenavn til tekst og object-kolonner med f.eks. heltall og None til float64,
+    # så svaret 1 blir '1.0' i diagrammene. Slike tabeller sendes heller til prosessene som de er.
+    if not all(isinstance(navn, str) for navn in df.columns):
+        return False
+    return all(pd.api.types.infer_dtype(df[navn], skipna=True) in ('string', 'empty')
+               for navn in df.columns if df[navn].dtype == object)
+
+
+def _lagre_arrow(df: pd.DataFrame, mappe: str) -> Optional[Datakilde]:
+    if not _kan_lagres_som_arrow(df):
+        return None
+    filnavn = os.path.join(mappe, 'delt.arrow')
+    try:
+        import pyarrow as pa
+        from pyarrow import feather
+
+        # Indeksen lagres som en kolonne, slik at rekkefølgen og etikettene er de samme som i delt_df
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=True), filnavn, compression='uncompressed')
+    except (ValueError, TypeError, NotImplementedError, ImportError):
+        # F.eks. kolonner med blandede typer, som Arrow ikke kan lagre
+        return None
+    return ParquetKilde(filnavn)
+
+
+def bygg_parallelt(spesifikasjoner: Sequence[Spesifikasjon],
+                   delt_df: Optional[pd.DataFrame] = None,
+                   maks_prosesser: Optional[int] = None,
+                   start_metode: Optional[str] = 'forkserver') -> List[HighChartData]:
+    """
+    Bygger dataseriene til mange diagrammer samtidig i en pool av prosesser.
+
+    Diagrammer uten kilde, df og filnavn i argumentene bruker delt_df. Den skrives én gang til en
+    ukomprimert Arrow IPC-fil som prosessene leser med minnetilordning og kolonneutvalg, i stedet for
+    at tabellen pickles for hvert diagram. Indeksen lagres med, så rekkefølgen er den samme som i delt_df.
+    Har delt_df object-kolonner med annet enn tekst, som Arrow ville gjort om til tall, eller kan den
+    ikke lagres som Arrow, sendes den i stedet én gang til hver prosess.
+
+    Med sporing blir hele byggingen ett spenn. Spennene i prosessene samles ikke.
+
+    Parameters
+    ----------
+    spesifikasjoner : Sequence[Tuple[Type[HighChartData], Dict[str, Any]]]
+        Klassen og argumentene til konstruktøren for hvert diagram, f.eks.
+        (KolonneData, {'kolonner': ['spm_1'], 'svar_alternativer': ['1', '2', '3']}).
+        Argumentene må kunne pickles.
+    delt_df : pd.DataFrame, optional
+        Felles data for diagrammene som ikke har en egen kilde.
+    maks_prosesser : int, optional
+        Antall prosesser. Hvis None brukes antall kjerner.
+    start_metode : str, optional
+        Hvordan prosessene startes, se multiprocessing (default er 'forkserver'). fork er raskere å starte,
+        men kan henge når pyarrow eller andre biblioteker har startet tråder. Klasser som er definert i
+        en notebook, krever fork. Hvis None, eller metoden ikke finnes på plattformen, brukes standarden.
+
+    Returns
+    -------
+    List[HighChartData]
+        Ett objekt per spesifikasjon i samme rekkefølge, med dataseriene ferdig bygget.
+    """
+    if not spesifikasjoner:
+        return []
+    objekter = []
+    for klasse, argumenter in spesifikasjoner:
+        if _bruker_delt_df(argumenter):
+            if delt_df is None:
+                raise ValueError(f"{klasse.__name__} har verken kilde, df eller filnavn, og delt_df er ikke satt.")
+            argumenter = {**argumenter, 'kilde': DataFrameKilde(delt_df)}
+        objekter.append(klasse(**argumenter))
+
+    with tempfile.TemporaryDirectory() as mappe:
+        delt_kilde = None
+        if delt_df is not None:
+            delt_kilde = _lagre_arrow(delt_df, mappe) or DataFrameKilde(delt_df)
+        kontekst = None
+        if start_metode in multiprocessing.get_all_start_methods():
+            kontekst = multiprocessing.get_context(start_metode)
+        with spenn('bygg_parallelt', diagrammer=len(spesifikasjoner), prosesser=maks_prosesser), \
+                ProcessPoolExecutor(max_workers=maks_prosesser, mp_context=kontekst,
+                                    initializer=_initialiser, initargs=(delt_kilde,)) as utfoerer:
+            resultater = list(utfoerer.map(_bygg, *zip(*spesifikasjoner)))
+
+    for objekt, resultat in zip(objekter, resultater):
+        objekt.dataserier = resultat['dataserier']
+        for navn, verdi in resultat['attributter'].items():
+            setattr(objekt, navn, verdi)
+    return objekter
@@ -1,31 +1,149 @@
 import uuid
+from typing import Dict, List, Optional
 from highcharts_core.chart import Chart
 from highcharts_core.options import HighchartsOptions
 from pypalettes import load_cmap
 
+from ung_plotteverktoey.serialisering import antall_punkter, til_json
+
+
+HIGHCHARTS_URL = 'https://code.highcharts.com'
+
+# Moduler som må lastes før en annen modul, men som ikke alltid oppdages av highcharts-core
+AVHENGIGE_MODULER = {
+    'modules/solid-gauge': 'highcharts-more',
+}
+# Boost må lastes etter alle andre moduler
+SISTE_MODULER = ('modules/boost',)
+
+
+def sorter_moduler(moduler: List[str]) -> List[str]:
+    return [modul for modul in moduler if modul not in SISTE_MODULER] + [modul for modul in moduler if modul in SISTE_MODULER]
+
 
 class HighChartBase:
+    """
+    Felles base for diagrammene.
+
+    Har seriene flere punkter enn rask_grense, valideres bare innstillingene på diagramnivå
+    i HighchartsOptions, mens seriene serialiseres direkte til JSON (med orjson hvis den er
+    installert). rask_grense faller tilbake til klasseattributtet standard_rask_grense, og
+    None slår av den raske veien. Seriene må da bruke navnene fra Highcharts JS, f.eks. 'pointFormat'.
+
+    Diagrammer med mange punkter (spredningsdiagram og parallelle koordinater) tegnes med
+    Highcharts Boost (WebGL) når antall punkter er over boost_grense, som faller tilbake til
+    standard_boost_grense. None slår av Boost.
+    """
+    standard_rask_grense = None
+    standard_boost_grense = 5000
+
     def __init__(self, 
                  data, 
                  tittel: str = " ", 
                  undertittel: str = " ", 
-                 y_akse_tekst: str = " "
+                 y_akse_tekst: str = " ",
+                 rask_grense: Optional[int] = None,
+                 boost_grense: Optional[int] = None
                  ):
         self.data = data
         self.tittel = tittel
         self.undertittel = undertittel
         self.y_akse_tekst = y_akse_tekst
+        self.rask_grense = rask_grense if rask_grense is not None else self.standard_rask_grense
+        self.boost_grense = boost_grense if boost_grense is not None else self.standard_boost_grense
         self.diagram_id = str(uuid.uuid4())
+        self.raa_serier: Optional[List[Dict]] = None
         self.innstillinger = self.definer_innstillinger()
 
+    def lag_innstillinger(self, **innstillinger) -> HighchartsOptions:
+        """
+        Lager HighchartsOptions, men holder store serier utenfor valideringen, se rask_grense.
+        """
+        serier = innstillinger.get('series')
+        self.raa_serier = None
+        if self.rask_grense is not None and serier is not None and antall_punkter(serier) > self.rask_grense:
+            self.raa_serier = innstillinger.pop('series')
+        return HighchartsOptions(**innstillinger)
+
+    def bruk_boost(self, serier: List[Dict]) -> bool:
+        return self.boost_grense is not None and antall_punkter(serier) > self.boost_grense
+
+    def boost_innstillinger(self, serier: List[Dict]) -> Dict:
+        """
+        Innstillinger som slår på Boost når seriene har flere punkter enn boost_grense, ellers en tom dict.
+        """
+        if not self.bruk_boost(serier):
+            return {}
+        return {
+            'boost': {'enabled': True, 'useGPUTranslations': True, 'usePreallocated': True},
+            # turboThreshold 0 tillater punkter som objekter, f.eks. med kommentar, i store serier
+            'plot_options': {'series': {'boostThreshold': 1, 'turboThreshold': 0}},
+        }
+
+    def lag_chart(self) -> Chart:
+        """
+        Lager Chart fra innstillingene. Med rask serialisering mangler seriene, bruk til_js i stedet.
+        """
+        return Chart(options=self.innstillinger, container=self.diagram_id)
+
+    def moduler(self) -> List[str]:
+        """
+        Highcharts-modulene diagrammet trenger, i rekkefølgen de må lastes.
+        """
+        moduler = []
+        for modul in self.lag_chart().get_required_modules():
+            avhengig = AVHENGIGE_MODULER.get(modul)
+            if avhengig is not None and avhengig not in moduler:
+                moduler.append(avhengig)
+            if modul not in moduler:
+                moduler.append(modul)
+        return sorter_moduler(moduler)
+
+    def til_js(self) -> str:
+        """
+        Returnerer JavaScript som tegner diagrammet i elementet med id diagram_id.
+        """
+        if self.raa_serier is None:
+            return self.lag_chart().to_js_literal(event_listener_enabled=False)
+        innstillinger = self.innstillinger.to_js_literal().strip()
+        # JSON er gyldig JavaScript, så seriene kan settes rett inn i objektet med de andre innstillingene.
+        # '</' escapes slik at kommentarer med '</script>' ikke avslutter skriptet i HTML.
+        serier = til_json(self.raa_serier).replace('</', '<\\/')
+        return f"Highcharts.chart('{self.diagram_id}',\n{{\n  series: {serier},\n{innstillinger[1:]}\n);"
+
     def lag_diagram(self):
-        diagram = Chart(options=self.innstillinger)
-        diagram.display()
+        if self.raa_serier is None:
+            diagram = self.lag_chart()
+            diagram.display()
+            return
+
+        from IPython.display import HTML, display
+        adresser = [f'{HIGHCHARTS_URL}/{modul}.js' for modul in self.moduler()]
+        # Modulene lastes i rekkefølge før diagrammet tegnes, og bare hvis de ikke er lastet fra før
+        skript = f"""
+(function() {{
+  var adresser = {til_json(adresser)};
+  function tegn() {{
+    if (typeof Highcharts === 'undefined') {{ setTimeout(tegn, 100); return; }}
+    {self.til_js()}
+  }}
+  function last(i) {{
+    if (i === adresser.length) {{ tegn(); return; }}
+    if (document.querySelector('script[src="' + adresser[i] + '"]')) {{ last(i + 1); return; }}
+    var element = document.createElement('script');
+    element.src = adresser[i];
+    element.onload = function() {{ last(i + 1); }};
+    document.head.appendChild(element);
+  }}
+  last(0);
+}})();
+"""
+        display(HTML(f'<div id="{self.diagram_id}"></div><script>{skript}</script>'))
 
 
 class KolonneDiagram(HighChartBase): 
     def definer_innstillinger(self):
-        innstillinger = HighchartsOptions(
+        innstillinger = self.lag_innstillinger(
             chart={'renderTo': self.diagram_id, 'type': 'column'},
             title={'text': self.tittel},
             subtitle={'text': self.undertittel},
@@ -39,7 +157,7 @@ class KolonneDiagram(HighChartBase):
 
 class StabletKolonneDiagram(HighChartBase):
     def definer_innstillinger(self):
-        innstillinger = HighchartsOptions(
+        innstillinger = self.lag_innstillinger(
             chart={'renderTo': self.diagram_id, 'type': 'column'},
             title={'text': self.tittel},
             subtitle={'text': self.undertittel},
@@ -54,6 +172,14 @@ class StabletKolonneDiagram(HighChartBase):
     
 
 class ParallellDiagram(HighChartBase):
+    """
+    Parallelle koordinater, én linje per respondent eller per svarkombinasjon.
+
+    Med mange respondenter slås Boost på over boost_grense. Boost tegner rette linjer med WebGL,
+    uten markering av like svar ved hover og med samme linjebredde for alle serier. Når
+    ParallellData har maks_linjer, viser linjebredden hvor mange som svarte likt, og da brukes ikke
+    Boost. Det går greit fordi maks_linjer også begrenser antall linjer.
+    """
     def definer_innstillinger(self):
         y_axis = []
         for kolonne in self.data.kolonner:
@@ -69,56 +195,67 @@ class ParallellDiagram(HighChartBase):
         
 
 
-        innstillinger = HighchartsOptions(
+        serier = self.data.dataserier
+        # WebGL i Boost ser bort fra lineWidth per serie, som saml_linjer bruker for antall svar
+        linjebredde_per_serie = any('lineWidth' in serie for serie in serier)
+        boost = {} if linjebredde_per_serie else self.boost_innstillinger(serier)
+        serie_innstillinger = {
+            'allowPointSelect': False,
+            'lineWidth': 2,
+            'states': {
+                'inactive': {
+                    'opacity': 0.1,
+                },
+            },
+            'point': {
+                'events': {
+                    'mouseOver': '''function() {
+                        var series = this.series.chart.series,
+                            x = this.x,
+                            y = this.y;
+
+                        Highcharts.each(series, function(s) {
+                            if (s.data[x].y === y) {
+                                s.setState('hover');
+                            } else {
+                                s.setState('inactive');
+                            }
+                        });
+                    }''',
+                    'mouseOut': '''function() {
+                        var series = this.series.chart.series;
+                        Highcharts.each(series, function(s) {
+                            s.setState('');
+                        });
+                    }''',
+                }
+            }
+        }
+        if boost:
+            # Boost tegner ikke spline, og punktene finnes ikke som objekter i nettleseren,
+            # så markeringen av like svar ved hover slås av
+            serie_innstillinger.pop('point')
+            serie_innstillinger.update(boost['plot_options']['series'])
+            boost['boost']['seriesThreshold'] = 1
+
+        innstillinger = self.lag_innstillinger(
             chart={
                 'renderTo': self.diagram_id,
-                'type': 'spline',
+                'type': 'line' if boost else 'spline',
                 'parallelCoordinates': True,
                 'parallelAxes': {
                     'lineWidth': 2,
                 },
                 },
             title={'text': self.tittel},
-            plot_options={
-                'series': {
-                    'allowPointSelect': False,
-                    'lineWidth': 2,
-                    'states': {
-                        'inactive': {
-                            'opacity': 0.1,
-                        },
-                    },
-                    'point': {
-                        'events': {
-                            'mouseOver': '''function() {
-                                var series = this.series.chart.series,
-                                    x = this.x,
-                                    y = this.y;
-
-                                Highcharts.each(series, function(s) {
-                                    if (s.data[x].y === y) {
-                                        s.setState('hover');
-                                    } else {
-                                        s.setState('inactive');
-                                    }
-                                });
-                            }''',
-                            'mouseOut': '''function() {
-                                var series = this.series.chart.series;
-                                Highcharts.each(series, function(s) {
-                                    s.setState('');
-                                });
-                            }''',
-                        }
-                    }
-                }
-            },
+            plot_options={'series': serie_innstillinger},
+            boost=boost.get('boost'),
             tooltip={'pointFormat': """<span style="color:{point.color}; font-size: 10">\\u25CF</span><b>{point.formattedValue}</b>"""},
             x_axis={'categories': self.data.kolonner, 'offset': 10},
             y_axis=y_axis,
             colors=['rgba(11, 200, 200, 0.06)'],
             credits={'enabled': False},
-            series=self.data.dataserier,
+            series=serier,
         )
         return innstillinger
     
@@ -126,7 +263,7 @@ class ParallellDiagram(HighChartBase):
 class IndikatorDiagram(HighChartBase):
     def definer_innstillinger(self):
         farger = load_cmap("flattastic_flatui").colors
-        innstillinger = HighchartsOptions(
+        innstillinger = self.lag_innstillinger(
             chart={'renderTo': self.diagram_id, 'type': 'solidgauge'},
             title={'text': self.tittel},
             subtitle={'text': self.undertittel, 'y': 90},
@@ -156,7 +293,7 @@ class IndikatorDiagram(HighChartBase):
 class PieDiagram(HighChartBase):
 
     def definer_innstillinger(self):
-        innstillinger = HighchartsOptions(
+        innstillinger = self.lag_innstillinger(
             chart={'renderTo': self.diagram_id, 'type': 'pie'},
             title={'text': self.tittel},
             subtitle={'text': self.undertittel},
@@ -196,7 +333,7 @@ class PieDiagram(HighChartBase):
 
 class BulletDiagram(HighChartBase):
     def definer_innstillinger(self):
-        options = HighchartsOptions(
+        options = self.lag_innstillinger(
             chart={'renderTo': self.diagram_id, 
                    'inverted': True, 
                    'margin_left': 135, 
@@ -221,7 +358,7 @@ class BulletDiagram(HighChartBase):
 
 class JitterKommentarDiagram(HighChartBase):
     def definer_innstillinger(self):
-        options = HighchartsOptions(
+        options = self.lag_innstillinger(
             chart={'renderTo': self.diagram_id, 'type': 'scatter'},
             title={'text': self.tittel},
             subtitle={'text': self.undertittel},
@@ -235,7 +372,8 @@ class JitterKommentarDiagram(HighChartBase):
                 'title': {'text': ' '},
                 'labels': {'enabled': False}
             },
-            series=self.data.dataserier
+            series=self.data.dataserier,
+            **self.boost_innstillinger(self.data.dataserier)
         )
         return options
 
@@ -243,7 +381,7 @@ class JitterKommentarDiagram(HighChartBase):
 
 class KommentarDiagram(HighChartBase):
     def definer_innstillinger(self):
-        options = HighchartsOptions(
+        options = self.lag_innstillinger(
             chart={'renderTo': self.diagram_id, 'type': 'scatter'},
             title={'text': self.tittel},
             subtitle={'text': self.undertittel},
@@ -265,6 +403,7 @@ class KommentarDiagram(HighChartBase):
             tooltip={
                 'pointFormat': '{point.kommentar}'
             },
-            series=self.data.dataserier
+            series=self.data.dataserier,
+            **self.boost_innstillinger(self.data.dataserier)
         )
         return options
\ No newline at end of file
@@ -0,0 +1,40 @@
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_standard(verdi: Any) -> Any:
+    """
+    Gjør numpy-verdier om til vanlige Python-verdier, for bruk som default i json.dumps.
+    """
+    if isinstance(verdi, np.generic):
+        return verdi.item()
+    if isinstance(verdi, np.ndarray):
+        return verdi.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(verdi).__name__}")
+
+
+def til_json(verdi: Any) -> str:
+    """
+    Serialiserer til JSON med orjson hvis den er installert, ellers med json fra standardbiblioteket.
+    Numpy-tall og -arrays støttes av begge.
+    """
+    if orjson is not None:
+        return orjson.dumps(verdi, default=json_standard,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(verdi, ensure_ascii=False, default=json_standard)
+
+
+def antall_punkter(serier: List[Dict]) -> int:
+    """
+    Teller punktene i alle seriene, brukt for å velge mellom validert og rask serialisering.
+    """
+    if isinstance(serier, dict):
+        serier = [serier]
+    return sum(len(serie.get('data') or ()) for serie in serier if isinstance(serie, dict))
@@ -0,0 +1,65 @@
+from statistics import NormalDist
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+STATISTIKK_KOLONNER = ['gjennomsnitt', 'median', 'antall', 'standardavvik', 'ki_nedre', 'ki_oevre']
+
+
+def beregn_statistikk(df: pd.DataFrame,
+                      kolonner: List[str],
+                      gruppe_kolonne: str = None,
+                      konfidensnivaa: float = 0.95) -> pd.DataFrame:
+    """
+    Beregner gjennomsnitt, median, antall og konfidensintervall per spørsmål i én vektorisert aggregering.
+
+    Svarene konverteres til tall, og verdier som ikke kan konverteres holdes utenfor.
+    Konfidensintervallet bruker normaltilnærming, gjennomsnitt ± z * standardavvik / sqrt(antall).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Data i bredt format med én kolonne per spørsmål.
+    kolonner : List[str]
+        Spørsmålskolonnene det skal beregnes statistikk for.
+    gruppe_kolonne : str, optional
+        Kolonne å dele opp etter, f.eks. fylke eller aldersgruppe.
+    konfidensnivaa : float, optional
+        Nivået for konfidensintervallet (default er 0.95).
+
+    Returns
+    -------
+    pd.DataFrame
+        Én rad per spørsmål (og gruppe) med kolonnene 'Spørsmål', eventuelt gruppe_kolonne,
+        og STATISTIKK_KOLONNER. Radene følger rekkefølgen i kolonner.
+    """
+    tall = df[kolonner].apply(pd.to_numeric, errors='coerce')
+    aggregeringer = ['mean', 'median', 'count', 'std']
+
+    if gruppe_kolonne is None:
+        statistikk = tall.agg(aggregeringer).T
+        statistikk.index.name = 'Spørsmål'
+    else:
+        gruppert = tall.groupby(df[gruppe_kolonne], sort=True).agg(aggregeringer)
+        statistikk = pd.concat({kolonne: gruppert[kolonne] for kolonne in kolonner}, names=['Spørsmål'])
+
+    statistikk = statistikk.rename(columns={
+        'mean': 'gjennomsnitt', 'median': 'median', 'count': 'antall', 'std': 'standardavvik'
+    })
+    return legg_til_konfidensintervall(statistikk, konfidensnivaa)[STATISTIKK_KOLONNER].reset_index()
+
+
+def legg_til_konfidensintervall(statistikk: pd.DataFrame, konfidensnivaa: float = 0.95) -> pd.DataFrame:
+    """
+    Legger til ki_nedre og ki_oevre fra gjennomsnitt, standardavvik og antall, f.eks. for statistikk
+    som er aggregert i databasen.
+    """
+    statistikk['antall'] = statistikk['antall'].astype(int)
+
+    z = NormalDist().inv_cdf(0.5 + konfidensnivaa / 2)
+    feilmargin = z * statistikk['standardavvik'] / np.sqrt(statistikk['antall'].where(statistikk['antall'] > 0))
+    statistikk['ki_nedre'] = statistikk['gjennomsnitt'] - feilmargin
+    statistikk['ki_oevre'] = statistikk['gjennomsnitt'] + feilmargin
+    return statistikk